@@ -0,0 +1,220 @@
+"""
+Suite de benchmarks xlsF2schema.
+
+Mesure, pour chaque scénario synthétique (voir ``synthetic.SCENARIOS``), le temps et le pic
+d'allocation de chaque étape de la conversion, ainsi que la CLI de bout en bout, puis
+compare les résultats à une référence enregistrée.
+
+Usage ::
+
+    python benchmarks/run.py                      # mesure et compare à baselines.json
+    python benchmarks/run.py --quick              # tailles réduites
+    python benchmarks/run.py --save-baseline      # enregistre les mesures comme référence
+    python benchmarks/run.py --scenario deep --stage generate_json_schema --report out.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "src"))
+
+from synthetic import QUICK_SCENARIOS, SCENARIOS, write_xlsform  # noqa: E402
+
+from xlsF2schema.cli import xlsform_to_dict  # noqa: E402
+from xlsF2schema.core import generate_json_schema  # noqa: E402
+from xlsF2schema.mapping import ChoiceResolver, get_comprehensive_mapping  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(HERE, "baselines.json")
+
+# Tolérances avant de signaler une régression (ratio mesure / référence)
+TIME_TOLERANCE = 1.25
+MEMORY_TOLERANCE = 1.10
+
+
+def measure(func, repeat):
+    """
+    Mesure le meilleur temps sur ``repeat`` exécutions et le pic d'allocation (tracemalloc)
+    sur une exécution supplémentaire.
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": round(min(timings), 6), "peak_kb": round(peak / 1024, 1)}
+
+
+def _leaves(items):
+    for item in items:
+        if item.get("type") in ("group", "repeat"):
+            yield from _leaves(item.get("children", []))
+        else:
+            yield item
+
+
+def _run_child(command, env):
+    """
+    Exécute une commande et renvoie son RSS maximal en Ko (None si os.wait4 est indisponible).
+    """
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, env=env)
+    if not hasattr(os, "wait4"):
+        process.wait()
+        rss = None
+    else:
+        _, status, usage = os.wait4(process.pid, 0)
+        # Équivalent de os.waitstatus_to_exitcode (Python 3.9+)
+        process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+        # ru_maxrss est en octets sur macOS, en Ko ailleurs
+        rss = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command)
+    return rss
+
+
+def measure_cli(path, repeat):
+    """
+    Mesure la CLI de bout en bout dans un sous-processus (démarrage de l'interpréteur compris),
+    ainsi que le RSS maximal du processus.
+    """
+    timings = []
+    peaks = []
+    env = dict(os.environ, PYTHONPATH=os.path.join(os.path.dirname(HERE), "src"))
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "schema.json")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            peaks.append(_run_child([sys.executable, "-m", "xlsF2schema.cli", path, "-o", output], env))
+            timings.append(time.perf_counter() - started)
+    result = {"seconds": round(min(timings), 6)}
+    if peaks[0] is not None:
+        result["peak_rss_kb"] = min(peaks)
+    return result
+
+
+def run_scenario(name, spec, stages, repeat, workdir):
+    path = write_xlsform(spec, os.path.join(workdir, f"{name}.xlsx"))
+    survey = xlsform_to_dict(path, loader="native")
+    leaves = list(_leaves(survey["children"]))
+    results = {}
+
+    def run(stage, func):
+        if stages and stage not in stages:
+            return
+        print(f"  {name:<12} {stage:<28}", end="", flush=True)
+        results[stage] = func()
+        print(f" {results[stage]['seconds']:>10.4f} s")
+
+    run("load_pyxform", lambda: measure(lambda: xlsform_to_dict(path), max(1, repeat // 2)))
+    run("load_native", lambda: measure(lambda: xlsform_to_dict(path, loader="native"), repeat))
+
+    def mapping():
+        choices = ChoiceResolver(survey.get("choices", {}))
+        for item in leaves:
+            get_comprehensive_mapping(item, choices)
+
+    run("get_comprehensive_mapping", lambda: measure(mapping, repeat))
+    run("generate_json_schema", lambda: measure(lambda: generate_json_schema(survey), repeat))
+    run("generate_json_schema_refs", lambda: measure(lambda: generate_json_schema(survey, use_refs=True), repeat))
+    schema = generate_json_schema(survey)
+    run("json_dump", lambda: measure(lambda: json.dumps(schema, indent=4, ensure_ascii=False), repeat))
+    run("cli", lambda: measure_cli(path, max(1, repeat // 2)))
+    return results
+
+
+def compare(current, baseline):
+    """
+    Compare les mesures à la référence ; renvoie les lignes du rapport et le nombre de régressions.
+    """
+    rows = []
+    regressions = 0
+    for scenario, stages in current.items():
+        for stage, metrics in stages.items():
+            reference = baseline.get(scenario, {}).get(stage, {})
+            for metric, value in metrics.items():
+                base = reference.get(metric)
+                if not base:
+                    rows.append({"scenario": scenario, "stage": stage, "metric": metric, "current": value, "baseline": None, "ratio": None, "status": "new"})
+                    continue
+                ratio = value / base
+                tolerance = TIME_TOLERANCE if metric == "seconds" else MEMORY_TOLERANCE
+                status = "regression" if ratio > tolerance else ("improved" if ratio < 1 / tolerance else "ok")
+                regressions += status == "regression"
+                rows.append({"scenario": scenario, "stage": stage, "metric": metric, "current": value, "baseline": base, "ratio": round(ratio, 3), "status": status})
+    return rows, regressions
+
+
+def print_report(rows):
+    print(f"\n{'scénario':<12} {'étape':<28} {'mesure':<12} {'référence':>12} {'actuel':>12} {'ratio':>7}  statut")
+    for row in rows:
+        base = "-" if row["baseline"] is None else f"{row['baseline']:.4g}"
+        ratio = "-" if row["ratio"] is None else f"{row['ratio']:.2f}"
+        print(f"{row['scenario']:<12} {row['stage']:<28} {row['metric']:<12} {base:>12} {row['current']:>12.4g} {ratio:>7}  {row['status']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks xlsF2schema sur des XLSForms synthétiques")
+    parser.add_argument("--quick", action="store_true", help="Scénarios de taille réduite")
+    parser.add_argument("--scenario", action="append", help="Limiter à un scénario (répétable)")
+    parser.add_argument("--stage", action="append", help="Limiter à une étape (répétable)")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre d'exécutions par mesure (meilleur temps retenu)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Fichier de référence")
+    parser.add_argument("--save-baseline", action="store_true", help="Enregistrer les mesures comme nouvelle référence")
+    parser.add_argument("--report", help="Écrire le rapport de comparaison en JSON")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Code de retour 1 en cas de régression")
+    args = parser.parse_args()
+
+    scenarios = QUICK_SCENARIOS if args.quick else SCENARIOS
+    selected = {k: v for k, v in scenarios.items() if not args.scenario or k in args.scenario}
+    profile = "quick" if args.quick else "full"
+
+    current = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, spec in selected.items():
+            current[name] = run_scenario(name, spec, args.stage, args.repeat, workdir)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baselines = json.load(f)
+
+    rows, regressions = compare(current, baselines.get(profile, {}))
+    print_report(rows)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"profile": profile, "machine": platform.platform(), "python": platform.python_version(), "rows": rows}, f, indent=4)
+
+    if args.save_baseline:
+        merged = baselines.get(profile, {})
+        for scenario, stages in current.items():
+            merged.setdefault(scenario, {}).update(stages)
+        baselines[profile] = merged
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=4, sort_keys=True)
+        print(f"\nRéférence enregistrée dans : {args.baseline}")
+
+    if regressions:
+        print(f"\n{regressions} régression(s) détectée(s)", file=sys.stderr)
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
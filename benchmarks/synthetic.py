@@ -0,0 +1,124 @@
+"""
+Générateur de XLSForms synthétiques pour les benchmarks.
+
+Chaque scénario décrit une forme extrême (nombre de champs, profondeur d'imbrication,
+taille des listes de choix, sélections partageant une même liste) et peut être écrit
+en .xlsx pour mesurer aussi les chargeurs et la CLI.
+"""
+import random
+
+from openpyxl import Workbook
+
+# Types de champs simples tirés au hasard pour remplir les formulaires
+FIELD_TYPES = ("text", "integer", "decimal", "date", "datetime", "geopoint", "image", "note", "barcode")
+
+
+class FormSpec:
+    """
+    Paramètres d'un formulaire synthétique.
+
+    :param fields: Nombre de champs simples (répartis sur les niveaux d'imbrication)
+    :param depth: Profondeur d'imbrication des sections (alternance group / repeat)
+    :param lists: Nombre de listes de choix
+    :param choices: Nombre de choix par liste
+    :param selects: Nombre de champs select_one / select_multiple
+    :param shared: Si vrai, toutes les sélections utilisent la première liste
+    :param required_ratio: Proportion de champs obligatoires
+    :param seed: Graine du générateur aléatoire
+    """
+
+    def __init__(self, fields=100, depth=0, lists=1, choices=10, selects=10, shared=False,
+                 required_ratio=0.3, seed=0):
+        self.fields = fields
+        self.depth = depth
+        self.lists = lists
+        self.choices = choices
+        self.selects = selects
+        self.shared = shared
+        self.required_ratio = required_ratio
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+# Scénarios couvrant les extrêmes d'échelle ; "quick" garde des tailles réduites pour la CI
+SCENARIOS = {
+    "wide": FormSpec(fields=10000, selects=500, lists=20, choices=20),
+    "deep": FormSpec(fields=300, depth=60, selects=60, lists=5, choices=10),
+    "huge_list": FormSpec(fields=50, selects=1, lists=1, choices=100000),
+    "shared_list": FormSpec(fields=50, selects=300, lists=1, choices=5000, shared=True),
+}
+
+QUICK_SCENARIOS = {
+    "wide": FormSpec(fields=1000, selects=50, lists=5, choices=20),
+    "deep": FormSpec(fields=120, depth=55, selects=20, lists=2, choices=10),
+    "huge_list": FormSpec(fields=20, selects=1, lists=1, choices=20000),
+    "shared_list": FormSpec(fields=20, selects=60, lists=1, choices=2000, shared=True),
+}
+
+
+def survey_rows(spec):
+    """
+    Produit les lignes des feuilles survey et choices d'un formulaire synthétique.
+
+    :return: ``(survey_rows, choices_rows)`` sans ligne d'en-tête ; les lignes survey sont
+        ``(type, name, required)`` et les lignes choices ``(list_name, name, label)``
+    :rtype: tuple[list[tuple], list[tuple]]
+    """
+    rnd = random.Random(spec.seed)
+    list_names = [f"liste_{i}" for i in range(spec.lists)]
+
+    leaves = []
+    for i in range(spec.fields):
+        leaves.append((rnd.choice(FIELD_TYPES), f"champ_{i}"))
+    for i in range(spec.selects):
+        list_name = list_names[0] if spec.shared else list_names[i % len(list_names)]
+        kind = "select_one" if i % 2 == 0 else "select_multiple"
+        leaves.append((f"{kind} {list_name}", f"choix_{i}"))
+    rnd.shuffle(leaves)
+
+    # Répartit les champs sur depth + 1 niveaux, chaque niveau ouvrant le suivant
+    levels = spec.depth + 1
+    per_level = max(1, len(leaves) // levels)
+    rows = []
+    closing = []
+    for level in range(levels):
+        start = level * per_level
+        chunk = leaves[start:] if level == levels - 1 else leaves[start:start + per_level]
+        for field_type, name in chunk:
+            required = "yes" if rnd.random() < spec.required_ratio else None
+            rows.append((field_type, name, required))
+        if level < levels - 1:
+            kind = "group" if level % 2 == 0 else "repeat"
+            rows.append((f"begin_{kind}", f"section_{level}", None))
+            closing.append((f"end_{kind}", None, None))
+    rows.extend(reversed(closing))
+
+    choice_rows = [
+        (list_name, f"c{j}", f"Choix {j}")
+        for list_name in list_names
+        for j in range(spec.choices)
+    ]
+    return rows, choice_rows
+
+
+def write_xlsform(spec, path):
+    """
+    Écrit le formulaire synthétique décrit par ``spec`` dans un fichier .xlsx.
+    """
+    rows, choice_rows = survey_rows(spec)
+    workbook = Workbook(write_only=True)
+    survey = workbook.create_sheet("survey")
+    survey.append(("type", "name", "label", "required"))
+    for field_type, name, required in rows:
+        survey.append((field_type, name, name, required))
+    choices = workbook.create_sheet("choices")
+    choices.append(("list_name", "name", "label"))
+    for row in choice_rows:
+        choices.append(row)
+    settings = workbook.create_sheet("settings")
+    settings.append(("form_title", "form_id"))
+    settings.append(("Synthetic", "synthetic"))
+    workbook.save(path)
+    return path
@@ -0,0 +1,165 @@
+import glob
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+XLSFORM_EXTENSIONS = (".xlsx", ".xls")
+
+
+def _is_xlsform(path):
+    name = os.path.basename(path)
+    # Ignore les fichiers de verrouillage d'Excel (~$form.xlsx)
+    return name.lower().endswith(XLSFORM_EXTENSIONS) and not name.startswith("~$")
+
+
+def read_manifest(path):
+    """
+    Lit un fichier manifeste : un chemin (ou motif glob) par ligne, relatif au manifeste.
+    Les lignes vides et celles commençant par ``#`` sont ignorées.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                entries.append(line if os.path.isabs(line) else os.path.join(base, line))
+    return entries
+
+
+def collect_inputs(sources, manifest=None):
+    """
+    Résout une liste de répertoires, fichiers ou motifs glob en chemins XLSForm uniques.
+
+    :param sources: Répertoires (parcourus récursivement), fichiers ou motifs glob
+    :type sources: list[str]
+    :param manifest: Fichier manifeste optionnel (voir :func:`read_manifest`)
+    :type manifest: str | None
+    :return: Chemins triés, sans doublon
+    :rtype: list[str]
+    """
+    sources = list(sources)
+    if manifest:
+        sources.extend(read_manifest(manifest))
+
+    found = set()
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                found.update(os.path.join(root, f) for f in files if _is_xlsform(f))
+        elif os.path.isfile(source):
+            found.add(source)
+        else:
+            found.update(p for p in glob.glob(source, recursive=True) if os.path.isfile(p) and _is_xlsform(p))
+    return sorted(os.path.normpath(p) for p in found)
+
+
+def output_names(paths):
+    """
+    Associe à chaque chemin un nom de fichier de sortie ``<nom>.json`` unique.
+    """
+    names = {}
+    used = set()
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        candidate = f"{stem}.json"
+        counter = 2
+        while candidate in used:
+            candidate = f"{stem}-{counter}.json"
+            counter += 1
+        used.add(candidate)
+        names[path] = candidate
+    return names
+
+
+def write_atomic(obj, output_path, output_options=None):
+    """
+    Écrit ``obj`` en JSON de façon atomique : fichier temporaire dans le même répertoire, puis
+    renommage. Un lecteur ne voit jamais de fichier partiellement écrit.
+    """
+    from xlsF2schema.output import write_json
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output_path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write_json(obj, f, **(output_options or {}))
+        # mkstemp crée le fichier en 0600 : mêmes droits qu'un open() classique (umask)
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _convert_one(path, output_path, use_refs, loader, cache_dir, output_options=None):
+    """
+    Convertit un formulaire dans un processus de travail. Les erreurs sont renvoyées,
+    jamais levées, pour ne pas interrompre le lot.
+    """
+    from xlsF2schema.cache import ConversionCache
+    from xlsF2schema.cli import convert_file
+
+    started = time.perf_counter()
+    result = {"input": path, "output": output_path}
+    try:
+        cache = ConversionCache(cache_dir) if cache_dir is not None else None
+        schema = convert_file(path, use_refs=use_refs, cache=cache, loader=loader)
+        write_atomic(schema, output_path, output_options)
+        result["status"] = "ok"
+    except Exception as e:
+        result["status"] = "error"
+        result["output"] = None
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def convert_batch(paths, output_dir, workers=None, use_refs=False, loader="pyxform", cache_dir=None, output_options=None):
+    """
+    Convertit un lot de formulaires en parallèle dans un pool de processus.
+
+    Chaque schéma est écrit dans ``output_dir``. L'échec d'un formulaire n'interrompt
+    pas le lot : il est consigné dans le rapport renvoyé.
+
+    :param paths: Chemins XLSForm à convertir (voir :func:`collect_inputs`)
+    :type paths: list[str]
+    :param output_dir: Répertoire de sortie (créé si besoin)
+    :type output_dir: str
+    :param workers: Nombre de processus (défaut: nombre de CPU ; 1 = sans pool)
+    :type workers: int | None
+    :param cache_dir: Répertoire du cache de conversion, ou ``None`` pour le désactiver
+    :type cache_dir: str | None
+    :param output_options: Options d'écriture des schémas (``indent``, ``sort_keys``,
+        ``backend``, voir :func:`xlsF2schema.output.write_json`)
+    :type output_options: dict | None
+    :return: Rapport ``{"total", "succeeded", "failed", "seconds", "results"}``
+    :rtype: dict
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    names = output_names(paths)
+    jobs = [(p, os.path.join(output_dir, names[p]), use_refs, loader, cache_dir, output_options) for p in paths]
+    workers = workers or os.cpu_count() or 1
+
+    started = time.perf_counter()
+    if workers == 1 or len(jobs) <= 1:
+        results = [_convert_one(*job) for job in jobs]
+    else:
+        results = []
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            futures = [executor.submit(_convert_one, *job) for job in jobs]
+            for future in as_completed(futures):
+                results.append(future.result())
+        results.sort(key=lambda r: r["input"])
+
+    failed = sum(1 for r in results if r["status"] != "ok")
+    return {
+        "total": len(results),
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "seconds": round(time.perf_counter() - started, 4),
+        "results": results,
+    }
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import tempfile
+from importlib.metadata import PackageNotFoundError, version
+
+from .output import write_json
+
+# Taille maximale par défaut du cache sur disque (octets)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def _package_version(name):
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def default_cache_dir():
+    """
+    Renvoie le répertoire de cache par défaut.
+
+    Ordre de résolution : ``$XLSF2SCHEMA_CACHE_DIR``, ``$XDG_CACHE_HOME/xlsF2schema``,
+    puis ``~/.cache/xlsF2schema``.
+    """
+    explicit = os.environ.get("XLSF2SCHEMA_CACHE_DIR")
+    if explicit:
+        return explicit
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "xlsF2schema")
+
+
+def file_digest(path):
+    """
+    Calcule l'empreinte SHA-256 du contenu d'un fichier, lu par blocs.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ConversionCache:
+    """
+    Cache persistant des conversions, adressé par le contenu des fichiers XLSForm.
+
+    Chaque entrée est indexée par l'empreinte SHA-256 du fichier combinée aux versions
+    de xlsF2schema et de pyxform : une mise à jour de l'une ou l'autre invalide donc
+    le cache sans intervention. Le dictionnaire pyxform et les schémas générés sont
+    stockés dans des fichiers JSON distincts. Au-delà de ``max_bytes``, les entrées
+    les moins récemment utilisées sont supprimées.
+
+    :param directory: Répertoire du cache (défaut: :func:`default_cache_dir`)
+    :type directory: str | None
+    :param max_bytes: Taille maximale du cache en octets
+    :type max_bytes: int
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self._versions = f"{_package_version('xlsF2schema')}:{_package_version('pyxform')}"
+
+    def key(self, path):
+        """
+        Renvoie la clé de cache d'un fichier XLSForm.
+        """
+        return hashlib.sha256(f"{file_digest(path)}:{self._versions}".encode()).hexdigest()
+
+    def _entry_path(self, key, kind):
+        return os.path.join(self.directory, f"{key}.{kind}.json")
+
+    def _read(self, key, kind):
+        entry = self._entry_path(key, kind)
+        try:
+            with open(entry, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Marque l'entrée comme récemment utilisée (ordre LRU)
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return data
+
+    def _write(self, key, kind, data):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write_json(data, f, indent=None)
+            os.replace(tmp_path, self._entry_path(key, kind))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    @staticmethod
+    def _survey_kind(loader):
+        return "survey" if loader == "pyxform" else f"survey-{loader}"
+
+    def get_survey(self, key, loader="pyxform"):
+        """
+        Renvoie le dictionnaire XLSForm mis en cache pour un chargeur donné, ou ``None``.
+        """
+        return self._read(key, self._survey_kind(loader))
+
+    def put_survey(self, key, survey_dict, loader="pyxform"):
+        self._write(key, self._survey_kind(loader), survey_dict)
+
+    def get_schema(self, key, variant="default"):
+        """
+        Renvoie le schéma mis en cache pour une variante d'options, ou ``None``.
+        """
+        return self._read(key, f"schema-{variant}")
+
+    def put_schema(self, key, schema, variant="default"):
+        self._write(key, f"schema-{variant}", schema)
+
+    def _entries(self):
+        try:
+            with os.scandir(self.directory) as it:
+                return [e for e in it if e.is_file() and e.name.endswith(".json")]
+        except FileNotFoundError:
+            return []
+
+    def size(self):
+        """
+        Renvoie la taille totale du cache en octets.
+        """
+        return sum(e.stat().st_size for e in self._entries())
+
+    def evict(self):
+        """
+        Supprime les entrées les moins récemment utilisées jusqu'à repasser sous ``max_bytes``.
+        """
+        entries = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in self._entries()]
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        """
+        Vide entièrement le cache. Renvoie le nombre de fichiers supprimés.
+        """
+        removed = 0
+        for entry in self._entries():
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
@@ -1,41 +1,715 @@
 import json
 import argparse
+import os
 import sys
-from pyxform.builder import create_survey_from_path
-from xlsF2schema.core import generate_json_schema
 
-def xlsform_to_dict(path):
+# Les imports lourds (pyxform, openpyxl, jsonschema) sont différés jusqu'à leur première
+# utilisation : une invocation courte de la CLI ne paie que ce dont elle a besoin.
+
+LOADERS = ("pyxform", "native")
+
+def _load(path, loader):
+    from xlsF2schema import profiling
+
+    if loader == "native":
+        from xlsF2schema.reader import read_xlsform
+        with profiling.stage("read_xlsform"):
+            return read_xlsform(path)
+    if loader != "pyxform":
+        raise ValueError(f"Chargeur inconnu : {loader} (attendu : {', '.join(LOADERS)})")
+    with profiling.stage("import_pyxform"):
+        from pyxform.builder import create_survey_from_path
+    with profiling.stage("create_survey_from_path"):
+        survey = create_survey_from_path(path)
+    with profiling.stage("to_json_dict"):
+        return survey.to_json_dict()
+
+def xlsform_to_dict(path, cache=None, loader="pyxform"):
     """
     Transforme un fichier XLSForm en dictionnaire via pyxform.
+
+    :param path: Chemin du fichier XLSForm
+    :param cache: Cache de conversion optionnel ; le parsing pyxform est évité
+        si le contenu du fichier a déjà été converti
+    :type cache: ConversionCache | None
+    :param loader: ``"pyxform"`` (défaut, validation XLSForm complète) ou ``"native"``
+        (lecture directe en streaming des feuilles survey/choices, voir
+        :func:`xlsF2schema.reader.read_xlsform`)
+    :type loader: str
     """
-    survey = create_survey_from_path(path)
-    return survey.to_json_dict()
+    if cache is not None:
+        return _cached_survey(path, cache, cache.key(path), loader)
+    return _load(path, loader)
+
+def _cached_survey(path, cache, key, loader):
+    survey_dict = cache.get_survey(key, loader)
+    if survey_dict is None:
+        survey_dict = _load(path, loader)
+        cache.put_survey(key, survey_dict, loader)
+    return survey_dict
+
+def convert_file(path, use_refs=False, cache=None, loader="pyxform", lookup=None):
+    """
+    Convertit un fichier XLSForm en JSON Schema.
+
+    Avec un cache, une conversion déjà connue ne coûte que le hachage du fichier
+    et la lecture du schéma stocké. Les fichiers de choix externes
+    (``select_one_from_file``) sont cherchés dans le répertoire du formulaire ; les
+    schémas qui en dépendent ne sont pas mis en cache sur disque (seul le dictionnaire
+    XLSForm l'est), les listes elles-mêmes étant gardées en mémoire et relues à chaque
+    modification du fichier.
+
+    :param lookup: Écriture des grandes listes externes en fichiers annexes
+    :type lookup: xlsF2schema.external.LookupFiles | None
+    """
+    from xlsF2schema import profiling
+    from xlsF2schema.core import generate_json_schema
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with profiling.stage("convert_file", loader=loader, cache="off" if cache is None else "miss") as info:
+        if cache is None:
+            return generate_json_schema(xlsform_to_dict(path, loader=loader), use_refs=use_refs, base_dir=base_dir, lookup=lookup)
+
+        from xlsF2schema.external import uses_external_choices
+
+        key = cache.key(path)
+        variant = ("refs" if use_refs else "inline") + ("" if loader == "pyxform" else f"-{loader}")
+        schema = cache.get_schema(key, variant)
+        if schema is not None:
+            info["cache"] = "hit"
+            return schema
+        survey = _cached_survey(path, cache, key, loader)
+        schema = generate_json_schema(survey, use_refs=use_refs, base_dir=base_dir, lookup=lookup)
+        if not uses_external_choices(survey):
+            cache.put_schema(key, schema, variant)
+        return schema
+
+def _cache_enabled(args):
+    if args.no_cache:
+        return False
+    return args.cache or os.environ.get("XLSF2SCHEMA_CACHE", "").lower() in ["1", "yes", "true"]
+
+def _open_cache(args):
+    from xlsF2schema.cache import ConversionCache
+    return ConversionCache(args.cache_dir) if _cache_enabled(args) else None
+
+def _clear_cache(args):
+    from xlsF2schema.cache import ConversionCache
+    return ConversionCache(args.cache_dir).clear()
+
+def _add_conversion_arguments(parser):
+    parser.add_argument("--refs", action="store_true", help="Mutualiser les listes de choix dans 'definitions' et les référencer via $ref")
+    parser.add_argument("--loader", choices=LOADERS, default="pyxform", help="Chargeur XLSForm : pyxform (validation complète, défaut) ou native (lecture directe en streaming, plus rapide)")
+    parser.add_argument("--cache", action="store_true", help="Activer le cache de conversion sur disque (ou XLSF2SCHEMA_CACHE=1)")
+    parser.add_argument("--no-cache", action="store_true", help="Désactiver le cache de conversion, même si XLSF2SCHEMA_CACHE est défini")
+    parser.add_argument("--clear-cache", action="store_true", help="Vider le cache de conversion avant de continuer")
+    parser.add_argument("--cache-dir", help="Répertoire du cache (défaut: $XLSF2SCHEMA_CACHE_DIR ou ~/.cache/xlsF2schema)")
+
+def _add_output_arguments(parser):
+    from xlsF2schema.output import BACKENDS
+
+    parser.add_argument("--compact", action="store_true", help="Écrire le schéma sans indentation")
+    parser.add_argument("--indent", type=int, default=4, help="Nombre d'espaces d'indentation (défaut: 4)")
+    parser.add_argument("--sort-keys", action="store_true", help="Trier les clés des objets")
+    parser.add_argument("--canonical", action="store_true", help="Forme canonique : clés triées, compacte, encodeur standard (octets identiques pour des formulaires identiques)")
+    parser.add_argument("--json-backend", choices=BACKENDS, default="auto", help="Encodeur JSON : auto (orjson s'il est installé et compatible, défaut), json ou orjson")
+
+def _output_options(args):
+    """
+    Renvoie les options d'écriture de :func:`xlsF2schema.output.write_json`.
+    """
+    if args.canonical:
+        return {"indent": None, "sort_keys": True, "backend": "json"}
+    options = {"indent": None if args.compact else args.indent, "sort_keys": args.sort_keys, "backend": args.json_backend}
+    from xlsF2schema.output import resolve_backend
+    resolve_backend(options["backend"], options["indent"])
+    return options
+
+def batch_main(argv):
+    """
+    Sous-commande ``batch`` : conversion parallèle d'un lot de formulaires.
+    """
+    from xlsF2schema.batch import collect_inputs, convert_batch
+
+    parser = argparse.ArgumentParser(prog="xlsF2schema batch", description="Convertir un lot de XLSForms en JSON Schema en parallèle")
+    parser.add_argument("sources", nargs="*", help="Répertoires, fichiers ou motifs glob (ex: 'formulaires/**/*.xlsx')")
+    parser.add_argument("-m", "--manifest", help="Fichier listant un chemin (ou motif) par ligne")
+    parser.add_argument("-d", "--output-dir", required=True, help="Répertoire de sortie des schémas")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Nombre de processus (défaut: nombre de CPU)")
+    parser.add_argument("--report", help="Chemin du rapport JSON (défaut: résumé sur stderr)")
+    _add_conversion_arguments(parser)
+    _add_output_arguments(parser)
+
+    args = parser.parse_args(argv)
+    if not args.sources and not args.manifest:
+        parser.error("au moins une source ou --manifest est requis")
+    try:
+        output_options = _output_options(args)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.clear_cache:
+        _clear_cache(args)
+
+    paths = collect_inputs(args.sources, args.manifest)
+    if not paths:
+        print("Erreur : aucun fichier XLSForm trouvé", file=sys.stderr)
+        sys.exit(1)
+
+    cache = _open_cache(args)
+    cache_dir = cache.directory if cache is not None else None
+    report = convert_batch(paths, args.output_dir, workers=args.jobs, use_refs=args.refs, loader=args.loader, cache_dir=cache_dir, output_options=output_options)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+    for result in report["results"]:
+        if result["status"] != "ok":
+            print(f"Échec : {result['input']} : {result['error']}", file=sys.stderr)
+    print(f"{report['succeeded']}/{report['total']} formulaire(s) converti(s) en {report['seconds']} s dans : {args.output_dir}", file=sys.stderr)
+    if report["failed"]:
+        sys.exit(1)
+
+def load_schema(path, use_refs=False, cache=None, loader="pyxform"):
+    """
+    Charge un JSON Schema existant (.json) ou le génère depuis un XLSForm.
+    """
+    if path.lower().endswith(".json"):
+        from xlsF2schema.external import resolve_lookups
+
+        with open(path, "r", encoding="utf-8") as f:
+            schema = json.load(f)
+        # Les grandes listes externes peuvent être dans des fichiers annexes, à côté du schéma
+        return resolve_lookups(schema, os.path.dirname(os.path.abspath(path)))
+    return convert_file(path, use_refs=use_refs, cache=cache, loader=loader)
+
+def validate_main(argv):
+    """
+    Sous-commande ``validate`` : validation en streaming d'un export de soumissions.
+    """
+    from xlsF2schema.stream import detect_format, validate_stream
+    from xlsF2schema.tabular import TABULAR_EXTENSIONS
+
+    parser = argparse.ArgumentParser(prog="xlsF2schema validate", description="Valider un export de soumissions en streaming (erreurs en JSON Lines)")
+    parser.add_argument("form", help="XLSForm (.xlsx/.xls), JSON Schema déjà généré (.json) ou répertoire de XLSForm (plusieurs formulaires et versions)")
+    parser.add_argument("data", help="Export à valider : document {\"value\": [...]}, tableau JSON, NDJSON ('-' pour stdin) ou export à plat CSV/TSV/XLSX")
+    parser.add_argument("-o", "--output", help="Fichier JSON Lines des erreurs (défaut: stdout)")
+    parser.add_argument("--format", choices=["auto", "json", "ndjson", "table"], default="auto", help="Format de l'export (défaut: d'après l'extension)")
+    parser.add_argument("--separator", default="/", help="Export à plat : séparateur des groupes dans les noms de colonnes (défaut: '/', '-' pour ODK Central)")
+    parser.add_argument("--sheet", default="0", help="Export XLSX : nom ou position de la feuille à valider (défaut: la première)")
+    parser.add_argument("--form-id", help="Avec un répertoire de formulaires : formulaire des soumissions sans _xform_id_string")
+    parser.add_argument("--max-memory", type=int, default=64, metavar="Mo", help="Avec un répertoire de formulaires : mémoire des validateurs compilés gardés en mémoire (défaut: 64 Mo)")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Nombre de processus de validation (défaut: 1)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Nombre de soumissions par lot envoyé aux processus")
+    parser.add_argument("--no-logic", action="store_true", help="Ne pas vérifier les colonnes relevant et constraint du XLSForm")
+    _add_conversion_arguments(parser)
+
+    args = parser.parse_args(argv)
+    cache = _open_cache(args)
+    if args.format == "table" or (args.format == "auto" and args.data.lower().endswith(TABULAR_EXTENSIONS)):
+        _validate_table(args, cache)
+        return
+    fmt = args.format if args.format != "auto" else detect_format(args.data)
+    if os.path.isdir(args.form):
+        _validate_versions(args, cache, fmt)
+        return
+
+    try:
+        survey = None
+        if args.form.lower().endswith(".json") or args.no_logic:
+            schema = load_schema(args.form, use_refs=args.refs, cache=cache, loader=args.loader)
+        else:
+            from xlsF2schema.core import generate_json_schema
+            # Le dictionnaire XLSForm porte les expressions relevant/constraint
+            survey = xlsform_to_dict(args.form, cache=cache, loader=args.loader)
+            schema = generate_json_schema(survey, use_refs=args.refs, base_dir=os.path.dirname(os.path.abspath(args.form)))
+        data = sys.stdin if args.data == "-" else open(args.data, "r", encoding="utf-8")
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            summary = validate_stream(data, schema, out, fmt=fmt, workers=args.jobs, batch_size=args.batch_size, survey=survey)
+        finally:
+            if data is not sys.stdin:
+                data.close()
+            if out is not sys.stdout:
+                out.close()
+    except Exception as e:
+        print(f"Erreur : {e}", file=sys.stderr)
+        sys.exit(2)
+
+    print(f"{summary['records']} soumission(s), {summary['invalid']} invalide(s), {summary['errors']} erreur(s)", file=sys.stderr)
+    if summary["invalid"]:
+        sys.exit(1)
+
+def _validate_table(args, cache):
+    """
+    ``validate`` sur un export à plat : validation vectorisée par colonne (pandas).
+    """
+    from xlsF2schema.tabular import read_table, TabularValidator
+
+    if args.form.lower().endswith(".json"):
+        print("Erreur : la validation d'un export à plat nécessite le XLSForm (noms de colonnes et groupes)", file=sys.stderr)
+        sys.exit(2)
+    try:
+        survey = xlsform_to_dict(args.form, cache=cache, loader=args.loader)
+        validator = TabularValidator(survey, separator=args.separator, base_dir=os.path.dirname(os.path.abspath(args.form)))
+        sheet = int(args.sheet) if args.sheet.isdigit() else args.sheet
+        frame = read_table(args.data, sheet=sheet)
+        violations = validator.validate(frame)
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            for record in violations.to_dict("records"):
+                out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    except Exception as e:
+        print(f"Erreur : {e}", file=sys.stderr)
+        sys.exit(2)
+
+    invalid = violations["index"].nunique()
+    print(f"{len(frame)} soumission(s), {invalid} invalide(s), {len(violations)} erreur(s)", file=sys.stderr)
+    if invalid:
+        sys.exit(1)
+
+def _validate_versions(args, cache, fmt):
+    """
+    ``validate`` avec un répertoire de formulaires : chaque soumission est validée par la
+    version de formulaire désignée par ses champs ``_xform_id_string`` et ``__version__``.
+    """
+    from xlsF2schema.registry import ValidatorRegistry
+
+    registry = ValidatorRegistry(
+        max_bytes=args.max_memory * 1024 * 1024, use_refs=args.refs, loader=args.loader, cache=cache,
+        logic=not args.no_logic, default_form_id=args.form_id,
+    )
+    try:
+        keys, failures = registry.warm(args.form, build=False)
+        for path, error in failures.items():
+            print(f"Échec : {path} : {error}", file=sys.stderr)
+        if not keys:
+            raise ValueError(f"Aucun XLSForm dans : {args.form}")
+        data = sys.stdin if args.data == "-" else open(args.data, "r", encoding="utf-8")
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            summary = registry.validate_stream(data, out, fmt=fmt)
+        finally:
+            if data is not sys.stdin:
+                data.close()
+            if out is not sys.stdout:
+                out.close()
+    except Exception as e:
+        print(f"Erreur : {e}", file=sys.stderr)
+        sys.exit(2)
+
+    stats = registry.stats()
+    print(f"{summary['records']} soumission(s), {summary['invalid']} invalide(s), {summary['errors']} erreur(s) ; "
+          f"{stats['forms']} version(s) de formulaire, {stats['builds']} compilation(s), {stats['evictions']} éviction(s)", file=sys.stderr)
+    if summary["invalid"]:
+        sys.exit(1)
+
+def _load_version(path, loader, cache):
+    """
+    Charge une version de formulaire : renvoie ``(survey_dict, schema)`` dont l'un peut être ``None``.
+    """
+    if not path.lower().endswith(".json"):
+        return xlsform_to_dict(path, cache=cache, loader=loader), None
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    # Un dictionnaire XLSForm a des "children", un schéma a des "properties"
+    if "children" in data:
+        return data, None
+    return None, data
+
+def diff_main(argv):
+    """
+    Sous-commande ``diff`` : mise à jour incrémentale d'un schéma et JSON Patch entre deux versions.
+    """
+    from xlsF2schema.diff import update_schema
+
+    parser = argparse.ArgumentParser(prog="xlsF2schema diff", description="Mettre à jour un schéma entre deux versions d'un formulaire et produire un JSON Patch (RFC 6902)")
+    parser.add_argument("old", help="Ancienne version : XLSForm, dictionnaire XLSForm (.json) ou schéma déjà généré (.json)")
+    parser.add_argument("new", help="Nouvelle version : XLSForm ou dictionnaire XLSForm (.json)")
+    parser.add_argument("--old-schema", help="Schéma déjà généré pour l'ancienne version (évite de le régénérer)")
+    parser.add_argument("-o", "--output", help="Fichier du nouveau schéma complet")
+    parser.add_argument("-p", "--patch", help="Fichier du JSON Patch (défaut: stdout si -o est absent)")
+    _add_conversion_arguments(parser)
+    _add_output_arguments(parser)
+
+    args = parser.parse_args(argv)
+    try:
+        output_options = _output_options(args)
+    except ValueError as e:
+        parser.error(str(e))
+    cache = _open_cache(args)
+
+    try:
+        old_survey, old_schema = _load_version(args.old, args.loader, cache)
+        new_survey, new_schema = _load_version(args.new, args.loader, cache)
+        if new_survey is None:
+            raise ValueError("la nouvelle version doit être un XLSForm ou un dictionnaire XLSForm")
+        if args.old_schema:
+            with open(args.old_schema, "r", encoding="utf-8") as f:
+                old_schema = json.load(f)
+
+        base_dir = os.path.dirname(os.path.abspath(args.new))
+        schema, patch, stats = update_schema(new_survey, old_survey, old_schema, use_refs=args.refs, base_dir=base_dir)
 
-def main():
-    parser = argparse.ArgumentParser(description="Convertir un XLSForm en JSON Schema via pyxform")
-    parser.add_argument("input", help="Chemin vers le fichier XLSForm (.xlsx ou .xls)")
-    parser.add_argument("-o", "--output", help="Chemin du fichier JSON Schema de sortie (défaut: affiche sur stdout)")
-    
-    args = parser.parse_args()
-    
-    try:
-        # 1. Charger le fichier et transformer en dict
-        xlsform_dict = xlsform_to_dict(args.input)
-        
-        # 2. Dégager le schéma
-        schema = generate_json_schema(xlsform_dict)
-        
-        # 3. Sortie
         if args.output:
-            with open(args.output, "w", encoding="utf-8") as f:
-                json.dump(schema, f, indent=4, ensure_ascii=False)
-            print(f"Schéma généré avec succès dans : {args.output}")
+            from xlsF2schema.output import write_json
+            with open(args.output, "wb") as f:
+                write_json(schema, f, **output_options)
+        if args.patch:
+            with open(args.patch, "w", encoding="utf-8") as f:
+                json.dump(patch, f, indent=4, ensure_ascii=False)
+        elif not args.output:
+            print(json.dumps(patch, indent=4, ensure_ascii=False))
+    except Exception as e:
+        print(f"Erreur : {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"{len(patch)} opération(s) ; {stats['reused']} élément(s) repris, {stats['regenerated']} régénéré(s)", file=sys.stderr)
+
+def daemon_main(argv):
+    """
+    Sous-commande ``daemon`` : gestion du processus de conversion persistant.
+    """
+    from xlsF2schema import daemon
+
+    parser = argparse.ArgumentParser(prog="xlsF2schema daemon", description="Garder pyxform et les tables de mapping chargés dans un processus persistant (socket Unix)")
+    parser.add_argument("action", choices=["start", "stop", "status", "serve"], help="serve lance le démon au premier plan")
+    parser.add_argument("--socket", help="Chemin du socket (défaut: $XLSF2SCHEMA_SOCKET, $XDG_RUNTIME_DIR/xlsF2schema.sock ou répertoire temporaire)")
+    parser.add_argument("--idle-timeout", type=float, default=daemon.DEFAULT_IDLE_TIMEOUT, help="Arrêt après ce nombre de secondes sans requête (0 : jamais)")
+
+    args = parser.parse_args(argv)
+    path = args.socket or daemon.default_socket_path()
+
+    try:
+        if args.action == "serve":
+            daemon.serve(path, idle_timeout=args.idle_timeout)
+        elif args.action == "start":
+            if daemon.is_running(path):
+                print(f"Démon déjà actif sur : {path}", file=sys.stderr)
+                return
+            pid = daemon.start(path, idle_timeout=args.idle_timeout)
+            print(f"Démon démarré (pid {pid}) sur : {path}", file=sys.stderr)
+        elif args.action == "stop":
+            stopped = daemon.stop(path)
+            print("Démon arrêté" if stopped else f"Aucun démon sur : {path}", file=sys.stderr)
+        else:
+            try:
+                status = daemon.request({"op": "ping"}, path, timeout=2)
+            except daemon.DaemonUnavailable:
+                print(f"Aucun démon sur : {path}", file=sys.stderr)
+                sys.exit(1)
+            print(json.dumps(status))
+    except Exception as e:
+        print(f"Erreur : {e}", file=sys.stderr)
+        sys.exit(1)
+
+def _daemon_enabled(args):
+    if args.no_daemon:
+        return False
+    return args.daemon or os.environ.get("XLSF2SCHEMA_DAEMON", "").lower() in ["1", "yes", "true"]
+
+def _convert_via_daemon(args, cache):
+    """
+    Convertit via le démon s'il répond ; renvoie None sinon (conversion locale).
+    """
+    from xlsF2schema import daemon
+
+    try:
+        return daemon.convert(
+            args.input, use_refs=args.refs, loader=args.loader,
+            cache_dir=cache.directory if cache is not None else None,
+        )
+    except daemon.DaemonUnavailable:
+        return None
+
+def serve_main(argv):
+    """
+    Sous-commande ``serve`` : service HTTP local de conversion et de validation.
+    """
+    from xlsF2schema import server
+
+    parser = argparse.ArgumentParser(prog="xlsF2schema serve", description="Service HTTP local : conversion de XLSForms et validation de soumissions")
+    parser.add_argument("--host", default="127.0.0.1", help="Adresse d'écoute (défaut: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="Port d'écoute (défaut: 8000)")
+    parser.add_argument("-j", "--jobs", type=int, default=2, help="Processus de conversion pyxform (défaut: 2)")
+    parser.add_argument("--max-queue", type=int, default=16, help="Conversions en attente avant de répondre 503 (défaut: 16)")
+    parser.add_argument("--forms", type=int, default=128, help="Nombre de formulaires compilés gardés en mémoire (LRU, défaut: 128)")
+    parser.add_argument("--max-body", type=int, default=server.DEFAULT_MAX_BODY, help="Taille maximale d'une requête en octets")
+    parser.add_argument("--cache", action="store_true", help="Activer aussi le cache de conversion sur disque (ou XLSF2SCHEMA_CACHE=1)")
+    parser.add_argument("--no-cache", action="store_true", help="Désactiver le cache de conversion sur disque")
+    parser.add_argument("--cache-dir", help="Répertoire du cache (défaut: $XLSF2SCHEMA_CACHE_DIR ou ~/.cache/xlsF2schema)")
+
+    args = parser.parse_args(argv)
+    cache = _open_cache(args)
+    print(f"Service xlsF2schema sur http://{args.host}:{args.port}", file=sys.stderr)
+    server.serve(
+        args.host, args.port, workers=args.jobs, max_queue=args.max_queue, cache_size=args.forms,
+        cache_dir=cache.directory if cache is not None else None, max_body=args.max_body,
+    )
+
+def generate_main(argv):
+    """
+    Sous-commande ``generate`` : soumissions synthétiques conformes à un formulaire.
+    """
+    parser = argparse.ArgumentParser(prog="xlsF2schema generate", description="Générer des soumissions synthétiques valides pour un XLSForm (tests de charge)")
+    parser.add_argument("form", help="XLSForm (.xlsx/.xls)")
+    parser.add_argument("-n", "--count", type=int, default=1000, help="Nombre de soumissions (défaut: 1000)")
+    parser.add_argument("-o", "--output", help="Fichier de sortie (défaut: stdout)")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson", help="NDJSON (défaut) ou export à plat CSV (sans les répétitions)")
+    parser.add_argument("--seed", type=int, help="Graine du générateur (soumissions reproductibles)")
+    parser.add_argument("--null-rate", type=float, default=0.1, help="Proportion de réponses vides des champs facultatifs (défaut: 0.1)")
+    parser.add_argument("--repeats", type=int, nargs=2, default=(0, 3), metavar=("MIN", "MAX"), help="Nombre d'occurrences de chaque répétition (défaut: 0 3)")
+    parser.add_argument("--separator", default="/", help="CSV : séparateur des groupes dans les noms de colonnes (défaut: '/')")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Nombre de soumissions générées par lot")
+    _add_conversion_arguments(parser)
+
+    args = parser.parse_args(argv)
+    cache = _open_cache(args)
+
+    try:
+        from xlsF2schema.synthetic import SubmissionGenerator
+
+        generator = SubmissionGenerator(
+            xlsform_to_dict(args.form, cache=cache, loader=args.loader), seed=args.seed, null_rate=args.null_rate,
+            repeat_range=tuple(args.repeats), base_dir=os.path.dirname(os.path.abspath(args.form)),
+        )
+        if args.format == "csv":
+            f = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+            try:
+                count = generator.write_csv(f, args.count, separator=args.separator, batch_size=args.batch_size)
+            finally:
+                if args.output:
+                    f.close()
         else:
-            print(json.dumps(schema, indent=4, ensure_ascii=False))
-            
+            f = open(args.output, "wb") if args.output else sys.stdout.buffer
+            try:
+                count = generator.write_ndjson(f, args.count, batch_size=args.batch_size)
+            finally:
+                if args.output:
+                    f.close()
     except Exception as e:
         print(f"Erreur : {e}", file=sys.stderr)
         sys.exit(1)
 
+    print(f"{count} soumission(s) générée(s)", file=sys.stderr)
+
+def watch_main(argv):
+    """
+    Sous-commande ``watch`` : reconversion continue des formulaires modifiés d'un répertoire.
+    """
+    from xlsF2schema import watch
+
+    parser = argparse.ArgumentParser(prog="xlsF2schema watch", description="Surveiller un répertoire de XLSForms et ne reconvertir que les formulaires dont le contenu a changé")
+    parser.add_argument("directory", help="Répertoire des XLSForms (parcouru récursivement)")
+    parser.add_argument("-d", "--output-dir", required=True, help="Répertoire de sortie des schémas")
+    parser.add_argument("-j", "--jobs", type=int, default=2, help="Processus de conversion (défaut: 2)")
+    parser.add_argument("--debounce", type=float, default=watch.DEFAULT_DEBOUNCE, help="Secondes sans modification avant de reconvertir un fichier (défaut: 2)")
+    parser.add_argument("--interval", type=float, default=watch.DEFAULT_INTERVAL, help="Secondes entre deux parcours du répertoire (défaut: 1)")
+    parser.add_argument("--manifest", help="Manifeste des empreintes (défaut: <output-dir>/.xlsF2schema-manifest.json)")
+    parser.add_argument("--prune", action="store_true", help="Supprimer le schéma d'un formulaire supprimé")
+    parser.add_argument("--once", action="store_true", help="Mettre les schémas à jour une fois puis quitter (remplace une tâche cron)")
+    _add_conversion_arguments(parser)
+    _add_output_arguments(parser)
+
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.directory):
+        parser.error(f"répertoire introuvable : {args.directory}")
+    try:
+        output_options = _output_options(args)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.clear_cache:
+        _clear_cache(args)
+    cache = _open_cache(args)
+
+    def report(result):
+        if result["status"] == "ok":
+            print(f"Converti : {result['input']} -> {result['output']} ({result['seconds']} s)", file=sys.stderr)
+        elif result["status"] == "removed":
+            print(f"Supprimé : {result['input']}", file=sys.stderr)
+        else:
+            print(f"Échec : {result['input']} : {result['error']}", file=sys.stderr)
+
+    watcher = watch.FormWatcher(
+        args.directory, args.output_dir, workers=args.jobs, use_refs=args.refs, loader=args.loader,
+        cache_dir=cache.directory if cache is not None else None, output_options=output_options,
+        debounce=args.debounce, interval=args.interval, manifest=args.manifest, prune=args.prune, on_result=report,
+    )
+    if args.once:
+        try:
+            results = watcher.sync()
+        finally:
+            watcher.close()
+        failed = sum(1 for r in results if r["status"] == "error")
+        print(f"{len(results)} formulaire(s) mis à jour, {failed} échec(s)", file=sys.stderr)
+        if failed:
+            sys.exit(1)
+        return
+    print(f"Surveillance de : {args.directory} (Ctrl+C pour arrêter)", file=sys.stderr)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+
+def ingest_main(argv):
+    """
+    Sous-commande ``ingest`` : chargement d'un export de soumissions en tables Parquet/Arrow.
+    """
+    from xlsF2schema.stream import detect_format
+
+    parser = argparse.ArgumentParser(prog="xlsF2schema ingest", description="Charger un export de soumissions dans une table Parquet (ou Arrow) par section : soumissions, puis une table par répétition")
+    parser.add_argument("form", help="XLSForm (.xlsx/.xls)")
+    parser.add_argument("data", help="Export : document {\"value\": [...]}, tableau JSON ou NDJSON ('-' pour stdin)")
+    parser.add_argument("-d", "--output-dir", required=True, help="Répertoire des tables")
+    parser.add_argument("--output-format", choices=["parquet", "arrow"], default="parquet", help="Parquet (défaut) ou Arrow IPC en flux (.arrows)")
+    parser.add_argument("--format", choices=["auto", "json", "ndjson"], default="auto", help="Format de l'export (défaut: d'après l'extension)")
+    parser.add_argument("--separator", default="/", help="Séparateur des groupes dans les noms de colonnes et de tables (défaut: '/')")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Nombre de processus de conversion (défaut: 1)")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Nombre de soumissions converties par lot")
+    parser.add_argument("--row-group-size", type=int, default=100000, help="Parquet : nombre de lignes par groupe")
+    parser.add_argument("--compression", help="Parquet : codec de compression (snappy, zstd, gzip, none...)")
+    _add_conversion_arguments(parser)
+
+    args = parser.parse_args(argv)
+    cache = _open_cache(args)
+    fmt = args.format if args.format != "auto" else detect_format(args.data)
+
+    try:
+        from xlsF2schema.ingest import ingest_stream
+
+        survey = xlsform_to_dict(args.form, cache=cache, loader=args.loader)
+        data = sys.stdin if args.data == "-" else open(args.data, "r", encoding="utf-8")
+        try:
+            summary = ingest_stream(
+                data, survey, args.output_dir, fmt=fmt, format=args.output_format, workers=args.jobs,
+                batch_size=args.batch_size, separator=args.separator, base_dir=os.path.dirname(os.path.abspath(args.form)),
+                row_group_size=args.row_group_size, compression=args.compression,
+            )
+        finally:
+            if data is not sys.stdin:
+                data.close()
+    except Exception as e:
+        print(f"Erreur : {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for name, table in summary["tables"].items():
+        print(f"{name} : {table['rows']} ligne(s) -> {table['path']}", file=sys.stderr)
+    print(f"{summary['records']} soumission(s) chargée(s)", file=sys.stderr)
+
+COMMANDS = {
+    "batch": batch_main,
+    "validate": validate_main,
+    "diff": diff_main,
+    "daemon": daemon_main,
+    "serve": serve_main,
+    "generate": generate_main,
+    "watch": watch_main,
+    "ingest": ingest_main,
+}
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
+
+    parser = argparse.ArgumentParser(
+        description="Convertir un XLSForm en JSON Schema via pyxform",
+        epilog=f"Sous-commandes : {', '.join(COMMANDS)} (xlsF2schema <sous-commande> -h)",
+    )
+    parser.add_argument("input", nargs="?", help="Chemin vers le fichier XLSForm (.xlsx ou .xls)")
+    parser.add_argument("-o", "--output", help="Chemin du fichier JSON Schema de sortie (défaut: affiche sur stdout)")
+    parser.add_argument("--daemon", action="store_true", help="Déléguer la conversion au démon s'il est actif (ou XLSF2SCHEMA_DAEMON=1), sinon convertir localement")
+    parser.add_argument("--no-daemon", action="store_true", help="Ne pas utiliser le démon, même si XLSF2SCHEMA_DAEMON est défini")
+    parser.add_argument("--profile", nargs="?", const="-", metavar="FICHIER", help="Mesurer chaque étape (chargement, parcours, mapping, sérialisation) et écrire les statistiques en JSON (défaut: stderr)")
+    parser.add_argument("--profile-memory", action="store_true", help="Avec --profile, mesurer aussi les pics d'allocation (tracemalloc, plus lent)")
+    parser.add_argument("--cprofile", metavar="FICHIER", help="Écrire un profil cProfile de la conversion (lisible par pstats ou snakeviz)")
+    parser.add_argument("--lookup-threshold", type=int, metavar="N", help="Écrire les listes de choix externes (select_one_from_file) d'au moins N valeurs dans des fichiers annexes référencés par $ref")
+    parser.add_argument("--lookup-dir", help="Répertoire des fichiers annexes (défaut: celui du schéma de sortie)")
+    _add_conversion_arguments(parser)
+    _add_output_arguments(parser)
+
+    args = parser.parse_args(argv)
+    try:
+        args.output_options = _output_options(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.clear_cache:
+        removed = _clear_cache(args)
+        print(f"Cache vidé : {removed} fichier(s) supprimé(s)", file=sys.stderr)
+        if not args.input:
+            return
+    if not args.input:
+        parser.error("l'argument input est requis")
+
+    cache = _open_cache(args)
+
+    if args.profile or args.cprofile:
+        from xlsF2schema.profiling import Profiler
+        profiler = Profiler(trace_memory=args.profile_memory, cprofile=args.cprofile)
+    else:
+        profiler = None
+
+    try:
+        if profiler is None:
+            _convert_and_write(args, cache)
+        else:
+            with profiler:
+                _convert_and_write(args, cache)
+            if args.profile:
+                _write_profile(args, profiler)
+
+    except Exception as e:
+        print(f"Erreur : {e}", file=sys.stderr)
+        sys.exit(1)
+
+def _convert_and_write(args, cache):
+    from xlsF2schema import profiling
+
+    # 1. Charger le fichier, le transformer en dict et dégager le schéma
+    # (le profilage mesure une conversion locale et les fichiers annexes sont écrits
+    # localement : le démon est alors ignoré)
+    lookup = None
+    if args.lookup_threshold is not None:
+        from xlsF2schema.external import LookupFiles
+        schema_dir = os.path.dirname(os.path.abspath(args.output)) if args.output else os.getcwd()
+        lookup = LookupFiles(args.lookup_dir or schema_dir, args.lookup_threshold, ref_base=schema_dir)
+    use_daemon = _daemon_enabled(args) and not profiling.active() and lookup is None
+    schema = _convert_via_daemon(args, cache) if use_daemon else None
+    if schema is None:
+        schema = convert_file(args.input, use_refs=args.refs, cache=cache, loader=args.loader, lookup=lookup)
+
+    # 2. Sortie, écrite en flux directement dans le fichier (ou sur stdout)
+    from xlsF2schema.output import write_json
+
+    if args.output:
+        with open(args.output, "wb") as f, profiling.stage("serialize") as info:
+            info["bytes"] = write_json(schema, f, **args.output_options)
+        print(f"Schéma généré avec succès dans : {args.output}")
+    else:
+        sys.stdout.flush()
+        out = getattr(sys.stdout, "buffer", sys.stdout)
+        with profiling.stage("serialize") as info:
+            info["bytes"] = write_json(schema, out, **args.output_options)
+        out.write(b"\n" if out is not sys.stdout else "\n")
+        out.flush()
+
+def _write_profile(args, profiler):
+    import platform
+
+    report = profiler.report(
+        input=args.input,
+        loader=args.loader,
+        refs=args.refs,
+        python=platform.python_version(),
+    )
+    if args.profile == "-":
+        print(json.dumps(report, indent=4, ensure_ascii=False), file=sys.stderr)
+    else:
+        with open(args.profile, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+
 if __name__ == "__main__":
     main()
@@ -1,13 +1,231 @@
-from .mapping import get_comprehensive_mapping
+from time import perf_counter
 
-def generate_json_schema(xlsform_dict_data:dict):
+from . import profiling
+from .logic import constraint_keywords, section_rules
+from .mapping import ChoiceResolver, get_comprehensive_mapping, _escape_pointer
+
+_SECTION_TYPES = ("group", "repeat")
+
+# Pointeur JSON des propriétés d'une soumission dans l'enveloppe
+RECORD_POINTER = "/properties/value/items"
+
+
+def is_required(item):
     """
-    Génère un JSON Schema à partir d'un dictionnaire XLSForm (pyxform).
+    Indique si un élément XLSForm est marqué comme obligatoire (``bind.required``).
     """
-    survey_tab = xlsform_dict_data.get("children", [])
-    choices_tab = xlsform_dict_data.get("choices", {})
+    return str(item.get("bind", {}).get("required")).lower() in ["yes", "true"]
+
+
+def field_schema(item, choices_tab, required=None):
+    """
+    Renvoie le schéma d'un champ (hors groupes et répétitions), nullable s'il n'est pas obligatoire.
+
+    :param required: Si faux, le champ n'est obligatoire que sous condition (voir
+        :func:`xlsF2schema.logic.section_rules`) : comme un champ facultatif, son schéma
+        accepte ``null`` et ne reçoit pas les mots-clés de chaîne de sa contrainte ;
+        par défaut ``bind.required``
+    :type required: bool | None
+    """
+    if required is None:
+        required = is_required(item)
+    if profiling.active():
+        started = perf_counter()
+        schema = get_comprehensive_mapping(item, choices_tab)
+        profiling.accumulate("get_comprehensive_mapping", perf_counter() - started)
+    else:
+        schema = get_comprehensive_mapping(item, choices_tab)
+
+    # Les parties de la contrainte exprimables en JSON Schema (bornes, pattern, longueurs) ;
+    # la condition d'affichage (relevant) est traduite au niveau de la section, voir section_rules
+    constraint = item.get("bind", {}).get("constraint")
+    if constraint:
+        schema.update(constraint_keywords(constraint, schema, required))
+
+    # Autoriser null pour que les champs non obligatoires correspondent aux ensembles de données en utilisant des valeurs nulles explicites
+    if not required:
+        t = schema.get("type")
+        if isinstance(t, str):
+            schema["type"] = [t, "null"]
+        elif isinstance(t, list):
+            if "null" not in t:
+                schema["type"] = t + ["null"]
+        else:
+            # If no type specified, default to allowing null
+            schema["type"] = ["string", "null"]
+    return schema
+
+
+def required_names(items):
+    """
+    Renvoie, dans l'ordre du formulaire, les noms des champs obligatoires d'une liste
+    d'éléments (les groupes et répétitions ne sont jamais obligatoires). Un champ dont la
+    condition d'affichage est traduite n'y figure pas : il est obligatoire sous condition
+    (voir :func:`xlsF2schema.logic.section_rules`).
+    """
+    return section_rules(items)[0]
+
+
+def apply_section_rules(body, items):
+    """
+    Renseigne ``required`` et les règles conditionnelles (``allOf``) de l'objet ``body``
+    portant les propriétés d'une liste d'éléments ; renvoie les champs obligatoires.
+    """
+    required, conditions = section_rules(items)
+    body["required"].extend(required)
+    if conditions:
+        body["allOf"] = conditions
+    return required
+
 
-    # Dictionnaire schema qui va accueillir les propriétés et les champs extraits de xlsform_dict_data
+def walk_items(items, choices_tab, pointer=RECORD_POINTER, pointers=True, required=None):
+    """
+    Parcourt une liste d'éléments XLSForm en profondeur, dans l'ordre du formulaire,
+    et produit le schéma de chaque élément.
+
+    Le parcours utilise une pile explicite : sa profondeur n'est pas limitée par la
+    pile d'appels Python. Les sections (groupes et répétitions) sont produites avant
+    leurs enfants, sous forme de coquilles dont ``required`` est déjà calculé et dont
+    ``properties`` est vide ; rien n'est rattaché automatiquement, l'appelant décide
+    d'assembler l'arbre ou de consommer les nœuds au fil de l'eau.
+
+    :param items: Éléments XLSForm (``children``)
+    :type items: list[dict]
+    :param choices_tab: Listes de choix de la conversion
+    :type choices_tab: ChoiceResolver
+    :param pointer: Pointeur JSON de l'objet contenant ``items``
+    :type pointer: str
+    :param pointers: Si faux, les pointeurs ne sont pas calculés (``None``)
+    :type pointers: bool
+    :param required: Champs obligatoires de ``items`` s'ils sont déjà calculés
+        (voir :func:`required_names`)
+    :type required: list[str] | None
+    :return: Générateur de ``(pointeur, nom, schéma, parent)`` où ``parent`` est
+        l'objet (coquille de section, ou ``None`` au premier niveau) dont
+        ``properties`` doit recevoir le schéma
+    """
+    if required is None:
+        required = required_names(items)
+    stack = [(iter(items), pointer, None, set(required))]
+    while stack:
+        children, parent_pointer, parent, section_required = stack[-1]
+        item = next(children, None)
+        if item is None:
+            stack.pop()
+            continue
+
+        name = item.get("name")
+        if not name:
+            continue
+        item_type = item.get("type", "")
+        item_pointer = f"{parent_pointer}/properties/{_escape_pointer(name)}" if pointers else None
+
+        if item_type in _SECTION_TYPES:
+            schema = section_schema(item_type)[0]
+            sub_items = item.get("children", [])
+            sub_required = apply_section_rules(section_body(schema), sub_items)
+            prune_required(schema)
+            yield item_pointer, name, schema, parent
+            if sub_items:
+                child_pointer = None
+                if pointers:
+                    child_pointer = f"{item_pointer}/items" if item_type == "repeat" else item_pointer
+                stack.append((iter(sub_items), child_pointer, section_body(schema), set(sub_required)))
+        else:
+            # Field mapping
+            yield item_pointer, name, field_schema(item, choices_tab, name in section_required), parent
+
+
+def process_items(items, properties_dict, required_list, choices_tab):
+    """
+    Traite une liste d'éléments et les structure dans un format de dictionnaire imbriqué
+    représentant leur schéma, y compris leur type, leurs propriétés, leurs champs obligatoires
+    et d'autres attributs. Gère différents types d'éléments tels que les groupes et les champs répétables
+    , en traitant leurs enfants à l'aide de :func:`walk_items` (sans récursion, quelle que soit la profondeur).
+
+    :param items:
+        La liste des éléments à traiter. Chaque élément de la liste doit être un dictionnaire
+        avec des clés telles que « type », « nom » et « enfants » (facultatif).
+    :type items: list[dict]
+
+    :param properties_dict:
+        Un dictionnaire qui sera rempli avec le schéma des éléments fournis.
+        Les clés sont les noms d'éléments et les valeurs sont leur schéma correspondant.
+    :type properties_dict: dict
+
+    :param required_list:
+        Une liste qui sera remplie avec les noms des éléments marqués comme
+        requis.
+    :type required_list: list
+
+    :param choices_tab:
+        Les listes de choix du formulaire, partagées par tous les champs de la conversion.
+    :type choices_tab: ChoiceResolver
+
+    :return:
+        Les règles conditionnelles des éléments (voir :func:`xlsF2schema.logic.section_rules`),
+        calculées avec les champs obligatoires. `properties_dict` et `required_list` sont
+        modifiés en place.
+    :rtype: list[dict]
+    """
+    with profiling.stage("process_items") as info:
+        required, conditions = section_rules(items)
+        required_list.extend(required)
+        nodes = 0
+        for _, name, schema, parent in walk_items(items, choices_tab, pointers=False, required=required):
+            nodes += 1
+            if parent is None:
+                properties_dict[name] = schema
+            else:
+                parent["properties"][name] = schema
+        info["nodes"] = nodes
+    return conditions
+
+
+def section_schema(item_type):
+    """
+    Crée le schéma vide d'un groupe (objet) ou d'une répétition (tableau d'objets).
+
+    :return: ``(schema, properties, required)`` où ``properties`` et ``required``
+        sont les emplacements des enfants de la section
+    :rtype: tuple[dict, dict, list]
+    """
+    sub_props = {}
+    sub_required = []
+    body = {
+        "type": "object",
+        "properties": sub_props,
+        "required": sub_required
+    }
+    if item_type == "repeat":
+        return {"type": "array", "items": body}, sub_props, sub_required
+    return body, sub_props, sub_required
+
+
+def section_body(schema):
+    """
+    Renvoie l'objet portant ``properties`` d'un schéma de groupe ou de répétition.
+    """
+    return schema["items"] if schema.get("type") == "array" else schema
+
+
+def prune_required(schema):
+    """
+    Retire la clé ``required`` d'une section si aucun enfant n'est obligatoire.
+    """
+    body = section_body(schema)
+    if not body.get("required"):
+        body.pop("required", None)
+
+
+def schema_envelope():
+    """
+    Renvoie l'enveloppe du schéma (tableau ``value`` de soumissions) et les emplacements
+    où ajouter les propriétés et les champs obligatoires d'une soumission.
+
+    :return: ``(schema, properties, required)``
+    :rtype: tuple[dict, dict, list]
+    """
     schema = {
         "$schema": "http://json-schema.org/draft-07/schema#",
         "type": "object",
@@ -22,103 +240,90 @@ def generate_json_schema(xlsform_dict_data:dict):
             }
         }
     }
-    # Endroits du dict schema où ajouter les propriétés et les champs obligatoires extraits de xlsform_dict_data
-    target_properties = schema["properties"]["value"]["items"]["properties"]
-    target_required = schema["properties"]["value"]["items"]["required"]
-
-    def process_items(items, properties_dict, required_list):
-        """
-        Traite une liste d'éléments et les structure dans un format de dictionnaire imbriqué
-        représentant leur schéma, y compris leur type, leurs propriétés, leurs champs obligatoires
-        et d'autres attributs. Gère différents types d'éléments tels que les groupes et les champs répétables
-        , en traitant de manière récursive les enfants s'ils sont présents.
-
-        :param items:
-            La liste des éléments à traiter. Chaque élément de la liste doit être un dictionnaire
-            avec des clés telles que « type », « nom » et « enfants » (facultatif).
-        :type items: list[dict]
-
-        :param properties_dict:
-            Un dictionnaire qui sera rempli avec le schéma des éléments fournis.
-            Les clés sont les noms d'éléments et les valeurs sont leur schéma correspondant.
-        :type properties_dict: dict
-
-        :param required_list:
-            Une liste qui sera remplie avec les noms des éléments marqués comme
-            requis.
-        :type required_list: list
-
-        :return:
-            Cette fonction ne renvoie pas de valeur. Il modifie `properties_dict` et
-            `required_list` en place.
-        :rtype: None
-        """
-
-        for item in items:
-            item_type = item.get("type", "")
-            name = item.get("name")
-            if not name:
-                continue
-
-            if item_type == "group":
-                sub_props = {}
-                sub_required = []
-                properties_dict[name] = {
-                    "type": "object",
-                    "properties": sub_props,
-                    "required": sub_required
-                }
-                if "children" in item:
-                    process_items(item["children"], sub_props, sub_required)
-                if not sub_required:
-                    properties_dict[name].pop("required")
-
-            elif item_type == "repeat":
-                sub_props = {}
-                sub_required = []
-                properties_dict[name] = {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": sub_props,
-                        "required": sub_required
-                    }
-                }
-                if "children" in item:
-                    process_items(item["children"], sub_props, sub_required)
-                if not sub_required:
-                    properties_dict[name]["items"].pop("required")
+    items = schema["properties"]["value"]["items"]
+    return schema, items["properties"], items["required"]
 
-            else:
-                # Field mapping
-                field_schema = get_comprehensive_mapping(item, choices_tab)
-                is_required = str(item.get("bind", {}).get("required")).lower() in ["yes", "true"]
-
-                #Todo à traiter
-                relevant = item.get("bind", {}).get("relevant")
-                constraint = item.get("bind", {}).get("constraint")
-
-                # Autoriser null pour que les champs non obligatoires correspondent aux ensembles de données en utilisant des valeurs nulles explicites
-                if not is_required:
-                    t = field_schema.get("type")
-                    if isinstance(t, str):
-                        field_schema["type"] = [t, "null"]
-                    elif isinstance(t, list):
-                        if "null" not in t:
-                            field_schema["type"] = t + ["null"]
-                    else:
-                        # If no type specified, default to allowing null
-                        field_schema["type"] = ["string", "null"]
-
-                properties_dict[name] = field_schema
-
-                if is_required:
-                    required_list.append(name)
-
-    process_items(survey_tab, target_properties, target_required)
-
-    # Si target_required est vide alors on soustrait la clé required du schema (ce n'est pas obligatoire)
-    if not target_required:
+
+def finalize_schema(schema, choices_tab):
+    """
+    Retire la clé ``required`` vide de l'enveloppe et ajoute les ``definitions`` partagées.
+    """
+    # Si required est vide alors on soustrait la clé required du schema (ce n'est pas obligatoire)
+    if not schema["properties"]["value"]["items"]["required"]:
         schema["properties"]["value"]["items"].pop("required")
-        
+
+    if choices_tab.definitions:
+        schema["definitions"] = choices_tab.definitions
+
     return schema
+
+
+def generate_json_schema(xlsform_dict_data:dict, use_refs:bool=False, base_dir=None, lookup=None):
+    """
+    Génère un JSON Schema à partir d'un dictionnaire XLSForm (pyxform).
+
+    :param xlsform_dict_data: Dictionnaire XLSForm (sortie de ``to_json_dict()``)
+    :type xlsform_dict_data: dict
+    :param use_refs: Si vrai, chaque liste de choix est écrite une seule fois dans
+        ``definitions`` et les champs de sélection y font référence via ``$ref``
+        au lieu d'embarquer leur propre ``enum``.
+    :type use_refs: bool
+    :param base_dir: Répertoire des fichiers de choix externes (``select_one_from_file``),
+        en général celui du formulaire ; sans lui, ces champs ne sont pas contraints
+    :type base_dir: str | None
+    :param lookup: Écriture des grandes listes externes en fichiers annexes
+    :type lookup: xlsF2schema.external.LookupFiles | None
+    """
+    with profiling.stage("generate_json_schema", use_refs=use_refs) as info:
+        if profiling.active():
+            info.update(profiling.form_stats(xlsform_dict_data))
+        survey_tab = xlsform_dict_data.get("children", [])
+        # Chaque liste de choix n'est normalisée qu'une fois pour toute la conversion
+        choices_tab = ChoiceResolver(xlsform_dict_data.get("choices", {}), use_refs=use_refs, base_dir=base_dir, lookup=lookup)
+
+        # Dictionnaire schema qui va accueillir les propriétés et les champs extraits de xlsform_dict_data,
+        # et endroits où ajouter les propriétés et les champs obligatoires
+        schema, target_properties, target_required = schema_envelope()
+
+        # Conditions d'affichage des éléments de premier niveau
+        conditions = process_items(survey_tab, target_properties, target_required, choices_tab)
+        if conditions:
+            schema["properties"]["value"]["items"]["allOf"] = conditions
+
+        return finalize_schema(schema, choices_tab)
+
+
+def iter_schema(xlsform_dict_data:dict, use_refs:bool=False, base_dir=None, lookup=None):
+    """
+    Produit le JSON Schema d'un formulaire morceau par morceau, sous forme de
+    couples ``(pointeur JSON, sous-schéma)``, sans matérialiser l'arbre complet.
+
+    Le premier couple est l'enveloppe (``""``) dont les ``properties`` de soumission sont
+    vides ; suivent, dans l'ordre du formulaire, chaque section (coquille sans enfants,
+    ``required`` déjà renseigné) puis ses champs ; en mode ``use_refs``, les listes de
+    choix référencées sont produites en dernier, d'un bloc, sous ``/definitions``. Placer chaque
+    sous-schéma à son pointeur reconstruit exactement :func:`generate_json_schema`.
+
+    Le parcours est itératif et peut être interrompu à tout moment.
+
+    :param xlsform_dict_data: Dictionnaire XLSForm (sortie de ``to_json_dict()``)
+    :type xlsform_dict_data: dict
+    :param use_refs: Voir :func:`generate_json_schema`
+    :type use_refs: bool
+    :param base_dir: Voir :func:`generate_json_schema`
+    :param lookup: Voir :func:`generate_json_schema`
+    """
+    survey_tab = xlsform_dict_data.get("children", [])
+    choices_tab = ChoiceResolver(xlsform_dict_data.get("choices", {}), use_refs=use_refs, base_dir=base_dir, lookup=lookup)
+
+    schema = schema_envelope()[0]
+    required = apply_section_rules(schema["properties"]["value"]["items"], survey_tab)
+    if not schema["properties"]["value"]["items"]["required"]:
+        schema["properties"]["value"]["items"].pop("required")
+    yield "", schema
+
+    for pointer, _, subschema, _ in walk_items(survey_tab, choices_tab, required=required):
+        yield pointer, subschema
+
+    if choices_tab.definitions:
+        yield "/definitions", choices_tab.definitions
@@ -0,0 +1,239 @@
+"""
+Processus de conversion persistant (« worker chaud ») sur socket Unix.
+
+Le démon garde pyxform, openpyxl et les tables de mapping chargés ; les appels répétés
+de la CLI (``--daemon`` ou ``XLSF2SCHEMA_DAEMON=1``) lui délèguent la conversion au lieu
+de payer l'import à chaque exécution. Le client n'importe que ``socket`` et ``json``.
+
+Protocole : une requête JSON par ligne, une réponse JSON par ligne ::
+
+    {"op": "convert", "path": "/abs/form.xlsx", "use_refs": false, "loader": "pyxform"}
+    {"ok": true, "schema": {...}}
+    {"ok": false, "error": "..."}
+
+Autres opérations : ``ping`` et ``shutdown``.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+# Nombre de schémas gardés en mémoire par le démon
+MEMO_SIZE = 64
+
+# Arrêt automatique après cette durée d'inactivité (secondes)
+DEFAULT_IDLE_TIMEOUT = 1800
+
+
+def default_socket_path():
+    """
+    Renvoie le chemin du socket du démon : ``$XLSF2SCHEMA_SOCKET`` sinon
+    ``$XDG_RUNTIME_DIR/xlsF2schema.sock`` sinon un fichier propre à l'utilisateur
+    dans le répertoire temporaire.
+    """
+    path = os.environ.get("XLSF2SCHEMA_SOCKET")
+    if path:
+        return path
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return os.path.join(runtime, "xlsF2schema.sock")
+    uid = os.getuid() if hasattr(os, "getuid") else os.getpid()
+    return os.path.join(tempfile.gettempdir(), f"xlsF2schema-{uid}.sock")
+
+
+class DaemonUnavailable(Exception):
+    """
+    Le démon n'est pas joignable (socket absent, refus de connexion, réponse tronquée).
+    """
+
+
+def request(message, socket_path=None, timeout=None):
+    """
+    Envoie une requête au démon et renvoie sa réponse.
+
+    :param message: Requête (``{"op": ...}``)
+    :type message: dict
+    :raises DaemonUnavailable: Si le démon ne répond pas
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise DaemonUnavailable("sockets Unix non disponibles sur cette plateforme")
+    path = socket_path or default_socket_path()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(path)
+            client.sendall(json.dumps(message).encode("utf-8") + b"\n")
+            with client.makefile("rb") as reader:
+                line = reader.readline()
+    except OSError as e:
+        raise DaemonUnavailable(str(e)) from e
+    if not line:
+        raise DaemonUnavailable("réponse vide du démon")
+    return json.loads(line)
+
+
+def convert(path, use_refs=False, loader="pyxform", cache_dir=None, socket_path=None):
+    """
+    Convertit un XLSForm via le démon.
+
+    :raises DaemonUnavailable: Si le démon ne répond pas (l'appelant peut convertir localement)
+    :raises ValueError: Si la conversion a échoué dans le démon
+    """
+    response = request({
+        "op": "convert",
+        "path": os.path.abspath(path),
+        "use_refs": use_refs,
+        "loader": loader,
+        "cache_dir": cache_dir,
+    }, socket_path)
+    if not response.get("ok"):
+        raise ValueError(response.get("error", "erreur inconnue du démon"))
+    return response["schema"]
+
+
+def is_running(socket_path=None):
+    try:
+        return request({"op": "ping"}, socket_path, timeout=2).get("ok", False)
+    except DaemonUnavailable:
+        return False
+
+
+class Worker:
+    """
+    État du démon : modules chauds et derniers schémas produits, indexés par
+    empreinte du contenu du fichier.
+    """
+
+    def __init__(self):
+        from collections import OrderedDict
+
+        from xlsF2schema import cli
+        from xlsF2schema.cache import file_digest
+
+        self.cli = cli
+        self.file_digest = file_digest
+        self.memo = OrderedDict()
+        self.started = time.time()
+        self.served = 0
+        # Préchargement : c'est tout l'intérêt du démon
+        import pyxform.builder  # noqa: F401
+        import openpyxl  # noqa: F401
+
+    def convert(self, message):
+        from xlsF2schema.cache import ConversionCache
+
+        path = message["path"]
+        use_refs = bool(message.get("use_refs"))
+        loader = message.get("loader", "pyxform")
+        key = (self.file_digest(path), use_refs, loader)
+        schema = self.memo.get(key)
+        if schema is None:
+            cache = ConversionCache(message["cache_dir"]) if message.get("cache_dir") else None
+            schema = self.cli.convert_file(path, use_refs=use_refs, cache=cache, loader=loader)
+            self.memo[key] = schema
+            if len(self.memo) > MEMO_SIZE:
+                self.memo.popitem(last=False)
+        else:
+            self.memo.move_to_end(key)
+        return schema
+
+    def handle(self, message):
+        op = message.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid(), "uptime": round(time.time() - self.started, 1), "served": self.served}
+        if op == "convert":
+            self.served += 1
+            return {"ok": True, "schema": self.convert(message)}
+        raise ValueError(f"Opération inconnue : {op}")
+
+
+def serve(socket_path=None, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """
+    Lance le démon au premier plan jusqu'à ``shutdown`` ou ``idle_timeout`` secondes sans requête.
+
+    Les requêtes sont traitées une à une : pyxform n'est pas garanti sûr en multithread.
+    """
+    import socketserver
+
+    path = socket_path or default_socket_path()
+    if is_running(path):
+        raise RuntimeError(f"Un démon écoute déjà sur : {path}")
+    if os.path.exists(path):
+        # Socket orphelin d'un démon arrêté brutalement
+        os.unlink(path)
+
+    worker = Worker()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                try:
+                    message = json.loads(line)
+                    if message.get("op") == "shutdown":
+                        self.server.stopping = True
+                        response = {"ok": True}
+                    else:
+                        response = worker.handle(message)
+                except Exception as e:
+                    response = {"ok": False, "error": str(e)}
+                self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+    class Server(socketserver.UnixStreamServer):
+        stopping = False
+        timeout = idle_timeout or None
+
+        def handle_timeout(self):
+            self.stopping = True
+
+    old_umask = os.umask(0o077)
+    try:
+        server = Server(path, Handler)
+    finally:
+        os.umask(old_umask)
+    try:
+        with server:
+            while not server.stopping:
+                server.handle_request()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def start(socket_path=None, idle_timeout=DEFAULT_IDLE_TIMEOUT, wait=10.0):
+    """
+    Lance le démon en arrière-plan et attend qu'il réponde.
+
+    :return: PID du démon
+    :raises RuntimeError: Si le démon ne répond pas dans le délai ``wait``
+    """
+    path = socket_path or default_socket_path()
+    command = [sys.executable, "-m", "xlsF2schema.cli", "daemon", "serve", "--socket", path, "--idle-timeout", str(idle_timeout)]
+    process = subprocess.Popen(
+        command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Le démon s'est arrêté au démarrage (code {process.returncode})")
+        if is_running(path):
+            return process.pid
+        time.sleep(0.05)
+    raise RuntimeError(f"Le démon ne répond pas sur : {path}")
+
+
+def stop(socket_path=None):
+    """
+    Arrête le démon ; renvoie False s'il ne tournait pas.
+    """
+    try:
+        request({"op": "shutdown"}, socket_path, timeout=5)
+    except DaemonUnavailable:
+        return False
+    return True
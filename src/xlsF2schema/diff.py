@@ -0,0 +1,311 @@
+from .core import (
+    apply_section_rules,
+    field_schema,
+    finalize_schema,
+    generate_json_schema,
+    process_items,
+    prune_required,
+    schema_envelope,
+    section_body,
+    section_schema,
+)
+from .external import is_external
+from .mapping import ChoiceResolver, choice_list_name, _escape_pointer
+
+_SECTION_TYPES = ("group", "repeat")
+
+_ADDED = object()
+
+
+def json_patch(old, new, path=""):
+    """
+    Calcule un JSON Patch (RFC 6902) transformant ``old`` en ``new``.
+
+    Les sous-arbres identiques (même objet) sont ignorés sans être parcourus, ce qui rend
+    le calcul proportionnel à la taille des modifications lorsque ``new`` réutilise les
+    sous-arbres de ``old`` (voir :func:`update_schema`). Les tableaux modifiés sont
+    remplacés en bloc.
+
+    :return: Liste d'opérations ``add`` / ``remove`` / ``replace``
+    :rtype: list[dict]
+    """
+    operations = []
+    # Pile explicite : la profondeur du schéma n'est pas limitée par la pile d'appels.
+    # Un ancien sous-arbre _ADDED marque une clé ajoutée, pour garder l'ordre des opérations.
+    stack = [(old, new, path)]
+    while stack:
+        old, new, path = stack.pop()
+        if old is _ADDED:
+            operations.append({"op": "add", "path": path, "value": new})
+            continue
+        if old is new:
+            continue
+        if isinstance(old, dict) and isinstance(new, dict):
+            for key in old:
+                if key not in new:
+                    operations.append({"op": "remove", "path": f"{path}/{_escape_pointer(key)}"})
+            pending = [(old.get(key, _ADDED), value, f"{path}/{_escape_pointer(key)}") for key, value in new.items()]
+            stack.extend(reversed(pending))
+            continue
+        if type(old) is type(new) and _equal(old, new):
+            continue
+        operations.append({"op": "replace", "path": path, "value": new})
+    return operations
+
+
+def _copy(value):
+    """
+    Copie profonde d'une valeur JSON, sans récursion.
+    """
+    if not isinstance(value, (dict, list)):
+        return value
+    root = [None]
+    stack = [(root, 0, value)]
+    while stack:
+        target, key, value = stack.pop()
+        if isinstance(value, dict):
+            copied = target[key] = {}
+            stack.extend((copied, k, v) for k, v in value.items())
+        elif isinstance(value, list):
+            copied = target[key] = [None] * len(value)
+            stack.extend((copied, i, v) for i, v in enumerate(value))
+        else:
+            target[key] = value
+    return root[0]
+
+
+def _equal(a, b, memo=None):
+    """
+    Égalité de deux valeurs JSON, sans récursion.
+
+    :param memo: Résultats déjà connus par couple de conteneurs (``(id(a), id(b))``),
+        complété au fil de la comparaison : comparer ensuite un sous-arbre déjà parcouru
+        (section d'une section déjà comparée) ne coûte rien
+    :type memo: dict | None
+    """
+    memo = {} if memo is None else memo
+    # Conteneurs en cours de comparaison et itérateur de leurs couples d'enfants
+    stack = []
+    pair = (a, b)
+    while True:
+        a, b = pair
+        result = True
+        if a is b:
+            pass
+        elif isinstance(a, dict) and isinstance(b, dict):
+            result = memo.get((id(a), id(b)))
+            if result is None:
+                if a.keys() == b.keys():
+                    stack.append((a, b, zip(a.values(), map(b.__getitem__, a))))
+                else:
+                    result = False
+        elif isinstance(a, list) and isinstance(b, list):
+            result = memo.get((id(a), id(b)))
+            if result is None:
+                if len(a) == len(b):
+                    stack.append((a, b, zip(a, b)))
+                else:
+                    result = False
+        elif isinstance(a, (dict, list)) or isinstance(b, (dict, list)) or a != b:
+            result = False
+        if result is False:
+            for a, b, _ in stack:
+                memo[(id(a), id(b))] = False
+            return False
+        while stack:
+            pair = next(stack[-1][2], None)
+            if pair is not None:
+                break
+            a, b, _ = stack.pop()
+            memo[(id(a), id(b))] = True
+        else:
+            return True
+
+
+def _parse_pointer(pointer):
+    if pointer == "":
+        return []
+    return [t.replace("~1", "/").replace("~0", "~") for t in pointer[1:].split("/")]
+
+
+def apply_patch(document, patch):
+    """
+    Applique un JSON Patch (opérations ``add``, ``remove``, ``replace``) et renvoie le résultat.
+    Le document d'origine n'est pas modifié.
+    """
+    document = _copy(document)
+    for operation in patch:
+        tokens = _parse_pointer(operation["path"])
+        if not tokens:
+            document = _copy(operation.get("value"))
+            continue
+        parent = document
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+        if isinstance(parent, list):
+            last = len(parent) if last == "-" else int(last)
+        op = operation["op"]
+        if op == "remove":
+            del parent[last]
+        elif op == "add" and isinstance(parent, list):
+            parent.insert(last, _copy(operation["value"]))
+        elif op in ("add", "replace"):
+            parent[last] = _copy(operation["value"])
+        else:
+            raise ValueError(f"Opération JSON Patch non supportée : {op}")
+    return document
+
+
+def _changed_lists(old_choices, new_choices):
+    return {
+        name for name in set(old_choices) | set(new_choices)
+        if old_choices.get(name) != new_choices.get(name)
+    }
+
+
+def _uses_lists(item, list_names):
+    if not list_names:
+        return False
+    stack = [item]
+    while stack:
+        item = stack.pop()
+        if item.get("type") in _SECTION_TYPES:
+            stack.extend(item.get("children", []))
+        elif choice_list_name(item) in list_names:
+            return True
+    return False
+
+
+def _referenced_lists(items, found):
+    # Dans l'ordre du formulaire (ordre des definitions)
+    stack = [iter(items)]
+    while stack:
+        item = next(stack[-1], None)
+        if item is None:
+            stack.pop()
+        elif item.get("type") in _SECTION_TYPES:
+            stack.append(iter(item.get("children", [])))
+        else:
+            list_name = choice_list_name(item)
+            if list_name and item.get("name"):
+                found.setdefault(list_name, None)
+    return found
+
+
+def _section_frame(old_items, new_items, old_body, body):
+    # Les champs obligatoires sont calculés sur la section entière
+    required = set(apply_section_rules(body, new_items))
+    old_by_name = {item.get("name"): item for item in old_items if item.get("name")}
+    old_required = set(old_body.get("required", ()))
+    return iter(new_items), old_by_name, old_body.get("properties", {}), old_required, body["properties"], required
+
+
+def _update_items(old_items, new_items, old_body, body, choices_tab, stale_lists, stats):
+    # Pile explicite, comme walk_items : une section modifiée est parcourue à son tour
+    stack = [_section_frame(old_items, new_items, old_body, body)]
+    # Comparaisons des sous-arbres déjà parcourus (une section modifiée contient ses enfants)
+    memo = {}
+    while stack:
+        children, old_by_name, old_props, old_required, props, required = stack[-1]
+        item = next(children, None)
+        if item is None:
+            stack.pop()
+            continue
+        name = item.get("name")
+        if not name:
+            continue
+        item_type = item.get("type", "")
+        old_item = old_by_name.get(name)
+        old_schema = old_props.get(name)
+
+        if old_item is not None and old_schema is not None:
+            # Élément inchangé : son sous-schéma est repris tel quel (un champ obligatoire
+            # dont la condition d'affichage n'est plus traduite, ou l'inverse, change de schéma)
+            if _equal(old_item, item, memo) and not _uses_lists(item, stale_lists) and (name in required) == (name in old_required):
+                props[name] = old_schema
+                stats["reused"] += 1
+                continue
+            # Section modifiée : seuls les enfants modifiés sont régénérés
+            if item_type in _SECTION_TYPES and old_item.get("type") == item_type:
+                props[name] = section_schema(item_type)[0]
+                stack.append(_section_frame(
+                    old_item.get("children", []), item.get("children", []),
+                    section_body(old_schema), section_body(props[name]),
+                ))
+                prune_required(props[name])
+                continue
+
+        if item_type in _SECTION_TYPES:
+            process_items([item], props, [], choices_tab)
+        else:
+            props[name] = field_schema(item, choices_tab, name in required)
+        stats["regenerated"] += 1
+
+
+def update_schema(new_survey, old_survey=None, old_schema=None, use_refs=False, base_dir=None):
+    """
+    Met à jour le schéma d'un formulaire d'une version à la suivante.
+
+    Avec l'ancien dictionnaire XLSForm, seuls les groupes, répétitions et champs modifiés
+    (ou dont la liste de choix a changé) sont régénérés ; les sous-schémas inchangés de
+    ``old_schema`` sont repris sans copie. Sans lui, le nouveau schéma est généré en entier
+    puis comparé à ``old_schema``.
+
+    :param new_survey: Nouveau dictionnaire XLSForm
+    :type new_survey: dict
+    :param old_survey: Ancien dictionnaire XLSForm
+    :type old_survey: dict | None
+    :param old_schema: Ancien schéma (généré depuis ``old_survey`` si absent)
+    :type old_schema: dict | None
+    :param use_refs: Voir :func:`xlsF2schema.core.generate_json_schema` ; doit
+        correspondre au mode de ``old_schema``
+    :type use_refs: bool
+    :param base_dir: Répertoire des fichiers de choix externes de la nouvelle version ;
+        les champs qui les utilisent sont toujours régénérés (le fichier a pu changer)
+    :type base_dir: str | None
+    :return: ``(schema, patch, stats)`` : le schéma complet, le JSON Patch (RFC 6902)
+        transformant ``old_schema`` en ``schema``, et les compteurs ``reused``/``regenerated``
+    :rtype: tuple[dict, list[dict], dict]
+    :raises ValueError: Si ni ``old_survey`` ni ``old_schema`` ne sont fournis
+    """
+    if old_survey is None and old_schema is None:
+        raise ValueError("old_survey ou old_schema est requis")
+
+    stats = {"reused": 0, "regenerated": 0}
+    if old_survey is None:
+        schema = generate_json_schema(new_survey, use_refs=use_refs, base_dir=base_dir)
+        return schema, json_patch(old_schema, schema), stats
+    if old_schema is None:
+        old_schema = generate_json_schema(old_survey, use_refs=use_refs, base_dir=base_dir)
+
+    old_choices = old_survey.get("choices", {})
+    new_choices = new_survey.get("choices", {})
+    changed = _changed_lists(old_choices, new_choices)
+    # Le contenu d'un fichier de choix externe n'apparaît pas dans le dictionnaire XLSForm
+    external = {name for name in _referenced_lists(new_survey.get("children", []), {}) if is_external(name)}
+    changed |= external
+    choices_tab = ChoiceResolver(new_choices, use_refs=use_refs, base_dir=base_dir)
+
+    schema = schema_envelope()[0]
+    old_items = old_schema.get("properties", {}).get("value", {}).get("items", {})
+    _update_items(
+        old_survey.get("children", []), new_survey.get("children", []),
+        old_items, schema["properties"]["value"]["items"],
+        # En mode références, les champs ne pointent que vers definitions : une liste
+        # modifiée ne touche que sa définition (les champs à liste externe sont régénérés)
+        choices_tab, external if use_refs else changed, stats,
+    )
+
+    if use_refs:
+        old_definitions = old_schema.get("definitions", {})
+        for list_name in _referenced_lists(new_survey.get("children", []), {}):
+            if list_name in choices_tab.definitions or list_name in external:
+                continue
+            if list_name not in changed and list_name in old_definitions:
+                choices_tab.definitions[list_name] = old_definitions[list_name]
+            else:
+                choices_tab.definitions[list_name] = {"enum": choices_tab.enum(list_name)}
+
+    schema = finalize_schema(schema, choices_tab)
+    return schema, json_patch(old_schema, schema), stats
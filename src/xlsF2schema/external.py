@@ -0,0 +1,275 @@
+"""
+Listes de choix externes des types ``select_one_from_file`` / ``select_multiple_from_file``.
+
+Les fichiers (CSV, XML ou GeoJSON, au format ODK) sont résolus par rapport au répertoire
+du formulaire et lus en flux : seules les valeurs de la colonne ``value`` (``name`` par
+défaut, ``id`` pour le GeoJSON) sont gardées. Les listes chargées sont partagées entre
+les champs et les formulaires d'un même processus (:data:`EXTERNAL_CHOICES`) et relues
+dès que la date de modification ou la taille du fichier change.
+
+Les très grandes listes peuvent être écrites dans un fichier annexe (:class:`LookupFiles`)
+au lieu d'un ``enum`` en ligne : un petit JSON Schema ``{"enum": [...]}`` nommé d'après
+l'empreinte de son contenu, que le schéma du formulaire référence via ``$ref`` et que
+le validateur compilé charge dans un ``frozenset``.
+"""
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from .output import write_json
+
+EXTENSIONS = (".csv", ".xml", ".geojson")
+
+# Nombre de listes externes gardées en mémoire par processus
+DEFAULT_CACHE_SIZE = 32
+
+# Nombre de valeurs à partir duquel une liste externe est écrite dans un fichier annexe
+DEFAULT_LOOKUP_THRESHOLD = 10000
+
+_CHUNK_SIZE = 1 << 20
+
+
+def is_external(list_name):
+    """
+    Indique si un nom de liste désigne un fichier de choix externe (``cities.csv``).
+    """
+    return list_name.split("#", 1)[0].lower().endswith(EXTENSIONS)
+
+
+def list_key(file_name, value=None):
+    """
+    Renvoie le nom sous lequel une liste externe est connue du :class:`~xlsF2schema.mapping.ChoiceResolver` :
+    le nom du fichier, suivi de ``#colonne`` si la colonne des valeurs n'est pas celle par défaut.
+    """
+    return f"{file_name}#{value}" if value else file_name
+
+
+def split_key(key):
+    """
+    Inverse de :func:`list_key` : renvoie ``(nom_de_fichier, colonne | None)``.
+    """
+    file_name, _, value = key.partition("#")
+    return file_name, value or None
+
+
+def iter_csv_values(path, value="name"):
+    """
+    Lit en flux la colonne ``value`` d'un fichier CSV (UTF-8, en-tête sur la première ligne).
+
+    :raises ValueError: Si la colonne est absente
+    """
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [h.strip() for h in header]
+        if value not in header:
+            raise ValueError(f"Colonne '{value}' absente de {path}")
+        column = header.index(value)
+        for row in reader:
+            if column < len(row):
+                text = row[column].strip()
+                if text:
+                    yield text
+
+
+def iter_xml_values(path, value="name"):
+    """
+    Lit en flux un fichier XML ODK (``<root><item><name>...</name>...</item></root>``).
+    """
+    from xml.etree.ElementTree import iterparse
+
+    root = None
+    for event, element in iterparse(path, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+            continue
+        if element.tag == "item":
+            child = element.find(value)
+            if child is not None and child.text and child.text.strip():
+                yield child.text.strip()
+            # Les éléments déjà lus sont libérés au fur et à mesure
+            root.clear()
+
+
+def iter_geojson_values(path, value="id"):
+    """
+    Lit en flux les entités d'un fichier GeoJSON : ``id`` de l'entité (ou de ses
+    ``properties``) par défaut, sinon la propriété ``value``.
+    """
+    from .stream import iter_records
+
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for feature in iter_records(f, key="features", chunk_size=_CHUNK_SIZE):
+            if not isinstance(feature, dict):
+                continue
+            properties = feature.get("properties") or {}
+            found = feature.get("id") if value == "id" and "id" in feature else properties.get(value)
+            if found is not None and found != "":
+                yield found if isinstance(found, str) else json.dumps(found)
+
+
+_READERS = {
+    ".csv": (iter_csv_values, "name"),
+    ".xml": (iter_xml_values, "name"),
+    ".geojson": (iter_geojson_values, "id"),
+}
+
+
+def iter_values(path, value=None):
+    """
+    Lit en flux les valeurs d'un fichier de choix externe selon son extension.
+
+    :param value: Colonne (ou propriété) des valeurs ; ``None`` pour la colonne par défaut
+    """
+    reader, default = _READERS[os.path.splitext(path)[1].lower()]
+    return reader(path, value or default)
+
+
+class ExternalChoices:
+    """
+    Cache LRU des listes externes, partagé entre les champs et les conversions d'un processus.
+
+    Une entrée est indexée par chemin absolu et colonne ; elle est relue dès que la date de
+    modification (en nanosecondes) ou la taille du fichier change.
+
+    :param max_lists: Nombre de listes gardées en mémoire
+    :type max_lists: int
+    """
+
+    def __init__(self, max_lists=DEFAULT_CACHE_SIZE):
+        self.max_lists = max_lists
+        self.hits = 0
+        self.misses = 0
+        self._lists = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, path, value=None):
+        """
+        Renvoie les valeurs (uniques, dans l'ordre du fichier) d'un fichier de choix externe.
+
+        :rtype: tuple[str, ...]
+        :raises FileNotFoundError: Si le fichier n'existe pas
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        key = (path, value)
+        with self._lock:
+            entry = self._lists.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._lists.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        values = tuple(dict.fromkeys(iter_values(path, value)))
+        with self._lock:
+            self._lists[key] = (stamp, values)
+            self._lists.move_to_end(key)
+            while len(self._lists) > self.max_lists:
+                self._lists.popitem(last=False)
+        return values
+
+    def clear(self):
+        with self._lock:
+            self._lists.clear()
+
+
+EXTERNAL_CHOICES = ExternalChoices()
+
+
+def uses_external_choices(xlsform_dict):
+    """
+    Indique si un dictionnaire XLSForm contient des champs ``select_*_from_file``.
+    """
+    from .mapping import choice_list_name
+
+    stack = [xlsform_dict.get("children", [])]
+    while stack:
+        for item in stack.pop():
+            if item.get("type") in ("group", "repeat"):
+                stack.append(item.get("children", []))
+            elif is_external(choice_list_name(item)):
+                return True
+    return False
+
+
+class LookupFiles:
+    """
+    Écrit les grandes listes externes dans des fichiers annexes adressés par leur contenu.
+
+    Chaque fichier ``<liste>-<empreinte>.json`` est un JSON Schema ``{"enum": [...]}`` ;
+    le schéma du formulaire y fait référence par un ``$ref`` relatif à ``ref_base``
+    (le répertoire du schéma produit). Deux formulaires utilisant la même liste partagent
+    le même fichier, qui n'est écrit qu'une fois.
+
+    :param directory: Répertoire des fichiers annexes
+    :type directory: str
+    :param threshold: Nombre de valeurs à partir duquel une liste est écrite à part
+    :type threshold: int
+    :param ref_base: Répertoire par rapport auquel les ``$ref`` sont écrits (défaut: ``directory``)
+    :type ref_base: str | None
+    """
+
+    def __init__(self, directory, threshold=DEFAULT_LOOKUP_THRESHOLD, ref_base=None):
+        self.directory = directory
+        self.threshold = threshold
+        self.ref_base = ref_base or directory
+        self.written = {}
+
+    def ref(self, list_name, values):
+        """
+        Écrit (si besoin) le fichier annexe de ``values`` et renvoie son ``$ref``, ou ``None``
+        si la liste est sous le seuil.
+        """
+        if len(values) < self.threshold:
+            return None
+        digest = hashlib.sha256("\n".join(values).encode("utf-8")).hexdigest()[:16]
+        stem = re.sub(r"[^\w.-]+", "_", list_name)
+        path = os.path.join(self.directory, f"{stem}-{digest}.json")
+        if not os.path.exists(path):
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                write_json({"$schema": "http://json-schema.org/draft-07/schema#", "enum": list(values)}, f, indent=None)
+            os.replace(tmp_path, path)
+        self.written[list_name] = path
+        return os.path.relpath(path, self.ref_base).replace(os.sep, "/")
+
+
+def resolve_lookups(schema, base_dir):
+    """
+    Renvoie une copie de ``schema`` où les ``$ref`` vers des fichiers annexes (relatifs à
+    ``base_dir``) sont remplacés par leur contenu, pour les validateurs qui ne lisent pas
+    de références externes. Chaque fichier n'est lu qu'une fois.
+    """
+    loaded = {}
+    resolved = dict(schema)
+    stack = [resolved]
+    while stack:
+        node = stack.pop()
+        items = node.items() if isinstance(node, dict) else enumerate(node)
+        for key, value in list(items):
+            if isinstance(value, dict):
+                ref = value.get("$ref")
+                if isinstance(ref, str) and ref and not ref.startswith("#"):
+                    if ref not in loaded:
+                        with open(os.path.join(base_dir, ref), "r", encoding="utf-8") as f:
+                            target = json.load(f)
+                        target.pop("$schema", None)
+                        loaded[ref] = target
+                    node[key] = loaded[ref]
+                    continue
+                node[key] = value = dict(value)
+            elif isinstance(value, list) and any(isinstance(v, (dict, list)) for v in value):
+                node[key] = value = list(value)
+            else:
+                continue
+            stack.append(value)
+    return resolved
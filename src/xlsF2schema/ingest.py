@@ -0,0 +1,464 @@
+"""
+Chargement de soumissions dans des tables en colonnes (Parquet ou Arrow).
+
+Les tables, leurs colonnes et leurs types sont ceux de la représentation intermédiaire
+(:meth:`xlsF2schema.ir.FormIR.tables` et émetteur ``arrow``), donc du même parcours et du
+même mapping de types que :func:`xlsF2schema.core.generate_json_schema` :
+
+- une table pour les soumissions, puis une par répétition, avec les clés ``_id``,
+  ``_parent_id`` (``_id`` de la ligne parente) et ``_index`` (rang dans la répétition, à partir de 1) ;
+- groupes aplatis dans les noms de colonnes (``lieu/position``) ;
+- ``select_one`` encodés en dictionnaire (la liste de choix du formulaire), ``select_multiple`` en listes ;
+- ``geopoint`` en quatre colonnes ``<colonne>/latitude``, ``/longitude``, ``/altitude``, ``/accuracy``.
+
+Les soumissions (déjà validées) sont lues en streaming et converties par lots de
+``batch_size`` en tableaux Arrow typés ; la mémoire est bornée par la taille des lots et
+des groupes de lignes Parquet. Avec ``workers > 1``, la conversion des lots est répartie
+dans un pool de processus et les lots sont écrits dans l'ordre de l'export.
+
+Usage ::
+
+    with open("export.ndjson", encoding="utf-8") as f:
+        summary = ingest_stream(f, xlsform_data, "tables/", fmt="ndjson", workers=4)
+    summary["tables"]  # {"menage": {"path": "tables/menage.parquet", "rows": ...}, ...}
+"""
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from . import profiling
+from .ir import GEOPOINT_COMPONENTS, _pyarrow, build_ir, emit_arrow
+from .output import _orjson
+from .stream import iter_records
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_ROW_GROUP_SIZE = 100000
+
+# Format de sortie -> extension des fichiers (Arrow : format IPC en flux)
+FORMATS = {"parquet": ".parquet", "arrow": ".arrows"}
+
+
+# Objet vide partagé (lecture seule) remplaçant un groupe ou une occurrence absents
+_EMPTY = {}
+
+
+def _objects(values):
+    return [value if isinstance(value, dict) else _EMPTY for value in values]
+
+
+def _geopoint(value):
+    # Objet {"latitude", ...} du schéma, ou texte "latitude longitude altitude précision"
+    if isinstance(value, dict):
+        return tuple(value.get(component) for component in GEOPOINT_COMPONENTS)
+    if isinstance(value, str) and value.strip():
+        parts = [float(part) for part in value.split()][:4]
+        return tuple(parts + [None] * (4 - len(parts)))
+    return None, None, None, None
+
+
+class _Node:
+    """
+    Section (ou groupe aplati) d'une table : champs, groupes et répétitions enfants.
+    """
+
+    __slots__ = ("fields", "groups", "repeats")
+
+    def __init__(self):
+        # (nom, position de la colonne dans la table)
+        self.fields = []
+        # (nom, _Node)
+        self.groups = []
+        # (nom, _TablePlan)
+        self.repeats = []
+
+    def group(self, name):
+        for group_name, node in self.groups:
+            if group_name == name:
+                return node
+        node = _Node()
+        self.groups.append((name, node))
+        return node
+
+    def at(self, path):
+        node = self
+        for name in path:
+            node = node.group(name)
+        return node
+
+
+class _TablePlan:
+    """
+    Colonnes d'une table en cours de remplissage, pour un lot. Les valeurs sont extraites
+    colonne par colonne, pour tous les objets de la section à la fois.
+    """
+
+    __slots__ = ("table", "schema", "columns", "root", "ids", "parents", "indexes", "values")
+
+    def __init__(self, table, schema):
+        self.table = table
+        self.schema = schema
+        self.columns = table.columns
+        self.root = _Node()
+        depth = len(table.section.path)
+        for position, (_, field) in enumerate(table.columns):
+            path = field.path[depth:]
+            self.root.at(path[:-1]).fields.append((path[-1], position))
+        self.reset()
+
+    def add_child(self, plan):
+        path = plan.table.section.path[len(self.table.section.path):]
+        self.root.at(path[:-1]).repeats.append((path[-1], plan))
+
+    def reset(self):
+        self.ids = []
+        self.parents = []
+        self.indexes = []
+        self.values = [[] for _ in self.columns]
+
+    def extend(self, objects, parents=None, indexes=None):
+        # Identifiants locaux au lot (à partir de 1), recalés à l'écriture
+        start = len(self.ids) + 1
+        ids = range(start, start + len(objects))
+        self.ids.extend(ids)
+        if parents is not None:
+            self.parents.extend(parents)
+            self.indexes.extend(indexes)
+        self._extract(self.root, objects, ids)
+
+    def _extract(self, node, objects, ids):
+        for name, position in node.fields:
+            self.values[position].extend([obj.get(name) for obj in objects])
+        for name, group in node.groups:
+            self._extract(group, _objects([obj.get(name) for obj in objects]), ids)
+        for name, child in node.repeats:
+            items, parents, indexes = [], [], []
+            for parent_id, occurrences in zip(ids, [obj.get(name) for obj in objects]):
+                if isinstance(occurrences, list) and occurrences:
+                    items.extend(occurrences)
+                    parents.extend([parent_id] * len(occurrences))
+                    indexes.extend(range(1, len(occurrences) + 1))
+            child.extend(_objects(items), parents, indexes)
+
+
+class _Flattener:
+    """
+    Conversion de lots de soumissions en ``RecordBatch`` Arrow, une par table.
+    """
+
+    def __init__(self, form, separator="/"):
+        self.pa = _pyarrow()
+        self.separator = separator
+        schemas = emit_arrow(form, separator)
+        self.plans = []
+        plans = {}
+        for table in form.tables(separator):
+            plan = plans[id(table)] = _TablePlan(table, schemas[table.name])
+            if table.parent is not None:
+                plans[id(table.parent)].add_child(plan)
+            self.plans.append(plan)
+        self.root = self.plans[0]
+        # Dictionnaires fixes des select_one : les mêmes pour tous les lots et tous les processus
+        self._dictionaries = {}
+        for plan in self.plans:
+            for column, field in plan.columns:
+                if field.kind == "select_one" and field.choices is not None:
+                    self._dictionaries[id(field)] = self.pa.array([str(v) for v in field.choices.values], self.pa.string())
+
+    @property
+    def schemas(self):
+        return {plan.table.name: plan.schema for plan in self.plans}
+
+    def convert(self, records):
+        """
+        Convertit des soumissions ; renvoie ``{table: RecordBatch}``.
+        """
+        self.root.extend(_objects(records))
+        try:
+            return {plan.table.name: self._batch(plan) for plan in self.plans}
+        finally:
+            for plan in self.plans:
+                plan.reset()
+
+    def _batch(self, plan):
+        pa = self.pa
+        arrays = [pa.array(plan.ids, pa.int64())]
+        if plan.table.parent is not None:
+            arrays.append(pa.array(plan.parents, pa.int64()))
+            arrays.append(pa.array(plan.indexes, pa.int32()))
+        for (column, field), values in zip(plan.columns, plan.values):
+            try:
+                if field.kind == "geopoint":
+                    components = list(zip(*map(_geopoint, values))) if values else [[]] * 4
+                    arrays.extend(pa.array(component, pa.float64()) for component in components)
+                else:
+                    arrays.append(self._array(field, values, plan.schema.field(len(arrays)).type))
+            except (pa.ArrowException, TypeError, ValueError) as e:
+                raise ValueError(f"Table '{plan.table.name}', colonne '{column}' : {e}") from None
+        return pa.record_batch(arrays, schema=plan.schema)
+
+    def _array(self, field, values, arrow_type):
+        pa = self.pa
+        kind = field.kind
+        if kind == "select_one":
+            strings = pa.array(values, pa.string())
+            dictionary = self._dictionaries.get(id(field))
+            if dictionary is None:
+                return strings.dictionary_encode().cast(arrow_type)
+            import pyarrow.compute as pc
+
+            indices = pc.index_in(strings, value_set=dictionary)
+            if indices.null_count != strings.null_count:
+                unknown = pc.filter(strings, pc.and_(indices.is_null(), strings.is_valid()))[0].as_py()
+                raise ValueError(f"valeur hors de la liste de choix : {unknown!r}")
+            return pa.DictionaryArray.from_arrays(indices.cast(pa.int32()), dictionary)
+        if kind in ("select_multiple", "rank"):
+            values = [value.split() if isinstance(value, str) else value for value in values]
+        elif kind in ("geotrace", "geoshape"):
+            values = [value.get("coordinates") if isinstance(value, dict) else value for value in values]
+        elif kind in ("date", "date-time"):
+            return pa.array(values, pa.string()).cast(arrow_type)
+        elif pa.types.is_string(arrow_type):
+            # Textes, heures, et objets/tableaux (sérialisés en JSON)
+            values = [value if value is None or isinstance(value, str) else json.dumps(value, ensure_ascii=False) for value in values]
+        return pa.array(values, arrow_type)
+
+
+class ColumnarWriter:
+    """
+    Écrit des soumissions dans un fichier Parquet (ou Arrow) par table.
+
+    :param xlsform_dict: Dictionnaire XLSForm (sortie de ``xlsform_to_dict``)
+    :type xlsform_dict: dict
+    :param output_dir: Répertoire des fichiers (créé si besoin) ; un fichier par table,
+        nommé d'après la table (``/`` remplacés par ``__``)
+    :type output_dir: str
+    :param format: ``parquet`` ou ``arrow`` (format IPC en flux, ``.arrows``)
+    :type format: str
+    :param separator: Séparateur des groupes dans les noms de colonnes et de tables
+    :type separator: str
+    :param base_dir: Répertoire des fichiers de choix externes
+    :type base_dir: str | None
+    :param batch_size: Nombre de soumissions converties à la fois
+    :type batch_size: int
+    :param row_group_size: Parquet : nombre de lignes par groupe (borne la mémoire de chaque table)
+    :type row_group_size: int
+    :param compression: Parquet : codec de compression (défaut: celui de pyarrow)
+    :type compression: str | None
+    :raises ValueError: Si le format est inconnu
+    """
+
+    def __init__(self, xlsform_dict, output_dir, format="parquet", separator="/", base_dir=None,
+                 batch_size=DEFAULT_BATCH_SIZE, row_group_size=DEFAULT_ROW_GROUP_SIZE, compression=None):
+        if format not in FORMATS:
+            raise ValueError(f"Format inconnu : {format} (connus : {', '.join(FORMATS)})")
+        self.pa = _pyarrow()
+        self.form = build_ir(xlsform_dict, base_dir=base_dir)
+        self.output_dir = output_dir
+        self.format = format
+        self.separator = separator
+        self.batch_size = batch_size
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.records = 0
+        self._flattener = _Flattener(self.form, separator)
+        self._parents = {plan.table.name: plan.table.parent.name if plan.table.parent is not None else None for plan in self._flattener.plans}
+        self.rows = dict.fromkeys(self._parents, 0)
+        self.paths = {name: os.path.join(output_dir, name.replace("/", "__") + FORMATS[format]) for name in self._parents}
+        self._writers = {}
+        self._pending = {name: [] for name in self._parents}
+        self._pending_rows = dict.fromkeys(self._parents, 0)
+        self._buffer = []
+
+    @property
+    def schemas(self):
+        """
+        Schémas Arrow des tables : ``{table: pyarrow.Schema}``.
+        """
+        return self._flattener.schemas
+
+    def write(self, records):
+        """
+        Ajoute des soumissions ; elles sont converties et écrites par lots de ``batch_size``.
+        """
+        for record in records:
+            self._buffer.append(record)
+            if len(self._buffer) >= self.batch_size:
+                self._convert_buffer()
+
+    def _convert_buffer(self):
+        if self._buffer:
+            count = len(self._buffer)
+            batches = self._flattener.convert(self._buffer)
+            self._buffer = []
+            self.write_batches(batches, count)
+
+    def write_batches(self, batches, count):
+        """
+        Écrit un lot déjà converti (``{table: RecordBatch}`` aux identifiants locaux) de
+        ``count`` soumissions ; ses identifiants sont recalés à la suite des lots précédents.
+        """
+        import pyarrow.compute as pc
+
+        pa = self.pa
+        offsets = dict(self.rows)
+        for name, batch in batches.items():
+            if not batch.num_rows:
+                continue
+            columns = list(batch.columns)
+            columns[0] = pc.add(columns[0], offsets[name])
+            parent = self._parents[name]
+            if parent is not None:
+                columns[1] = pc.add(columns[1], offsets[parent])
+            self._append(name, pa.record_batch(columns, schema=batch.schema))
+            self.rows[name] += batch.num_rows
+        self.records += count
+
+    def _open(self, name):
+        writer = self._writers.get(name)
+        if writer is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            schema = self._flattener.schemas[name]
+            if self.format == "parquet":
+                import pyarrow.parquet as pq
+
+                writer = pq.ParquetWriter(self.paths[name], schema, compression=self.compression or "snappy")
+            else:
+                writer = self.pa.ipc.new_stream(self.paths[name], schema)
+            self._writers[name] = writer
+        return writer
+
+    def _append(self, name, batch):
+        if self.format != "parquet":
+            self._open(name).write_batch(batch)
+            return
+        # Parquet : lots regroupés jusqu'à row_group_size lignes par groupe
+        self._pending[name].append(batch)
+        self._pending_rows[name] += batch.num_rows
+        if self._pending_rows[name] >= self.row_group_size:
+            self._flush(name)
+
+    def _flush(self, name):
+        if self._pending[name]:
+            table = self.pa.Table.from_batches(self._pending[name])
+            self._open(name).write_table(table, row_group_size=self.row_group_size)
+            self._pending[name] = []
+            self._pending_rows[name] = 0
+
+    def close(self):
+        """
+        Écrit les lots en attente et ferme les fichiers (une table sans ligne donne un fichier vide).
+
+        :return: Résumé ``{"records", "tables": {table: {"path", "rows"}}}``
+        :rtype: dict
+        """
+        self._convert_buffer()
+        for name in self._parents:
+            if self.format == "parquet":
+                self._flush(name)
+            self._open(name).close()
+        self._writers = {}
+        return self.summary()
+
+    def summary(self):
+        return {
+            "records": self.records,
+            "tables": {name: {"path": self.paths[name], "rows": self.rows[name]} for name in self._parents},
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            for writer in self._writers.values():
+                writer.close()
+
+
+def _init_worker(xlsform_dict, separator, base_dir):
+    global _worker_flattener
+    _worker_flattener = _Flattener(build_ir(xlsform_dict, base_dir=base_dir), separator)
+
+
+def _decode(lines):
+    orjson = _orjson()
+    loads = orjson.loads if orjson is not None else json.loads
+    return [loads(line) for line in lines]
+
+
+def _flatten_batch(batch, raw):
+    if raw:
+        # Lignes NDJSON brutes : le décodage est fait dans le processus de travail
+        batch = _decode(batch)
+    return _worker_flattener.convert(batch), len(batch)
+
+
+def _line_batches(fp, batch_size):
+    batch = []
+    for line in fp:
+        if line.strip():
+            batch.append(line)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def _record_batches(records, batch_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest_stream(fp, xlsform_dict, output_dir, fmt="json", format="parquet", workers=1, batch_size=DEFAULT_BATCH_SIZE,
+                  separator="/", base_dir=None, row_group_size=DEFAULT_ROW_GROUP_SIZE, compression=None):
+    """
+    Charge un export de soumissions (voir :func:`xlsF2schema.stream.iter_records`) dans
+    un fichier Parquet ou Arrow par table (voir :class:`ColumnarWriter`).
+
+    Avec ``workers > 1``, des lots de ``batch_size`` soumissions (lignes brutes pour le
+    NDJSON) sont convertis dans un pool de processus ; le nombre de lots en vol est borné,
+    de même que la mémoire, et les lots sont écrits dans l'ordre de l'export.
+
+    :param fp: Flux texte de l'export
+    :param fmt: ``json`` ou ``ndjson``
+    :param format: ``parquet`` ou ``arrow``
+    :param workers: Nombre de processus de conversion
+    :type workers: int
+    :return: Résumé ``{"records", "tables": {table: {"path", "rows"}}}``
+    :rtype: dict
+    :raises ValueError: Si une valeur ne peut être convertie au type de sa colonne
+    """
+    writer = ColumnarWriter(
+        xlsform_dict, output_dir, format=format, separator=separator, base_dir=base_dir,
+        batch_size=batch_size, row_group_size=row_group_size, compression=compression,
+    )
+    with profiling.stage("ingest", format=format, workers=workers) as info:
+        with writer:
+            raw = fmt == "ndjson"
+            if workers <= 1:
+                if raw:
+                    for lines in _line_batches(fp, batch_size):
+                        writer.write(_decode(lines))
+                else:
+                    writer.write(iter_records(fp, fmt))
+            else:
+                batches = _line_batches(fp, batch_size) if raw else _record_batches(iter_records(fp, fmt), batch_size)
+                pending = deque()
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(xlsform_dict, separator, base_dir)) as executor:
+                    for batch in batches:
+                        pending.append(executor.submit(_flatten_batch, batch, raw))
+                        if len(pending) >= workers * 2:
+                            writer.write_batches(*pending.popleft().result())
+                    while pending:
+                        writer.write_batches(*pending.popleft().result())
+        info.update(records=writer.records, tables=len(writer.rows))
+    return writer.summary()
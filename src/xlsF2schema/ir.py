@@ -0,0 +1,601 @@
+"""
+Représentation intermédiaire (IR) compacte d'un formulaire, construite une fois et
+déclinée en plusieurs sorties.
+
+:func:`build_ir` parcourt le dictionnaire XLSForm une seule fois (pile explicite, comme
+:func:`xlsF2schema.core.walk_items`) et produit un arbre de :class:`Section` et de
+:class:`Field` à ``__slots__`` : nom, chemin, type XLSForm, type logique (:attr:`Field.kind`),
+caractère obligatoire, liste de choix. Les listes de choix sont des :class:`ChoiceList`
+internées : tous les champs (et tous les formulaires du processus) utilisant les mêmes
+valeurs partagent le même objet.
+
+Les sorties sont produites par des émetteurs enregistrés (:func:`register_emitter`) :
+
+- ``json_schema`` : le schéma de :func:`~xlsF2schema.core.generate_json_schema`, identique ;
+  le schéma de chaque champ n'est calculé qu'une fois par mode (``use_refs`` ou non) ;
+- ``pandas`` : dtypes pandas par table et par colonne ;
+- ``arrow`` : schémas pyarrow par table (nécessite pyarrow) ;
+- ``sql`` : ordres ``CREATE TABLE`` (PostgreSQL ou SQLite).
+
+Pour les sorties tabulaires, les groupes sont aplatis dans les noms de colonnes et chaque
+répétition devient une table enfant, liée à sa table parente par :data:`PARENT_COLUMN`.
+
+Usage ::
+
+    form = build_ir(xlsform_data)
+    schema = form.emit("json_schema")
+    ddl = form.emit("sql", dialect="sqlite")
+"""
+import sys
+import weakref
+
+from . import profiling
+from .core import field_schema, prune_required, schema_envelope, section_body, section_schema
+from .logic import section_rules
+from .mapping import ChoiceResolver, _freeze, _thaw, choice_list_name, parse_type
+
+_SECTION_TYPES = ("group", "repeat")
+
+# Colonnes de clés des tables : identifiant de ligne, ligne parente et rang dans la répétition
+ID_COLUMN = "_id"
+PARENT_COLUMN = "_parent_id"
+INDEX_COLUMN = "_index"
+
+# Type XLSForm -> type logique ; les types absents sont déduits de leur schéma (voir _kind)
+_KINDS = {
+    "integer": "integer",
+    "decimal": "number",
+    "range": "number",
+    "acknowledge": "boolean",
+    "date": "date",
+    "today": "date",
+    "datetime": "date-time",
+    "start": "date-time",
+    "end": "date-time",
+    "time": "time",
+    "select_one": "select_one",
+    "select_one_from_file": "select_one",
+    "select_multiple": "select_multiple",
+    "select_multiple_from_file": "select_multiple",
+    "rank": "rank",
+    "geopoint": "geopoint",
+    "geotrace": "geotrace",
+    "geoshape": "geoshape",
+    "note": "note",
+}
+
+# Composantes d'un geopoint, dans l'ordre de l'export ("latitude longitude altitude précision")
+GEOPOINT_COMPONENTS = ("latitude", "longitude", "altitude", "accuracy")
+
+
+class ChoiceList:
+    """
+    Valeurs d'une liste de choix, internées : une seule instance par contenu dans le processus
+    (voir :func:`intern_choices`).
+
+    :ivar values: Valeurs, dans l'ordre de la liste
+    :vartype values: tuple[str, ...]
+    """
+
+    __slots__ = ("values", "_members", "__weakref__")
+
+    def __init__(self, values):
+        self.values = values
+        self._members = None
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __contains__(self, value):
+        if self._members is None:
+            self._members = frozenset(self.values)
+        return value in self._members
+
+    def __repr__(self):
+        return f"ChoiceList({len(self.values)} valeur(s))"
+
+
+_CHOICE_LISTS = weakref.WeakValueDictionary()
+
+
+def intern_choices(values):
+    """
+    Renvoie la :class:`ChoiceList` partagée des valeurs ``values`` (chaînes internées).
+    """
+    key = tuple(sys.intern(v) if isinstance(v, str) else v for v in values)
+    choice_list = _CHOICE_LISTS.get(key)
+    if choice_list is None:
+        choice_list = _CHOICE_LISTS[key] = ChoiceList(key)
+    return choice_list
+
+
+class Field:
+    """
+    Champ d'un formulaire (hors groupes et répétitions).
+
+    :ivar name: Nom du champ
+    :ivar path: Noms des sections englobantes puis du champ, depuis la soumission
+    :ivar token: Type XLSForm normalisé (``select_one``, ``geopoint``...)
+    :ivar kind: Type logique utilisé par les émetteurs tabulaires (voir :data:`_KINDS`)
+    :ivar required: Obligatoire dans sa section (sans condition d'affichage traduite)
+    :ivar list_name: Nom de la liste de choix, ou ``""``
+    :ivar choices: Liste de choix internée, ou ``None`` (pas de liste, ou liste externe non résolue)
+    :ivar item: Élément XLSForm d'origine
+    """
+
+    __slots__ = ("name", "path", "token", "kind", "required", "list_name", "choices", "item", "_schemas")
+
+    def __init__(self, name, path, token, required, list_name, choices, item):
+        self.name = name
+        self.path = path
+        self.token = token
+        self.kind = None
+        self.required = required
+        self.list_name = list_name
+        self.choices = choices
+        self.item = item
+        # Schéma figé par mode (use_refs), calculé à la première demande
+        self._schemas = {}
+
+    def __repr__(self):
+        return f"Field({'/'.join(self.path)!r}, {self.kind!r})"
+
+
+class Section:
+    """
+    Groupe ou répétition d'un formulaire ; la racine est une section sans nom.
+
+    :ivar name: Nom de la section (``""`` pour la racine)
+    :ivar path: Noms des sections englobantes puis de la section
+    :ivar repeat: Vrai pour une répétition
+    :ivar children: Champs et sections, dans l'ordre du formulaire
+    :ivar required: Noms des champs obligatoires de la section
+    """
+
+    __slots__ = ("name", "path", "repeat", "children", "required", "_conditions")
+
+    def __init__(self, name, path, repeat, required, conditions):
+        self.name = name
+        self.path = path
+        self.repeat = repeat
+        self.children = []
+        self.required = tuple(required)
+        # Règles conditionnelles (allOf) figées, recopiées à chaque émission
+        self._conditions = _freeze(conditions) if conditions else None
+
+    def __repr__(self):
+        return f"Section({'/'.join(self.path)!r}, {len(self.children)} élément(s))"
+
+
+class Table:
+    """
+    Table d'une sortie tabulaire : la soumission, ou une répétition.
+
+    :ivar name: Nom de la table (nom du formulaire, suivi du chemin de la répétition)
+    :ivar section: Section d'origine
+    :ivar parent: Table parente, ou ``None`` pour la table des soumissions
+    :ivar columns: Couples ``(nom de colonne, champ)`` ; les groupes sont aplatis et
+        les champs des répétitions imbriquées sont dans leurs propres tables
+    """
+
+    __slots__ = ("name", "section", "parent", "columns")
+
+    def __init__(self, name, section, parent):
+        self.name = name
+        self.section = section
+        self.parent = parent
+        self.columns = []
+
+    def __repr__(self):
+        return f"Table({self.name!r}, {len(self.columns)} colonne(s))"
+
+
+def _kind(token, schema):
+    kind = _KINDS.get(token)
+    if kind is not None:
+        return kind
+    # Type personnalisé : déduit du schéma (premier type non nul, format temporel)
+    if schema.get("format") in ("date", "date-time", "time"):
+        return schema["format"]
+    types = schema.get("type")
+    types = [t for t in (types if isinstance(types, (list, tuple)) else [types]) if t and t != "null"]
+    return types[0] if types else "string"
+
+
+class FormIR:
+    """
+    Représentation intermédiaire d'un formulaire (voir :func:`build_ir`).
+
+    :ivar name: Nom du formulaire (clé ``name`` du dictionnaire XLSForm)
+    :ivar root: Section racine (champs de la soumission)
+    :ivar choices: Listes de choix utilisées, par nom de liste
+    """
+
+    __slots__ = ("name", "root", "choices", "_choices_dict", "_base_dir", "_lookup", "_resolvers")
+
+    def __init__(self, name, root, choices_dict, base_dir=None, lookup=None):
+        self.name = name
+        self.root = root
+        self.choices = {}
+        self._choices_dict = choices_dict
+        self._base_dir = base_dir
+        self._lookup = lookup
+        self._resolvers = {}
+
+    def resolver(self, use_refs=False):
+        """
+        Renvoie le :class:`~xlsF2schema.mapping.ChoiceResolver` (un par mode) partagé par les émissions.
+        """
+        resolver = self._resolvers.get(use_refs)
+        if resolver is None:
+            resolver = self._resolvers[use_refs] = ChoiceResolver(
+                self._choices_dict, use_refs=use_refs, base_dir=self._base_dir, lookup=self._lookup
+            )
+        return resolver
+
+    def field_schema(self, field, use_refs=False):
+        """
+        Renvoie une copie du schéma JSON d'un champ, calculé une seule fois par mode.
+        """
+        frozen = field._schemas.get(use_refs)
+        if frozen is None:
+            frozen = field._schemas[use_refs] = _freeze(field_schema(field.item, self.resolver(use_refs), field.required))
+        return _thaw(frozen)
+
+    def iter_nodes(self):
+        """
+        Parcourt l'arbre en profondeur, dans l'ordre du formulaire : ``(nœud, section parente)``.
+        """
+        stack = [iter(self.root.children)]
+        parents = [self.root]
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                stack.pop()
+                parents.pop()
+                continue
+            yield node, parents[-1]
+            if isinstance(node, Section):
+                stack.append(iter(node.children))
+                parents.append(node)
+
+    def fields(self):
+        """
+        Renvoie tous les champs, dans l'ordre du formulaire.
+        """
+        return [node for node, _ in self.iter_nodes() if isinstance(node, Field)]
+
+    def tables(self, separator="/", name=None):
+        """
+        Renvoie les tables d'une sortie tabulaire : la soumission puis chaque répétition
+        (une table parente avant ses enfants). Les notes ne donnent pas de colonne.
+
+        :param separator: Séparateur des groupes dans les noms de colonnes et de tables
+        :type separator: str
+        :param name: Nom de la table des soumissions (défaut: nom du formulaire)
+        :type name: str | None
+        :rtype: list[Table]
+        """
+        root = Table(name or self.name, self.root, None)
+        tables = [root]
+        # Section -> (table, préfixe de colonne relatif à la table)
+        placement = {id(self.root): (root, "")}
+        for node, parent in self.iter_nodes():
+            table, prefix = placement[id(parent)]
+            if isinstance(node, Section):
+                if node.repeat:
+                    child = Table(table.name + separator + prefix + node.name, node, table)
+                    tables.append(child)
+                    placement[id(node)] = (child, "")
+                else:
+                    placement[id(node)] = (table, prefix + node.name + separator)
+            elif node.kind != "note":
+                table.columns.append((prefix + node.name, node))
+        return tables
+
+    def emit(self, emitter, **options):
+        """
+        Produit une sortie avec l'émetteur ``emitter`` (voir :func:`register_emitter`).
+
+        :raises ValueError: Si l'émetteur est inconnu
+        """
+        try:
+            func = _EMITTERS[emitter]
+        except KeyError:
+            raise ValueError(f"Émetteur inconnu : {emitter} (connus : {', '.join(sorted(_EMITTERS))})") from None
+        with profiling.stage("emit", emitter=emitter):
+            return func(self, **options)
+
+
+def build_ir(xlsform_dict, base_dir=None, lookup=None):
+    """
+    Construit la représentation intermédiaire d'un dictionnaire XLSForm.
+
+    :param xlsform_dict: Dictionnaire XLSForm (sortie de ``to_json_dict()``)
+    :type xlsform_dict: dict
+    :param base_dir: Répertoire des fichiers de choix externes (voir
+        :func:`xlsF2schema.core.generate_json_schema`)
+    :type base_dir: str | None
+    :param lookup: Écriture des grandes listes externes en fichiers annexes
+    :type lookup: xlsF2schema.external.LookupFiles | None
+    :rtype: FormIR
+    """
+    with profiling.stage("build_ir") as info:
+        survey_tab = xlsform_dict.get("children", [])
+        required, conditions = section_rules(survey_tab)
+        root = Section("", (), False, required, conditions)
+        form = FormIR(xlsform_dict.get("name") or "data", root, xlsform_dict.get("choices", {}), base_dir, lookup)
+        resolver = form.resolver(False)
+
+        nodes = 0
+        stack = [(iter(survey_tab), root)]
+        while stack:
+            children, section = stack[-1]
+            item = next(children, None)
+            if item is None:
+                stack.pop()
+                continue
+            name = item.get("name")
+            if not name:
+                continue
+            nodes += 1
+            item_type = item.get("type", "")
+            path = section.path + (name,)
+            if item_type in _SECTION_TYPES:
+                sub_items = item.get("children", [])
+                sub_required, sub_conditions = section_rules(sub_items)
+                child = Section(name, path, item_type == "repeat", sub_required, sub_conditions)
+                section.children.append(child)
+                stack.append((iter(sub_items), child))
+                continue
+
+            list_name = choice_list_name(item)
+            choices = None
+            if list_name:
+                choices = form.choices.get(list_name)
+                if choices is None:
+                    values = resolver.enum(list_name)
+                    if values is not None:
+                        choices = form.choices[list_name] = intern_choices(values)
+            token = parse_type(item.get("type") or "text")[0]
+            field = Field(name, path, token, name in section.required, list_name, choices, item)
+            frozen = field._schemas[False] = _freeze(field_schema(item, resolver, field.required))
+            field.kind = _kind(token, frozen)
+            section.children.append(field)
+        info["nodes"] = nodes
+    return form
+
+
+_EMITTERS = {}
+
+
+def register_emitter(name, func, override=False):
+    """
+    Enregistre un émetteur ``func(form, **options)`` utilisable par :meth:`FormIR.emit`.
+
+    :raises ValueError: Si l'émetteur existe déjà et que ``override`` est faux
+    """
+    if name in _EMITTERS and not override:
+        raise ValueError(f"Émetteur déjà enregistré : {name}")
+    _EMITTERS[name] = func
+
+
+def registered_emitters():
+    return sorted(_EMITTERS)
+
+
+# 1. JSON SCHEMA
+def emit_json_schema(form, use_refs=False):
+    """
+    Reconstruit le schéma de :func:`~xlsF2schema.core.generate_json_schema` depuis l'IR.
+    """
+    schema, properties, required = schema_envelope()
+    record = schema["properties"]["value"]["items"]
+    required.extend(form.root.required)
+    if form.root._conditions:
+        record["allOf"] = _thaw(form.root._conditions)
+    targets = {id(form.root): properties}
+    for node, parent in form.iter_nodes():
+        if isinstance(node, Section):
+            subschema, sub_properties, sub_required = section_schema("repeat" if node.repeat else "group")
+            sub_required.extend(node.required)
+            if node._conditions:
+                section_body(subschema)["allOf"] = _thaw(node._conditions)
+            prune_required(subschema)
+            targets[id(node)] = sub_properties
+        else:
+            subschema = form.field_schema(node, use_refs)
+        targets[id(parent)][node.name] = subschema
+
+    if not required:
+        record.pop("required")
+    definitions = form.resolver(use_refs).definitions
+    if definitions:
+        schema["definitions"] = _thaw(_freeze(definitions))
+    return schema
+
+
+# 2. PANDAS
+_PANDAS_DTYPES = {
+    "integer": "Int64",
+    "number": "Float64",
+    "boolean": "boolean",
+    "date": "datetime64[ns]",
+    "date-time": "datetime64[ns, UTC]",
+}
+
+
+def emit_pandas(form, separator="/", name=None, categories=True):
+    """
+    Renvoie les dtypes pandas de chaque table : ``{table: {colonne: dtype}}``.
+
+    Les colonnes suivent les exports à plat (voir :mod:`xlsF2schema.tabular`) : un
+    ``geopoint`` reste une colonne de texte, un ``select_multiple`` ses choix séparés
+    par des espaces. Les tables des répétitions commencent par leurs clés.
+
+    :param categories: Typer les ``select_one`` à liste connue en ``CategoricalDtype``
+    :type categories: bool
+    """
+    from .tabular import _pandas
+
+    pd = _pandas()
+    dtypes = {}
+    for table in form.tables(separator, name):
+        columns = dtypes[table.name] = {}
+        if table.parent is not None:
+            columns.update({ID_COLUMN: "Int64", PARENT_COLUMN: "Int64", INDEX_COLUMN: "Int64"})
+        for column, field in table.columns:
+            if field.kind == "select_one" and categories and field.choices is not None:
+                columns[column] = pd.CategoricalDtype(list(field.choices.values))
+            else:
+                columns[column] = _PANDAS_DTYPES.get(field.kind, "string")
+    return dtypes
+
+
+# 3. ARROW
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError('Le schéma Arrow nécessite pyarrow : pip install "xlsF2schema[arrow]"') from None
+    return pyarrow
+
+
+def _not_null(field, table):
+    # Obligatoire dans sa section, sans groupe (jamais obligatoire) entre la table et le champ
+    return field.required and len(field.path) == len(table.section.path) + 1
+
+
+def emit_arrow(form, separator="/", name=None):
+    """
+    Renvoie le schéma pyarrow de chaque table : ``{table: pyarrow.Schema}``.
+
+    Les ``select_one`` sont encodés en dictionnaire, les ``select_multiple`` en listes,
+    les ``geopoint`` en quatre colonnes ``float64`` (``<colonne>/latitude``...) et les
+    traces et polygones en listes de coordonnées.
+    """
+    pa = _pyarrow()
+    point = pa.list_(pa.float64())
+    types = {
+        "integer": pa.int64(),
+        "number": pa.float64(),
+        "boolean": pa.bool_(),
+        "date": pa.date32(),
+        "date-time": pa.timestamp("ms", tz="UTC"),
+        "select_one": pa.dictionary(pa.int32(), pa.string()),
+        "select_multiple": pa.list_(pa.string()),
+        "rank": pa.list_(pa.string()),
+        "geotrace": pa.list_(point),
+        "geoshape": pa.list_(pa.list_(point)),
+    }
+    schemas = {}
+    for table in form.tables(separator, name):
+        fields = [pa.field(ID_COLUMN, pa.int64(), nullable=False)]
+        if table.parent is not None:
+            fields.append(pa.field(PARENT_COLUMN, pa.int64(), nullable=False))
+            fields.append(pa.field(INDEX_COLUMN, pa.int32(), nullable=False))
+        for column, field in table.columns:
+            nullable = not _not_null(field, table)
+            if field.kind == "geopoint":
+                for component in GEOPOINT_COMPONENTS:
+                    fields.append(pa.field(column + separator + component, pa.float64(), nullable=nullable or component not in ("latitude", "longitude")))
+            else:
+                fields.append(pa.field(column, types.get(field.kind, pa.string()), nullable=nullable))
+        schemas[table.name] = pa.schema(fields)
+    return schemas
+
+
+# 4. SQL
+_SQL_TYPES = {
+    "postgresql": {
+        "key": "BIGINT",
+        "integer": "BIGINT",
+        "number": "DOUBLE PRECISION",
+        "boolean": "BOOLEAN",
+        "date": "DATE",
+        "date-time": "TIMESTAMP WITH TIME ZONE",
+        "time": "TIME WITH TIME ZONE",
+        "geotrace": "JSONB",
+        "geoshape": "JSONB",
+        "object": "JSONB",
+        "array": "JSONB",
+        "text": "TEXT",
+    },
+    "sqlite": {
+        "key": "INTEGER",
+        "integer": "INTEGER",
+        "number": "REAL",
+        "boolean": "INTEGER",
+        "text": "TEXT",
+    },
+}
+
+# Au-delà, une liste de choix n'est pas recopiée dans une contrainte CHECK
+_SQL_CHECK_LIMIT = 1000
+
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def emit_sql(form, dialect="postgresql", separator="__", name=None, checks=True):
+    """
+    Renvoie les ordres ``CREATE TABLE`` du formulaire (une table par répétition).
+
+    Chaque table a une clé :data:`ID_COLUMN` ; celles des répétitions ont aussi
+    :data:`PARENT_COLUMN` (clé étrangère vers la table parente) et :data:`INDEX_COLUMN`.
+    Un champ n'est ``NOT NULL`` que s'il est obligatoire sans groupe entre sa table et
+    lui (les groupes ne sont jamais obligatoires). Les ``geopoint`` donnent quatre colonnes.
+
+    :param dialect: ``postgresql`` ou ``sqlite``
+    :type dialect: str
+    :param checks: Ajouter des contraintes ``CHECK`` (listes de choix, coordonnées)
+    :type checks: bool
+    :rtype: str
+    :raises ValueError: Si le dialecte est inconnu
+    """
+    if dialect not in _SQL_TYPES:
+        raise ValueError(f"Dialecte SQL inconnu : {dialect} (attendu : {', '.join(_SQL_TYPES)})")
+    types = _SQL_TYPES[dialect]
+    key = types["key"]
+    statements = []
+    for table in form.tables(separator, name):
+        lines = [f"{quote_identifier(ID_COLUMN)} {key} PRIMARY KEY"]
+        if table.parent is not None:
+            lines.append(f"{quote_identifier(PARENT_COLUMN)} {key} NOT NULL REFERENCES {quote_identifier(table.parent.name)} ({quote_identifier(ID_COLUMN)})")
+            lines.append(f"{quote_identifier(INDEX_COLUMN)} INTEGER NOT NULL")
+        for column, field in table.columns:
+            not_null = " NOT NULL" if _not_null(field, table) else ""
+            if field.kind == "geopoint":
+                for component in GEOPOINT_COMPONENTS:
+                    identifier = quote_identifier(column + separator + component)
+                    definition = f"{identifier} {types.get('number')}"
+                    if component in ("latitude", "longitude"):
+                        definition += not_null
+                        if checks:
+                            bound = 90 if component == "latitude" else 180
+                            definition += f" CHECK ({identifier} BETWEEN -{bound} AND {bound})"
+                    lines.append(definition)
+                continue
+            identifier = quote_identifier(column)
+            definition = f"{identifier} {types.get(field.kind, types['text'])}{not_null}"
+            if checks and field.kind == "select_one" and field.choices is not None and len(field.choices) <= _SQL_CHECK_LIMIT:
+                values = ", ".join(_literal(v) for v in field.choices)
+                definition += f" CHECK ({identifier} IN ({values}))"
+            lines.append(definition)
+        body = ",\n    ".join(lines)
+        statements.append(f"CREATE TABLE {quote_identifier(table.name)} (\n    {body}\n);")
+    return "\n\n".join(statements) + "\n"
+
+
+register_emitter("json_schema", emit_json_schema)
+register_emitter("pandas", emit_pandas)
+register_emitter("arrow", emit_arrow)
+register_emitter("sql", emit_sql)
@@ -0,0 +1,482 @@
+"""
+Logique de formulaire (colonnes ``relevant`` et ``constraint``).
+
+Deux usages complémentaires des expressions compilées par :mod:`xlsF2schema.xpath` :
+
+- traduction en JSON Schema lorsque c'est exact : bornes ``minimum``/``maximum``,
+  ``pattern``, longueurs, et ``if``/``then``/``else`` pour une condition d'affichage
+  portant sur des champs de la même section ;
+- :class:`LogicValidator`, qui évalue toutes les expressions supportées sur les
+  soumissions, y compris celles qu'aucun mot-clé JSON Schema ne peut exprimer.
+"""
+import re
+
+from .mapping import get_comprehensive_mapping
+from .xpath import XPathError, compile_expression, parse
+
+_SECTION_TYPES = ("group", "repeat")
+
+_NUMERIC_TYPES = ("integer", "number")
+
+# Comparaison miroir : "5 < ." équivaut à ". > 5"
+_MIRROR = {"<": ">", "<=": ">=", ">": "<", ">=": "<=", "=": "=", "!=": "!="}
+
+_BOUNDS = {">=": "minimum", ">": "exclusiveMinimum", "<=": "maximum", "<": "exclusiveMaximum"}
+
+
+def _bind(item, key):
+    value = item.get("bind", {}).get(key)
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+def _is_required(item):
+    return str(item.get("bind", {}).get("required")).lower() in ["yes", "true"]
+
+
+def _try_parse(expression):
+    try:
+        return parse(expression)
+    except XPathError:
+        return None
+
+
+def _conjuncts(tree):
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node[0] == "op" and node[1] == "and":
+            stack.extend((node[3], node[2]))
+        else:
+            yield node
+
+
+def _comparison(tree, operand):
+    """
+    Normalise une comparaison ``operand <op> littéral`` (dans un sens ou dans l'autre) ;
+    renvoie ``(op, littéral)`` ou ``None``.
+    """
+    if tree[0] != "op" or tree[1] not in _MIRROR:
+        return None
+    op, left, right = tree[1], tree[2], tree[3]
+    if left == operand and right[0] in ("num", "str"):
+        return op, right
+    if right == operand and left[0] in ("num", "str"):
+        return _MIRROR[op], left
+    return None
+
+
+def _merge(keywords, key, value):
+    if key not in keywords:
+        keywords[key] = value
+    elif key in ("minimum", "exclusiveMinimum", "minLength"):
+        keywords[key] = max(keywords[key], value)
+    elif key in ("maximum", "exclusiveMaximum", "maxLength"):
+        keywords[key] = min(keywords[key], value)
+
+
+def constraint_keywords(expression, schema, required=False):
+    """
+    Traduit les parties d'une contrainte exprimables en mots-clés JSON Schema.
+
+    Seuls les termes d'une conjonction (``and``) portant sur le champ lui-même sont
+    traduits : ``. >= 0`` (bornes numériques), ``regex(., '...')`` et
+    ``string-length(.) <= n``. Les mots-clés de chaîne ne sont émis que pour un champ
+    obligatoire : ODK ne vérifie pas la contrainte d'une réponse vide, qu'un ``pattern``
+    rejetterait. Les termes non traduits restent vérifiés par :class:`LogicValidator`.
+
+    :param expression: Contrainte XPath (``bind.constraint``)
+    :type expression: str
+    :param schema: Schéma du champ (pour son ``type``)
+    :type schema: dict
+    :return: Mots-clés à ajouter au schéma du champ (éventuellement vide)
+    :rtype: dict
+    """
+    return _constraint_terms(expression, schema, required)[0]
+
+
+def _constraint_terms(expression, schema, required):
+    """
+    Renvoie ``(mots-clés, complet)`` où ``complet`` indique que toute la contrainte est traduite.
+    """
+    tree = _try_parse(expression)
+    if tree is None:
+        return {}, False
+    types = schema.get("type")
+    types = [types] if isinstance(types, str) else (types or [])
+    numeric = any(t in types for t in _NUMERIC_TYPES)
+    textual = required and "string" in types
+
+    keywords = {}
+    complete = True
+    for term in _conjuncts(tree):
+        bound = _comparison(term, ("self",))
+        if bound and numeric and bound[1][0] == "num" and bound[0] in _BOUNDS:
+            _merge(keywords, _BOUNDS[bound[0]], bound[1][1])
+            continue
+        complete = complete and textual
+        if not textual:
+            continue
+        if term[0] == "call" and term[1] == "regex" and term[2][0] == ("self",) and term[2][1][0] == "str":
+            pattern = term[2][1][1]
+            try:
+                re.compile(pattern)
+            except re.error:
+                complete = False
+                continue
+            complete = complete and "pattern" not in keywords
+            keywords.setdefault("pattern", pattern)
+            continue
+        length = _comparison(term, ("call", "string-length", (("self",),)))
+        if length and length[1][0] == "num" and isinstance(length[1][1], int):
+            op, n = length[0], length[1][1]
+            if op in (">=", ">"):
+                _merge(keywords, "minLength", n + (op == ">"))
+                continue
+            if op in ("<=", "<") and n - (op == "<") >= 0:
+                _merge(keywords, "maxLength", n - (op == "<"))
+                continue
+        complete = False
+    return keywords, complete
+
+
+def _value_kind(item):
+    """
+    Nature JSON de la valeur d'un champ : ``"number"``, ``"string"``, ``"array"`` ou ``None``.
+    """
+    if item.get("type", "") in _SECTION_TYPES:
+        return None
+    json_type = get_comprehensive_mapping(item, {}).get("type")
+    if json_type in _NUMERIC_TYPES:
+        return "number"
+    if json_type in ("string", "array"):
+        return json_type
+    return None
+
+
+def _literal(node, kind):
+    """
+    Convertit un littéral XPath en valeur JSON comparable à un champ de nature ``kind``.
+    """
+    value = node[1]
+    if kind == "number":
+        if node[0] == "num":
+            return value
+        try:
+            number = float(value)
+        except ValueError:
+            return None
+        return int(number) if number.is_integer() else number
+    if kind == "string" and node[0] == "str" and value != "":
+        return value
+    return None
+
+
+def relevance_condition(expression, siblings):
+    """
+    Traduit une condition d'affichage en sous-schéma de l'objet parent, lorsque la
+    traduction est exacte (même résultat qu'XPath pour toute valeur, y compris absente).
+
+    Termes supportés : ``${x} = 'a'``, ``${x} != 'a'``, comparaisons numériques d'un champ
+    numérique, ``selected(${x}, 'a')``, combinés par ``and``, ``or`` et ``not()``, où
+    ``x`` est un champ de la même section.
+
+    :param siblings: Nature des champs de la section (voir :func:`_value_kind`)
+    :type siblings: dict[str, str | None]
+    :return: Sous-schéma, ou ``None`` si l'expression n'est pas traduisible
+    :rtype: dict | None
+    """
+    tree = _try_parse(expression)
+    return None if tree is None else _condition(tree, siblings)
+
+
+def _condition(tree, siblings):
+    kind = tree[0]
+    if kind == "op" and tree[1] in ("and", "or"):
+        left, right = _condition(tree[2], siblings), _condition(tree[3], siblings)
+        if left is None or right is None:
+            return None
+        return {"allOf" if tree[1] == "and" else "anyOf": [left, right]}
+    if kind == "call" and tree[1] == "not" and len(tree[2]) == 1:
+        inner = _condition(tree[2][0], siblings)
+        return None if inner is None else {"not": inner}
+    if kind == "call" and tree[1] == "selected" and len(tree[2]) == 2:
+        ref, value = tree[2]
+        if ref[0] != "ref" or value[0] != "str" or not value[1].strip():
+            return None
+        name, value = ref[1], value[1].strip()
+        if siblings.get(name) == "array":
+            return {"properties": {name: {"type": "array", "contains": {"const": value}}}, "required": [name]}
+        if siblings.get(name) == "string":
+            return {"properties": {name: {"const": value}}, "required": [name]}
+        return None
+
+    if kind != "op":
+        return None
+    for side in (tree[2], tree[3]):
+        if side[0] == "ref":
+            name = side[1]
+            break
+    else:
+        return None
+    comparison = _comparison(tree, ("ref", name))
+    field_kind = siblings.get(name)
+    if comparison is None or field_kind not in ("number", "string"):
+        return None
+    op, literal = comparison
+    value = _literal(literal, field_kind)
+    if value is None:
+        return None
+    if op == "=":
+        # Une valeur absente vaut "" : l'égalité à un littéral non vide est fausse
+        return {"properties": {name: {"const": value}}, "required": [name]}
+    if op == "!=":
+        return {"properties": {name: {"not": {"const": value}}}}
+    if field_kind != "number":
+        return None
+    return {"properties": {name: {"type": "number", _BOUNDS[op]: value}}, "required": [name]}
+
+
+def section_rules(items):
+    """
+    Renvoie les champs obligatoires d'une section et les règles conditionnelles issues
+    des conditions d'affichage traduisibles.
+
+    Un champ dont la condition ``relevant`` est traduite en ``S`` donne la règle
+    ``{"if": S, "then": {"required": [nom], "properties": {nom: {"not": {"type": "null"}}}},
+    "else": {"properties": {nom: {"enum": [null, "", [], {}]}}}}`` (``then`` seulement s'il est
+    obligatoire) : il doit être vide (absent, ``null``, ``""``, ``[]`` ou ``{}``) lorsqu'il
+    n'est pas affiché, et n'est obligatoire que lorsqu'il l'est ; son schéma accepte alors
+    ``null`` (voir :func:`xlsF2schema.core.field_schema`). La condition d'affichage d'un
+    groupe ou d'une répétition n'est pas traduite.
+
+    :return: ``(required, conditions)``
+    :rtype: tuple[list[str], list[dict]]
+    """
+    siblings = None
+    required = []
+    conditions = []
+    for item in items:
+        name = item.get("name")
+        if not name or item.get("type", "") in _SECTION_TYPES:
+            continue
+        relevant = _bind(item, "relevant")
+        condition = None
+        if relevant:
+            if siblings is None:
+                siblings = {i["name"]: _value_kind(i) for i in items if i.get("name")}
+            condition = relevance_condition(relevant, siblings)
+        if condition is None:
+            if _is_required(item):
+                required.append(name)
+            continue
+        rule = {"if": condition}
+        if _is_required(item):
+            rule["then"] = {"required": [name], "properties": {name: {"not": {"type": "null"}}}}
+        rule["else"] = {"properties": {name: {"enum": [None, "", [], {}]}}}
+        conditions.append(rule)
+    return required, conditions
+
+
+def _is_empty(value):
+    # Une section non affichée est vide si toutes ses réponses le sont
+    if isinstance(value, dict):
+        return all(_is_empty(v) for v in value.values())
+    if isinstance(value, list):
+        return all(_is_empty(v) for v in value)
+    return value is None or value == ""
+
+
+class _Rule:
+    __slots__ = ("name", "relevant", "report", "constraint", "message", "table", "section")
+
+    def __init__(self, name, relevant, report, constraint, message, table, section):
+        self.name = name
+        self.relevant = relevant
+        # Faux si la condition d'affichage est déjà vérifiée par le schéma : elle ne sert
+        # alors qu'à ignorer le contenu d'un élément non affiché
+        self.report = report
+        self.constraint = constraint
+        self.message = message
+        self.table = table
+        self.section = section
+
+
+class LogicValidator:
+    """
+    Vérifie les conditions d'affichage et les contraintes d'un formulaire sur ses soumissions.
+
+    Une valeur renseignée pour un élément non affiché (``relevant`` faux) est une erreur
+    ``relevant`` ; une valeur renseignée qui ne respecte pas ``constraint`` est une erreur
+    ``constraint``. Les expressions hors du sous-ensemble XPath supporté, ou qui référencent
+    un champ inconnu, sont ignorées et listées dans :attr:`skipped`.
+
+    :param xlsform_dict: Dictionnaire XLSForm (sortie de ``to_json_dict()``)
+    :type xlsform_dict: dict
+    :param schema_checked: Si vrai, les expressions entièrement traduites dans le JSON Schema
+        (voir :func:`constraint_keywords` et :func:`section_rules`) ne sont pas signalées une
+        seconde fois ; à utiliser lorsque les soumissions sont aussi validées par le schéma
+    :type schema_checked: bool
+    :ivar skipped: ``[(chemin, colonne, expression, raison)]``
+    """
+
+    def __init__(self, xlsform_dict, schema_checked=False):
+        self.schema_checked = schema_checked
+        self.skipped = []
+        self.locations = {}
+        self._index(xlsform_dict.get("children", []))
+        self.root = self._build(xlsform_dict.get("children", []))
+
+    def _index(self, items):
+        # Chemin de chaque nom : sections traversées puis le nom lui-même
+        stack = [(iter(items), ())]
+        while stack:
+            children, sections = stack[-1]
+            item = next(children, None)
+            if item is None:
+                stack.pop()
+                continue
+            name = item.get("name")
+            if not name:
+                continue
+            self.locations.setdefault(name, sections + (name,))
+            if item.get("type", "") in _SECTION_TYPES:
+                stack.append((iter(item.get("children", [])), sections + (name,)))
+
+    def _table(self, expression, sections):
+        table = {}
+        for ref in expression.refs:
+            target = self.locations.get(ref)
+            if target is None:
+                raise XPathError(f"Champ inconnu : ${{{ref}}}")
+            common = 0
+            while common < min(len(sections), len(target) - 1) and sections[common] == target[common]:
+                common += 1
+            table[ref] = (common, target[common:])
+        return table
+
+    def _compile(self, item, column, sections):
+        source = _bind(item, column)
+        if source is None:
+            return None, {}
+        try:
+            expression = compile_expression(source)
+            return expression, self._table(expression, sections)
+        except XPathError as e:
+            self.skipped.append(("/".join(sections + (item["name"],)), column, source, str(e)))
+            return None, {}
+
+    def _translated(self, item, siblings):
+        """
+        Indique si la condition d'affichage et la contrainte de ``item`` sont entièrement
+        exprimées par le schéma généré.
+
+        :param siblings: Nature des champs de la section (voir :func:`_value_kind`)
+        """
+        relevant = _bind(item, "relevant")
+        # Obligatoire sous condition : la contrainte est traduite comme pour un champ facultatif
+        required = _is_required(item)
+        if relevant and item.get("type", "") not in _SECTION_TYPES:
+            relevant = relevance_condition(relevant, siblings) is None
+            required = required and relevant
+        constraint = _bind(item, "constraint")
+        if constraint and item.get("type", "") not in _SECTION_TYPES:
+            schema = get_comprehensive_mapping(item, {})
+            constraint = not _constraint_terms(constraint, schema, required)[1]
+        return not relevant, not constraint
+
+    def _build(self, items):
+        root = []
+        # La nature des champs d'une section n'est calculée qu'une fois, au premier besoin
+        stack = [(iter(items), items, (), root, {})]
+        while stack:
+            children, siblings, sections, rules, kinds = stack[-1]
+            item = next(children, None)
+            if item is None:
+                stack.pop()
+                continue
+            name = item.get("name")
+            if not name:
+                continue
+            relevant, relevant_table = self._compile(item, "relevant", sections)
+            constraint, constraint_table = self._compile(item, "constraint", sections)
+            report = True
+            if self.schema_checked and (relevant or constraint):
+                if not kinds:
+                    kinds.update((i["name"], _value_kind(i)) for i in siblings if i.get("name"))
+                relevant_done, constraint_done = self._translated(item, kinds)
+                report = not relevant_done
+                if constraint_done:
+                    constraint = None
+            bind = item.get("bind", {})
+            message = bind.get("jr:constraintMsg") or bind.get("constraint_message")
+            section = None
+            if item.get("type", "") in _SECTION_TYPES:
+                section = (item["type"], [])
+                sub_items = item.get("children", [])
+                stack.append((iter(sub_items), sub_items, sections + (name,), section[1], {}))
+            if relevant or constraint or section:
+                rules.append(_Rule(name, relevant, report, constraint, message, {**relevant_table, **constraint_table}, section))
+        self._prune(root)
+        return root
+
+    @staticmethod
+    def _prune(rules):
+        # Retire les sections sans aucune règle (de l'intérieur vers l'extérieur)
+        order = []
+        stack = [rules]
+        while stack:
+            current = stack.pop()
+            order.append(current)
+            stack.extend(rule.section[1] for rule in current if rule.section)
+        for current in reversed(order):
+            current[:] = [r for r in current if r.relevant or r.constraint or (r.section and r.section[1])]
+
+    @property
+    def empty(self):
+        """
+        Vrai si le formulaire n'a aucune expression vérifiable.
+        """
+        return not self.root
+
+    def iter_record_errors(self, record, index=None):
+        """
+        Produit les erreurs d'une soumission : ``{"path", "validator", "message"}``.
+
+        :param index: Position de la soumission dans l'export ; préfixe les chemins
+            par ``["value", index]`` comme :meth:`CompiledValidator.iter_record_errors`
+        """
+        prefix = () if index is None else ("value", index)
+        stack = [(iter(self.root), record, (record,), prefix)]
+        while stack:
+            rules, obj, scopes, path = stack[-1]
+            rule = next(rules, None) if isinstance(obj, dict) else None
+            if rule is None:
+                stack.pop()
+                continue
+            value = obj.get(rule.name)
+            if rule.relevant is not None and not rule.relevant.test(value, scopes, rule.table):
+                if rule.report and not _is_empty(value):
+                    yield {
+                        "path": list(path + (rule.name,)),
+                        "validator": "relevant",
+                        "message": f"{rule.name!r} doit être vide : condition d'affichage fausse ({rule.relevant.source})",
+                    }
+                continue
+            if rule.constraint is not None and not _is_empty(value) and not rule.constraint.test(value, scopes, rule.table):
+                yield {
+                    "path": list(path + (rule.name,)),
+                    "validator": "constraint",
+                    "message": rule.message or f"{value!r} ne respecte pas la contrainte {rule.constraint.source}",
+                }
+            if rule.section is None:
+                continue
+            kind, children = rule.section
+            if kind == "repeat" and isinstance(value, list):
+                # Les instances sont empilées à l'envers pour être parcourues dans l'ordre
+                for i in reversed(range(len(value))):
+                    stack.append((iter(children), value[i], scopes + (value[i],), path + (rule.name, i)))
+            elif kind == "group":
+                stack.append((iter(children), value, scopes + (value,), path + (rule.name,)))
+
+    def is_valid_record(self, record):
+        return next(self.iter_record_errors(record), None) is None
@@ -1,3 +1,275 @@
+import os
+from collections.abc import Mapping
+from functools import lru_cache
+from types import MappingProxyType
+
+from .external import EXTERNAL_CHOICES, is_external, list_key, split_key
+
+# Registre des types XLSForm : token de type -> gabarit de schéma figé ou constructeur.
+# Les gabarits sont construits une seule fois au chargement du module ; chaque appel à
+# get_comprehensive_mapping ne fait plus qu'une recherche et une copie légère.
+_TYPE_REGISTRY = {}
+
+# Orthographes multi-mots produites par pyxform (to_json_dict) pour les types de sélection
+_MULTIWORD_TYPES = (
+    ("select all that apply", "select_multiple"),
+    ("select multiple", "select_multiple"),
+    ("select one", "select_one"),
+)
+
+_DEFAULT_SCHEMA = MappingProxyType({"type": "string"})
+
+
+def _freeze(schema):
+    """
+    Fige récursivement un gabarit de schéma (dict -> MappingProxyType, list -> tuple).
+    """
+    if isinstance(schema, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in schema.items()})
+    if isinstance(schema, (list, tuple)):
+        return tuple(_freeze(v) for v in schema)
+    return schema
+
+
+def _thaw(frozen):
+    """
+    Reconstruit une copie mutable (dict/list) d'un gabarit figé.
+    """
+    if isinstance(frozen, MappingProxyType):
+        return {k: _thaw(v) for k, v in frozen.items()}
+    if isinstance(frozen, tuple):
+        return [_thaw(v) for v in frozen]
+    return frozen
+
+
+def _is_flat(frozen):
+    return not any(isinstance(v, (MappingProxyType, tuple)) for v in frozen.values())
+
+
+class _Template:
+    """
+    Gabarit figé d'un type XLSForm, avec une copie spécialisée selon sa profondeur.
+    """
+
+    __slots__ = ("frozen", "_flat")
+
+    def __init__(self, schema):
+        self.frozen = _freeze(schema)
+        self._flat = _is_flat(self.frozen)
+
+    def build(self, list_name, choices):
+        if self._flat:
+            return dict(self.frozen)
+        return _thaw(self.frozen)
+
+
+class _Builder:
+    """
+    Constructeur dynamique d'un type XLSForm (ex: types de sélection dépendant des choix).
+    """
+
+    __slots__ = ("func",)
+
+    def __init__(self, func):
+        self.func = func
+
+    def build(self, list_name, choices):
+        return self.func(list_name, choices)
+
+
+def register_type(name, schema, aliases=(), override=False):
+    """
+    Enregistre (ou remplace) un type XLSForm dans le registre de mapping.
+
+    :param name: Nom du type XLSForm tel qu'il apparaît dans la colonne ``type`` (ex: ``"email"``)
+     :type name: str
+    :param schema: Gabarit JSON Schema à renvoyer pour ce type, ou un callable
+        ``func(list_name, choices) -> dict`` pour les types dynamiques, où ``choices``
+        est un :class:`ChoiceResolver`
+     :type schema: dict | callable
+    :param aliases: Autres noms résolus vers la même entrée
+     :type aliases: Iterable[str]
+    :param override: Autorise le remplacement d'un type déjà enregistré
+     :type override: bool
+    :raises ValueError: Si le type existe déjà et que ``override`` est faux
+    """
+    entry = _Builder(schema) if callable(schema) else _Template(schema)
+    names = [name.lower().strip()] + [a.lower().strip() for a in aliases]
+    if not override:
+        existing = [n for n in names if n in _TYPE_REGISTRY]
+        if existing:
+            raise ValueError(f"Type XLSForm déjà enregistré : {', '.join(existing)}")
+    for n in names:
+        _TYPE_REGISTRY[n] = entry
+
+
+def unregister_type(name):
+    """
+    Retire un type du registre. Les champs de ce type retombent sur ``{"type": "string"}``.
+    """
+    _TYPE_REGISTRY.pop(name.lower().strip(), None)
+
+
+def registered_types():
+    """
+    Renvoie la liste triée des types XLSForm connus du registre.
+    """
+    return sorted(_TYPE_REGISTRY)
+
+
+@lru_cache(maxsize=1024)
+def parse_type(raw_type):
+    """
+    Découpe une valeur de la colonne ``type`` en ``(token, list_name)``.
+
+    Le token est normalisé en minuscules et les orthographes pyxform
+    (``select one``, ``select all that apply``) sont ramenées aux noms XLSForm.
+    La casse du nom de liste est conservée.
+
+    :param raw_type: Valeur brute du type (ex: ``"select_one list_enqueteurs"``)
+     :type raw_type: str
+    :return: Le token de type et le nom de liste (``""`` si absent)
+     :rtype: tuple[str, str]
+    """
+    stripped = raw_type.strip()
+    lowered = stripped.lower()
+    for spelling, token in _MULTIWORD_TYPES:
+        if lowered == spelling or lowered.startswith(spelling + " "):
+            rest = stripped[len(spelling):].split()
+            return token, rest[0] if rest else ""
+    parts = stripped.split()
+    if not parts:
+        return "text", ""
+    return parts[0].lower(), parts[1] if len(parts) > 1 else ""
+
+
+def get_enum(list_name, choices_dict):
+    """
+    Renvoie la liste des valeurs d'une liste de choix (noms des choix).
+    """
+    choices = choices_dict.get(list_name, [])
+    if choices and isinstance(choices[0], dict):
+        return [c.get('name', c.get('label', '')) for c in choices]
+    return choices
+
+
+def _escape_pointer(token):
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+class ChoiceResolver(Mapping):
+    """
+    Vue sur le dictionnaire ``choices`` d'un formulaire qui normalise chaque liste
+    au plus une fois par conversion.
+
+    En mode ``use_refs``, les listes sont placées une seule fois dans
+    :attr:`definitions` et les champs de sélection y font référence via ``$ref``
+    au lieu d'embarquer leur propre copie de l'``enum``.
+
+    Les listes externes (``select_one_from_file cities.csv``) sont lues depuis
+    ``base_dir`` via le cache partagé :data:`xlsF2schema.external.EXTERNAL_CHOICES` ;
+    sans ``base_dir``, leurs champs ne sont pas contraints. Avec ``lookup``, les
+    listes externes au-delà de son seuil sont écrites dans un fichier annexe et
+    référencées par ``$ref``, quel que soit ``use_refs``.
+
+    Se comporte comme le dictionnaire d'origine (``get``, ``[]``, ``in``) pour
+    les constructeurs de types personnalisés.
+
+    :param choices_dict: Dictionnaire des listes de choix (clé ``choices`` de pyxform)
+     :type choices_dict: dict
+    :param use_refs: Active la mutualisation des listes dans ``definitions``
+     :type use_refs: bool
+    :param base_dir: Répertoire où chercher les fichiers de choix externes (celui du formulaire)
+     :type base_dir: str | None
+    :param lookup: Écriture des grandes listes externes en fichiers annexes
+     :type lookup: xlsF2schema.external.LookupFiles | None
+    """
+
+    def __init__(self, choices_dict, use_refs=False, base_dir=None, lookup=None):
+        self.choices_dict = choices_dict
+        self.use_refs = use_refs
+        self.base_dir = base_dir
+        self.lookup = lookup
+        self.definitions = {}
+        self._enums = {}
+
+    def __getitem__(self, key):
+        return self.choices_dict[key]
+
+    def __iter__(self):
+        return iter(self.choices_dict)
+
+    def __len__(self):
+        return len(self.choices_dict)
+
+    def enum(self, list_name):
+        """
+        Renvoie la liste normalisée (partagée, à ne pas modifier) des noms de choix.
+        """
+        values = self._enums.get(list_name)
+        if values is None:
+            if list_name not in self.choices_dict and is_external(list_name):
+                values = self._external(list_name)
+            else:
+                values = get_enum(list_name, self.choices_dict)
+            self._enums[list_name] = values
+        return values
+
+    def _external(self, list_name):
+        # None : fichier non résolu, le champ n'est pas contraint
+        if self.base_dir is None:
+            return None
+        file_name, value = split_key(list_name)
+        path = os.path.join(self.base_dir, file_name)
+        try:
+            return list(EXTERNAL_CHOICES.load(path, value))
+        except FileNotFoundError:
+            raise ValueError(f"Fichier de choix externe introuvable : {path}") from None
+
+    def enum_schema(self, list_name):
+        """
+        Renvoie le fragment de schéma contraignant une valeur à la liste ``list_name`` :
+        ``{"enum": [...]}`` en ligne, ou ``{"allOf": [{"$ref": ...}]}`` en mode références
+        ou pour une liste externe écrite dans un fichier annexe.
+        """
+        if is_external(list_name):
+            values = self.enum(list_name)
+            if values is None:
+                return {}
+            ref = self.lookup.ref(split_key(list_name)[0], values) if self.lookup is not None else None
+            if ref is not None:
+                return {"allOf": [{"$ref": ref}]}
+        if not self.use_refs:
+            return {"enum": list(self.enum(list_name))}
+        if list_name not in self.definitions:
+            self.definitions[list_name] = {"enum": self.enum(list_name)}
+        return {"allOf": [{"$ref": "#/definitions/" + _escape_pointer(list_name)}]}
+
+
+def _itemset(item):
+    # pyxform place le nom de liste dans "itemset"/"list_name" plutôt que dans le type
+    return item.get('itemset') or item.get('list_name') or ''
+
+
+def _list_key(item, list_name):
+    # Liste externe lue sur une autre colonne que celle par défaut (parameters: value=...)
+    if is_external(list_name):
+        parameters = item.get('parameters')
+        if isinstance(parameters, dict):
+            return list_key(list_name, parameters.get('value'))
+    return list_name
+
+
+def choice_list_name(item):
+    """
+    Renvoie le nom de la liste de choix utilisée par un champ, ou ``""`` s'il n'en utilise pas.
+    """
+    xlsform_type, list_name = parse_type(item.get('type') or 'text')
+    if not isinstance(_TYPE_REGISTRY.get(xlsform_type), _Builder):
+        return ''
+    return _list_key(item, list_name or _itemset(item))
+
+
 def get_comprehensive_mapping(item, choices_dict):
     """
     Generates a comprehensive mapping dictionary for a given item based on its type and
@@ -5,124 +277,137 @@ def get_comprehensive_mapping(item, choices_dict):
     function maps XLSForm types to JSON schema types, supporting a wide range of input
     types, including selection, numeric, temporal, geographic, and media types.
 
+    The lookup is done against the module-level type registry (see :func:`register_type`),
+    so each call only costs a dispatch on the parsed type token and a cheap copy.
+
     :param item: Dictionary containing details about the item, including its type
      :type item: dict
-    :param choices_dict: Dictionary mapping list names to their corresponding enumerations
-     :type choices_dict: dict
+    :param choices_dict: Dictionary mapping list names to their corresponding enumerations,
+     or a :class:`ChoiceResolver` shared across the fields of one conversion
+     :type choices_dict: dict | ChoiceResolver
     :return: A dictionary representing the JSON schema mapping for the given item
      :rtype: dict
     """
 
-    raw_type = item.get('type', 'text').lower().strip()
-    xlsform_type = raw_type.split()[0]
+    xlsform_type, list_name = parse_type(item.get('type') or 'text')
+    entry = _TYPE_REGISTRY.get(xlsform_type)
+    if entry is None:
+        return dict(_DEFAULT_SCHEMA)
+    if isinstance(entry, _Builder):
+        list_name = _list_key(item, list_name or _itemset(item))
+    if not isinstance(choices_dict, ChoiceResolver):
+        choices_dict = ChoiceResolver(choices_dict)
+    return entry.build(list_name, choices_dict)
 
-    def get_enum(list_name):
-        choices = choices_dict.get(list_name, [])
-        if choices and isinstance(choices[0], dict):
-            return [c.get('name', c.get('label', '')) for c in choices]
-        return choices
 
+# 1. TYPES DE SÉLECTION (CHOICES)
+def _select_one(list_name, choices):
+    return {"type": "string", **choices.enum_schema(list_name)}
 
-    # 1. TYPES DE SÉLECTION (CHOICES)
-    if xlsform_type in ['select_one', 'select_one_from_file']:
-        list_name = raw_type.split()[1] if len(raw_type.split()) > 1 else ''
-        return {"type": "string", "enum": get_enum(list_name)}
 
-    if xlsform_type in ['select_multiple', 'select_multiple_from_file']:
-        list_name = raw_type.split()[1] if len(raw_type.split()) > 1 else ''
-        return {
-            "type": "array",
-            "items": {"type": "string", "enum": get_enum(list_name)},
-            "uniqueItems": True
-        }
+def _select_multiple(list_name, choices):
+    return {
+        "type": "array",
+        "items": {"type": "string", **choices.enum_schema(list_name)},
+        "uniqueItems": True
+    }
 
-    if xlsform_type == 'rank':
-        list_name = raw_type.split()[1] if len(raw_type.split()) > 1 else ''
-        return {
-            "type": "array",
-            "items": {"type": "string", "enum": get_enum(list_name)},
-            "description": "Ranked items in order of preference"
-        }
 
-    # 2. TYPES NUMÉRIQUES & TEXTES
-    basic_mapping = {
-        'integer': {"type": "integer"},
-        'decimal': {"type": "number"},
-        'text': {"type": "string"},
-        'note': {"type": "string", "readOnly": True, "description": "Display-only note"},
-        'range': {"type": "number", "description": "Slider/Range component"},
-        'acknowledge': {"type": "boolean", "description": "Acknowledgement checkbox"},
-        'barcode': {"type": "string", "description": "Scanned barcode data"},
+def _rank(list_name, choices):
+    return {
+        "type": "array",
+        "items": {"type": "string", **choices.enum_schema(list_name)},
+        "description": "Ranked items in order of preference"
     }
 
-    # 3. TYPES TEMPORELS (Formatage ISO)
-    temporal_mapping = {
-        'date': {"type": "string", "format": "date"},
-        'datetime': {"type": "string", "format": "date-time"},
-        'time': {"type": "string", "format": "time"},
-        'start': {"type": "string", "format": "date-time", "readOnly": True},
-        'end': {"type": "string", "format": "date-time", "readOnly": True},
-        'today': {"type": "string", "format": "date", "readOnly": True},
-        'deviceid': {"type": "string", "readOnly": True},
-        'username': {"type": "string", "readOnly": True},
-    }
 
-    # 4. TYPES GÉO (GPS)
-    geo_mapping = {
-        'geopoint': {
-            "type": "object",
-            "properties": {
-                "latitude": {"type": "number", "minimum": -90, "maximum": 90},
-                "longitude": {"type": "number", "minimum": -180, "maximum": 180},
-                "altitude": {"type": "number"},
-                "accuracy": {"type": "number"}
-            },
-            "required": ["latitude", "longitude"]
+register_type('select_one', _select_one, aliases=['select_one_from_file'])
+register_type('select_multiple', _select_multiple, aliases=['select_multiple_from_file'])
+register_type('rank', _rank)
+
+# 2. TYPES NUMÉRIQUES & TEXTES
+_BASIC_MAPPING = {
+    'integer': {"type": "integer"},
+    'decimal': {"type": "number"},
+    'text': {"type": "string"},
+    'note': {"type": "string", "readOnly": True, "description": "Display-only note"},
+    'range': {"type": "number", "description": "Slider/Range component"},
+    'acknowledge': {"type": "boolean", "description": "Acknowledgement checkbox"},
+    'barcode': {"type": "string", "description": "Scanned barcode data"},
+}
+
+# 3. TYPES TEMPORELS (Formatage ISO)
+_TEMPORAL_MAPPING = {
+    'date': {"type": "string", "format": "date"},
+    'datetime': {"type": "string", "format": "date-time"},
+    'time': {"type": "string", "format": "time"},
+    'start': {"type": "string", "format": "date-time", "readOnly": True},
+    'end': {"type": "string", "format": "date-time", "readOnly": True},
+    'today': {"type": "string", "format": "date", "readOnly": True},
+    'deviceid': {"type": "string", "readOnly": True},
+    'username': {"type": "string", "readOnly": True},
+}
+
+# 4. TYPES GÉO (GPS)
+_GEO_MAPPING = {
+    'geopoint': {
+        "type": "object",
+        "properties": {
+            "latitude": {"type": "number", "minimum": -90, "maximum": 90},
+            "longitude": {"type": "number", "minimum": -180, "maximum": 180},
+            "altitude": {"type": "number"},
+            "accuracy": {"type": "number"}
         },
-        'geotrace': {
-            "type": "object",
-            "properties": {
-                "type": {"type": "string", "enum": ["LineString"]},
-                "coordinates": {
+        "required": ["latitude", "longitude"]
+    },
+    'geotrace': {
+        "type": "object",
+        "properties": {
+            "type": {"type": "string", "enum": ["LineString"]},
+            "coordinates": {
+                "type": "array",
+                "items": {
+                    "type": "array",
+                    "items": {"type": "number"},
+                    "minItems": 2
+                }
+            },
+            "properties": {"type": "object"}
+        }
+    },
+    'geoshape': {
+        "type": "object",
+        "properties": {
+            "type": {"type": "string", "enum": ["Polygon"]},
+            "coordinates": {
+                "type": "array",
+                "items": {
                     "type": "array",
                     "items": {
                         "type": "array",
                         "items": {"type": "number"},
                         "minItems": 2
                     }
-                },
-                "properties": {"type": "object"}
-            }
-        },
-        'geoshape': {
-            "type": "object",
-            "properties": {
-                "type": {"type": "string", "enum": ["Polygon"]},
-                "coordinates": {
-                    "type": "array",
-                    "items": {
-                        "type": "array",
-                        "items": {
-                            "type": "array",
-                            "items": {"type": "number"},
-                            "minItems": 2
-                        }
-                    }
-                },
-                "properties": {"type": "object"}
-            }
+                }
+            },
+            "properties": {"type": "object"}
         }
     }
+}
 
-    # 5. TYPES MÉDIAS (FICHIERS)
-    media_mapping = {
-        'image': {"type": "string", "description": "Image file name/URI"},
-        'audio': {"type": "string", "description": "Audio file name/URI"},
-        'video': {"type": "string", "description": "Video file name/URI"},
-        'file': {"type": "string", "description": "Generic file attachment"},
-    }
+# 5. TYPES MÉDIAS (FICHIERS)
+_MEDIA_MAPPING = {
+    'image': {"type": "string", "description": "Image file name/URI"},
+    'audio': {"type": "string", "description": "Audio file name/URI"},
+    'video': {"type": "string", "description": "Video file name/URI"},
+    'file': {"type": "string", "description": "Generic file attachment"},
+}
+
+for _mapping in (_BASIC_MAPPING, _TEMPORAL_MAPPING, _GEO_MAPPING, _MEDIA_MAPPING):
+    for _name, _schema in _mapping.items():
+        register_type(_name, _schema)
 
-    # Fusion des dictionnaires par destructuration
-    full_mapping = {**basic_mapping, **temporal_mapping, **geo_mapping, **media_mapping}
+# pyxform renomme "image" en "photo" dans to_json_dict()
+register_type('photo', _MEDIA_MAPPING['image'])
 
-    return full_mapping.get(xlsform_type, {"type": "string"})
\ No newline at end of file
+del _mapping, _name, _schema
@@ -0,0 +1,227 @@
+"""
+Écriture des schémas JSON : indentation ou mode compact, clés triées, écriture en
+flux dans le fichier et backend ``orjson`` optionnel.
+
+Avec le backend ``json`` (bibliothèque standard), le document est produit morceau par
+morceau et écrit au fur et à mesure : seuls les conteneurs en cours et un tampon
+d'environ :data:`CHUNK_SIZE` caractères sont gardés en mémoire, au lieu de la chaîne
+complète. Les feuilles (chaînes, nombres) et les listes de scalaires (``enum``) sont
+encodées par l'encodeur C de :mod:`json`. La sortie est identique, octet pour octet,
+à ``json.dumps(obj, indent=..., ensure_ascii=False, sort_keys=...)``.
+
+Le backend ``orjson``, s'il est installé, encode le document en une fois (bien plus
+vite) ; il ne gère que le mode compact et l'indentation à 2 espaces.
+
+Le mode canonique (:func:`canonical_json`) trie les clés, supprime les espaces et
+utilise toujours l'encodeur standard : deux formulaires identiques donnent les mêmes
+octets, donc la même empreinte (:func:`schema_digest`), quel que soit le backend installé.
+"""
+import hashlib
+import io
+import json
+
+BACKENDS = ("auto", "json", "orjson")
+
+# Taille approximative (en caractères) des écritures successives en mode flux
+CHUNK_SIZE = 1 << 16
+
+_CONTAINERS = (dict, list, tuple)
+
+
+def _orjson():
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+def resolve_backend(backend="auto", indent=4):
+    """
+    Choisit le backend effectif.
+
+    ``auto`` prend ``orjson`` s'il est installé et s'il sait produire l'indentation
+    demandée (aucune ou 2 espaces), sinon l'encodeur standard.
+
+    :raises ValueError: Si le backend est inconnu, non installé ou incompatible avec ``indent``
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend JSON inconnu : {backend} (attendu : {', '.join(BACKENDS)})")
+    if backend == "json":
+        return "json"
+    supported = indent in (None, 2)
+    if backend == "auto":
+        return "orjson" if supported and _orjson() is not None else "json"
+    if _orjson() is None:
+        raise ValueError("Le backend orjson n'est pas installé (pip install orjson)")
+    if not supported:
+        raise ValueError(f"Le backend orjson ne gère que le mode compact ou une indentation de 2 (demandé : {indent})")
+    return "orjson"
+
+
+def iter_json(obj, indent=4, sort_keys=False):
+    """
+    Encode ``obj`` en JSON et produit le texte par morceaux d'environ :data:`CHUNK_SIZE` caractères.
+
+    Le parcours est itératif : la profondeur d'imbrication n'est pas limitée par la pile d'appels.
+
+    :param indent: Nombre d'espaces par niveau, ou ``None`` pour le mode compact
+    :type indent: int | None
+    :param sort_keys: Trier les clés des objets
+    :type sort_keys: bool
+    """
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys).encode
+    key_separator = ":" if indent is None else ": "
+    pads = [""]
+
+    def newline(level):
+        # Saut de ligne suivi de l'indentation du niveau (rien en mode compact)
+        if indent is None:
+            return ""
+        while len(pads) <= level:
+            pads.append("\n" + " " * (indent * len(pads)))
+        return pads[level] if level else "\n"
+
+    parts = []
+    size = 0
+    # Conteneurs ouverts : [itérateur, est_un_objet, premier_élément]
+    stack = []
+    value = obj
+    while True:
+        if isinstance(value, dict) and value:
+            parts.append("{")
+            stack.append([iter(sorted(value.items()) if sort_keys else value.items()), True, True])
+        elif isinstance(value, (list, tuple)) and value:
+            if indent is None:
+                # En mode compact, une liste est encodée d'un bloc par l'encodeur C
+                text = encode(value)
+                parts.append(text)
+                size += len(text)
+            elif not any(isinstance(element, _CONTAINERS) for element in value):
+                # Liste de scalaires (enum, required...) : un élément par ligne
+                inner = newline(len(stack) + 1)
+                text = "[" + inner + ("," + inner).join(map(encode, value)) + newline(len(stack)) + "]"
+                parts.append(text)
+                size += len(text)
+            else:
+                parts.append("[")
+                stack.append([iter(value), False, True])
+        else:
+            parts.append(encode(value))
+
+        if size >= CHUNK_SIZE or len(parts) >= 4096:
+            yield "".join(parts)
+            parts = []
+            size = 0
+
+        # Avancer jusqu'à la prochaine valeur à encoder, en refermant les conteneurs épuisés
+        while stack:
+            frame = stack[-1]
+            item = next(frame[0], _END)
+            if item is _END:
+                stack.pop()
+                if not frame[2]:
+                    parts.append(newline(len(stack)))
+                parts.append("}" if frame[1] else "]")
+                continue
+            prefix = newline(len(stack))
+            if frame[2]:
+                frame[2] = False
+            else:
+                prefix = "," + prefix
+            if frame[1]:
+                key, value = item
+                parts.append(prefix + encode(_key(key)) + key_separator)
+            else:
+                value = item
+                parts.append(prefix)
+            break
+        else:
+            break
+
+    if parts:
+        yield "".join(parts)
+
+
+_END = object()
+
+
+def _key(key):
+    # Mêmes conversions de clés que json.dumps
+    if isinstance(key, str):
+        return key
+    if key is True:
+        return "true"
+    if key is False:
+        return "false"
+    if key is None:
+        return "null"
+    if isinstance(key, (int, float)):
+        return json.dumps(key)
+    raise TypeError(f"Clé non sérialisable en JSON : {key!r}")
+
+
+def _orjson_options(orjson, indent, sort_keys):
+    option = orjson.OPT_NON_STR_KEYS
+    if indent == 2:
+        option |= orjson.OPT_INDENT_2
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return option
+
+
+def write_json(obj, fp, indent=4, sort_keys=False, backend="auto"):
+    """
+    Écrit ``obj`` en JSON (UTF-8, caractères non ASCII conservés) dans un fichier ouvert.
+
+    :param fp: Fichier ouvert en mode texte ou binaire
+    :param indent: Nombre d'espaces par niveau, ou ``None`` pour le mode compact
+    :type indent: int | None
+    :param sort_keys: Trier les clés des objets
+    :type sort_keys: bool
+    :param backend: ``auto``, ``json`` ou ``orjson`` (voir :func:`resolve_backend`)
+    :type backend: str
+    :return: Nombre d'octets écrits (UTF-8)
+    :rtype: int
+    """
+    binary = not isinstance(fp, io.TextIOBase)
+    written = 0
+    if resolve_backend(backend, indent) == "orjson":
+        orjson = _orjson()
+        data = orjson.dumps(obj, option=_orjson_options(orjson, indent, sort_keys))
+        fp.write(data if binary else data.decode("utf-8"))
+        return len(data)
+    for chunk in iter_json(obj, indent=indent, sort_keys=sort_keys):
+        data = chunk.encode("utf-8")
+        fp.write(data if binary else chunk)
+        written += len(data)
+    return written
+
+
+def dumps_json(obj, indent=4, sort_keys=False, backend="auto"):
+    """
+    Renvoie ``obj`` encodé en JSON (``str``), avec les mêmes options que :func:`write_json`.
+    """
+    if resolve_backend(backend, indent) == "orjson":
+        orjson = _orjson()
+        return orjson.dumps(obj, option=_orjson_options(orjson, indent, sort_keys)).decode("utf-8")
+    return "".join(iter_json(obj, indent=indent, sort_keys=sort_keys))
+
+
+def canonical_json(obj):
+    """
+    Renvoie la forme canonique de ``obj`` : clés triées, sans espaces, UTF-8.
+
+    :rtype: bytes
+    """
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+def schema_digest(obj):
+    """
+    Renvoie l'empreinte SHA-256 (hexadécimale) de la forme canonique de ``obj``.
+    """
+    digest = hashlib.sha256()
+    for chunk in iter_json(obj, indent=None, sort_keys=True):
+        digest.update(chunk.encode("utf-8"))
+    return digest.hexdigest()
@@ -0,0 +1,220 @@
+"""
+Instrumentation des étapes de conversion.
+
+Chaque étape (chargement pyxform, ``to_json_dict``, parcours du formulaire, mapping des
+types, sérialisation...) est encadrée par :func:`stage`. Tant qu'aucun écouteur n'est
+inscrit, le coût est celui d'un test ; sinon chaque étape terminée produit un événement ::
+
+    {"stage": "process_items", "parent": "generate_json_schema", "depth": 1,
+     "seconds": 0.0123, "peak_kb": 512.0, "fields": 120, ...}
+
+``peak_kb`` (pic d'allocation pendant l'étape) n'est présent que si tracemalloc est actif ;
+avant Python 3.9 (pas de ``tracemalloc.reset_peak``), c'est l'accroissement de la mémoire
+allouée pendant l'étape, le pic global ne pouvant être attribué à une étape.
+Les étapes trop fines pour être encadrées une à une (le mapping de chaque champ) sont
+cumulées par :func:`accumulate` et rapportées une fois, à la fin de l'étape englobante.
+
+Usage ::
+
+    with Profiler(trace_memory=True) as profiler:
+        schema = convert_file("formulaire.xlsx")
+    print(profiler.report())
+
+ou ``add_listener(callback)`` pour recevoir les événements au fil de l'eau.
+"""
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+_listeners = []
+_local = threading.local()
+# Python 3.9+
+_reset_peak = getattr(tracemalloc, "reset_peak", None)
+
+
+def add_listener(callback):
+    """
+    Inscrit ``callback(event)``, appelé à la fin de chaque étape.
+    """
+    _listeners.append(callback)
+
+
+def remove_listener(callback):
+    _listeners.remove(callback)
+
+
+def active():
+    """
+    Indique si au moins un écouteur est inscrit.
+    """
+    return bool(_listeners)
+
+
+class _Frame:
+    __slots__ = ("name", "info", "started", "memory", "peak", "totals")
+
+    def __init__(self, name, info):
+        self.name = name
+        self.info = info
+        self.started = time.perf_counter()
+        self.memory = None
+        self.peak = 0
+        self.totals = {}
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _traced_peak():
+    # Pic depuis la dernière réinitialisation, ou à défaut mémoire allouée courante
+    traced, peak = tracemalloc.get_traced_memory()
+    return traced if _reset_peak is None else peak
+
+
+def _emit(event):
+    for callback in list(_listeners):
+        callback(event)
+
+
+@contextmanager
+def stage(name, **info):
+    """
+    Encadre une étape ; le dictionnaire renvoyé peut être complété pendant l'étape
+    (nombre de champs, tailles...) et est fusionné dans l'événement.
+    """
+    if not _listeners:
+        yield info
+        return
+
+    stack = _stack()
+    frame = _Frame(name, info)
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        frame.memory = tracemalloc.get_traced_memory()[0]
+        if stack:
+            # Le pic courant appartient à l'étape englobante : on le lui attribue avant de le réinitialiser
+            parent = stack[-1]
+            parent.peak = max(parent.peak, _traced_peak() - parent.memory)
+        if _reset_peak is not None:
+            _reset_peak()
+    stack.append(frame)
+    try:
+        yield info
+    finally:
+        stack.pop()
+        seconds = time.perf_counter() - frame.started
+        event = {"stage": name, "parent": stack[-1].name if stack else None, "depth": len(stack), "seconds": round(seconds, 6)}
+        if tracing and tracemalloc.is_tracing():
+            peak = max(frame.peak, _traced_peak() - frame.memory, 0)
+            event["peak_kb"] = round(peak / 1024, 1)
+            if stack:
+                parent = stack[-1]
+                parent.peak = max(parent.peak, peak + frame.memory - parent.memory)
+                if _reset_peak is not None:
+                    _reset_peak()
+        event.update(info)
+        for sub_name, (calls, total) in frame.totals.items():
+            _emit({"stage": sub_name, "parent": name, "depth": len(stack) + 1, "seconds": round(total, 6), "calls": calls})
+        _emit(event)
+
+
+def accumulate(name, seconds):
+    """
+    Cumule la durée d'une opération répétée dans l'étape en cours.
+    """
+    stack = _stack()
+    if not stack:
+        return
+    calls, total = stack[-1].totals.get(name, (0, 0.0))
+    stack[-1].totals[name] = (calls + 1, total + seconds)
+
+
+def form_stats(xlsform_dict):
+    """
+    Compte les éléments d'un dictionnaire XLSForm : champs, sections, profondeur
+    maximale et tailles des listes de choix.
+
+    :rtype: dict
+    """
+    fields = sections = depth = 0
+    stack = [(xlsform_dict.get("children", []), 1)]
+    while stack:
+        items, level = stack.pop()
+        for item in items:
+            if item.get("type") in ("group", "repeat"):
+                sections += 1
+                depth = max(depth, level)
+                stack.append((item.get("children", []), level + 1))
+            elif "type" in item:
+                fields += 1
+    sizes = [len(choices) for choices in xlsform_dict.get("choices", {}).values()]
+    return {
+        "fields": fields,
+        "sections": sections,
+        "max_depth": depth,
+        "choice_lists": len(sizes),
+        "choices": sum(sizes),
+        "largest_choice_list": max(sizes, default=0),
+    }
+
+
+class Profiler:
+    """
+    Collecte les événements d'instrumentation pendant un bloc ``with``.
+
+    :param trace_memory: Mesurer aussi les pics d'allocation (tracemalloc, plus lent)
+    :type trace_memory: bool
+    :param cprofile: Chemin où écrire un profil cProfile (``.prof``, lisible par pstats ou
+        snakeviz), ou ``None``
+    :type cprofile: str | None
+    """
+
+    def __init__(self, trace_memory=False, cprofile=None):
+        self.trace_memory = trace_memory
+        self.cprofile = cprofile
+        self.events = []
+        self.seconds = None
+        self.peak_kb = None
+        self._profile = None
+        self._started_tracing = False
+
+    def __enter__(self):
+        add_listener(self.events.append)
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self.cprofile:
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = round(time.perf_counter() - self._started, 6)
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.cprofile)
+        if self._started_tracing:
+            self.peak_kb = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            tracemalloc.stop()
+        remove_listener(self.events.append)
+        return False
+
+    def report(self, **extra):
+        """
+        Renvoie le rapport JSON-sérialisable : durée totale, pic d'allocation et étapes.
+        """
+        report = dict(extra)
+        report["seconds"] = self.seconds
+        if self.peak_kb is not None:
+            report["peak_kb"] = self.peak_kb
+        if self.cprofile:
+            report["cprofile"] = self.cprofile
+        report["stages"] = list(self.events)
+        return report
@@ -0,0 +1,217 @@
+import os
+
+# Colonnes de la feuille survey recopiées dans la clé "bind" (comme pyxform)
+_BIND_COLUMNS = ("required", "relevant", "constraint", "calculation", "readonly")
+
+# Types d'ouverture / fermeture de section (orthographes XLSForm acceptées par pyxform)
+_BEGIN_TYPES = {
+    "begin group": "group",
+    "begin_group": "group",
+    "begin repeat": "repeat",
+    "begin_repeat": "repeat",
+}
+_END_TYPES = {
+    "end group": "group",
+    "end_group": "group",
+    "end repeat": "repeat",
+    "end_repeat": "repeat",
+}
+
+
+def _cell_text(value):
+    """
+    Convertit une cellule openpyxl en texte, comme pyxform le lit (1.0 -> "1", True -> "true").
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _normalize_header(value):
+    header = _cell_text(value).lower()
+    # "bind::required" -> "required", "list name" -> "list_name"
+    if header.startswith("bind::"):
+        header = header[len("bind::"):]
+    return header.replace(" ", "_")
+
+
+def _find_sheet(workbook, name):
+    for sheet_name in workbook.sheetnames:
+        if sheet_name.strip().lower() == name:
+            return workbook[sheet_name]
+    return None
+
+
+def _iter_records(sheet):
+    """
+    Parcourt une feuille ligne par ligne et renvoie des couples (numéro de ligne, {colonne: texte}).
+    """
+    rows = sheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = [(i, _normalize_header(h)) for i, h in enumerate(header) if _cell_text(h)]
+    for row_number, row in enumerate(rows, start=2):
+        record = {}
+        for i, column in columns:
+            if i < len(row) and column not in record:
+                text = _cell_text(row[i])
+                if text:
+                    record[column] = text
+        if record:
+            yield row_number, record
+
+
+def _read_choices(sheet):
+    choices = {}
+    if sheet is None:
+        return choices
+    for _, record in _iter_records(sheet):
+        list_name = record.get("list_name")
+        name = record.get("name")
+        if not list_name or not name:
+            continue
+        choice = {"name": name}
+        label = record.get("label") or next(
+            (v for k, v in record.items() if k.startswith("label::")), None
+        )
+        if label:
+            choice["label"] = label
+        choices.setdefault(list_name, []).append(choice)
+    return choices
+
+
+def _read_settings(sheet):
+    if sheet is None:
+        return {}
+    for _, record in _iter_records(sheet):
+        return record
+    return {}
+
+
+def _parse_parameters(text):
+    # "value=code, label=nom" ou "value=code label=nom" -> {"value": "code", "label": "nom"}
+    parameters = {}
+    for token in text.replace(",", " ").split():
+        key, sep, value = token.partition("=")
+        if sep:
+            parameters[key.strip().lower()] = value.strip()
+    return parameters
+
+
+def _read_survey(sheet):
+    root = []
+    stack = [("survey", root)]
+    for row_number, record in _iter_records(sheet):
+        raw_type = record.get("type")
+        if not raw_type:
+            continue
+        lowered = " ".join(raw_type.lower().split())
+
+        if lowered in _END_TYPES:
+            if len(stack) == 1 or stack[-1][0] != _END_TYPES[lowered]:
+                raise ValueError(f"Ligne {row_number} de la feuille survey : '{raw_type}' sans section ouverte correspondante")
+            stack.pop()
+            continue
+
+        item = {"name": record.get("name", ""), "type": raw_type}
+        if "label" in record:
+            item["label"] = record["label"]
+        bind = {column: record[column] for column in _BIND_COLUMNS if column in record}
+        if "calculation" in bind:
+            bind["calculate"] = bind.pop("calculation")
+        if bind:
+            item["bind"] = bind
+        if "parameters" in record:
+            item["parameters"] = _parse_parameters(record["parameters"])
+
+        if lowered in _BEGIN_TYPES:
+            item["type"] = _BEGIN_TYPES[lowered]
+            item["children"] = []
+            stack[-1][1].append(item)
+            stack.append((item["type"], item["children"]))
+        else:
+            stack[-1][1].append(item)
+
+    if len(stack) > 1:
+        raise ValueError(f"Feuille survey : section '{stack[-1][0]}' non fermée")
+    return root
+
+
+def read_settings(path):
+    """
+    Lit uniquement la feuille ``settings`` d'un XLSForm (.xlsx) : ``form_id``, ``version``...
+
+    Bien plus rapide que le chargement complet pour identifier un formulaire.
+
+    :return: Colonnes de la première ligne de réglages (``{}`` sans feuille settings)
+    :rtype: dict
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        return _read_settings(_find_sheet(workbook, "settings"))
+    finally:
+        workbook.close()
+
+
+def read_xlsform(path):
+    """
+    Charge un fichier XLSForm (.xlsx) sans passer par pyxform.
+
+    Seules les feuilles ``survey``, ``choices`` et ``settings`` sont lues, en mode
+    lecture seule (streaming openpyxl). Le résultat a la même forme que la sortie de
+    ``to_json_dict()`` utilisée par :func:`xlsF2schema.core.generate_json_schema` :
+    les lignes ``begin/end group`` et ``begin/end repeat`` sont résolues en
+    ``children`` imbriqués et les choix regroupés par ``list_name``.
+
+    Aucune validation XLSForm n'est faite (références ``${...}``, noms dupliqués, etc.) ;
+    utiliser le chargeur pyxform pour cela.
+
+    :param path: Chemin du fichier XLSForm (.xlsx)
+    :type path: str
+    :return: Dictionnaire XLSForm
+    :rtype: dict
+    :raises ValueError: Si le fichier n'a pas de feuille survey ou si les sections sont mal imbriquées
+    """
+    if os.path.splitext(path)[1].lower() == ".xls":
+        raise ValueError("Le chargeur natif ne lit que les fichiers .xlsx ; utiliser le chargeur pyxform pour les .xls")
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        survey_sheet = _find_sheet(workbook, "survey")
+        if survey_sheet is None:
+            raise ValueError(f"Feuille 'survey' introuvable dans {path}")
+        children = _read_survey(survey_sheet)
+        choices = _read_choices(_find_sheet(workbook, "choices"))
+        settings = _read_settings(_find_sheet(workbook, "settings"))
+    finally:
+        workbook.close()
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    # pyxform ajoute systématiquement meta/instanceID
+    if not any(child.get("name") == "meta" for child in children):
+        children.append({
+            "name": "meta",
+            "type": "group",
+            "children": [{"name": "instanceID", "type": "calculate"}]
+        })
+
+    xlsform_dict = {
+        "name": name,
+        "type": "survey",
+        "id_string": settings.get("form_id", name),
+        "title": settings.get("form_title", name),
+        "children": children,
+        "choices": choices,
+    }
+    if "version" in settings:
+        xlsform_dict["version"] = settings["version"]
+    return xlsform_dict
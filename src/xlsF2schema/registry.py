@@ -0,0 +1,314 @@
+"""
+Registre de validateurs pour des flux de soumissions mêlant plusieurs formulaires et
+plusieurs versions.
+
+Chaque version est identifiée par ``(form_id, version)`` : ``id_string`` et ``version``
+du dictionnaire XLSForm (réglages ``form_id`` et ``version`` de la feuille settings).
+Une version enregistrée n'est convertie et compilée qu'à sa première soumission ; les
+validateurs compilés sont gardés dans un LRU borné en mémoire (taille estimée d'après
+le schéma et le code généré) et reconstruits au besoin après éviction.
+
+Chaque soumission est routée d'après ses champs ``_xform_id_string`` et ``__version__``
+(noms des exports Kobo, configurables)::
+
+    registry = ValidatorRegistry(max_bytes=64 * 1024 * 1024)
+    registry.warm("formulaires/")
+    for erreur in registry.iter_record_errors(soumission):
+        ...
+    registry.stats()  # {"hits", "misses", "evictions", "builds", ...}
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from . import profiling
+
+# Taille mémoire (estimée) par défaut des validateurs gardés en mémoire
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+FORM_ID_FIELD = "_xform_id_string"
+VERSION_FIELD = "__version__"
+
+
+def form_key(xlsform_dict):
+    """
+    Renvoie la clé ``(form_id, version)`` d'un dictionnaire XLSForm (``version`` vaut ``None`` si absente).
+    """
+    version = xlsform_dict.get("version")
+    return xlsform_dict.get("id_string") or xlsform_dict.get("name"), str(version) if version not in (None, "") else None
+
+
+def read_form_key(path):
+    """
+    Renvoie la clé ``(form_id, version)`` d'un fichier XLSForm sans le convertir
+    (feuille settings seule ; chargement complet pour les ``.xls``).
+    """
+    if path.lower().endswith(".xls"):
+        from .cli import xlsform_to_dict
+        return form_key(xlsform_to_dict(path))
+    from .reader import read_settings
+
+    settings = read_settings(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    return form_key({"id_string": settings.get("form_id") or name, "version": settings.get("version")})
+
+
+class _Entry:
+    __slots__ = ("key", "path", "survey", "validator", "logic", "size")
+
+    def __init__(self, key, path=None, survey=None):
+        self.key = key
+        self.path = path
+        self.survey = survey
+        self.validator = None
+        self.logic = None
+        self.size = 0
+
+
+def _footprint(validator):
+    # Estimation : schéma compact et code Python généré, en octets
+    return len(json.dumps(validator.schema, ensure_ascii=False, separators=(",", ":"))) + len(validator.source)
+
+
+class ValidatorRegistry:
+    """
+    Associe ``(form_id, version)`` à un validateur compilé construit à la demande.
+
+    :param max_bytes: Taille estimée maximale des validateurs gardés en mémoire ; au-delà,
+        les moins récemment utilisés sont libérés (et reconstruits à leur prochaine soumission)
+    :type max_bytes: int
+    :param use_refs: Voir :func:`xlsF2schema.core.generate_json_schema`
+    :type use_refs: bool
+    :param loader: Chargeur XLSForm (``pyxform`` ou ``native``)
+    :type loader: str
+    :param cache: Cache de conversion sur disque (accélère les reconstructions)
+    :type cache: xlsF2schema.cache.ConversionCache | None
+    :param logic: Vérifier aussi les conditions ``relevant`` / ``constraint``
+    :type logic: bool
+    :param form_id_field: Champ d'une soumission portant l'identifiant du formulaire
+    :param version_field: Champ d'une soumission portant sa version
+    :param default_form_id: Formulaire des soumissions sans ``form_id_field``
+    :type default_form_id: str | None
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, use_refs=False, loader="pyxform", cache=None, logic=True,
+                 form_id_field=FORM_ID_FIELD, version_field=VERSION_FIELD, default_form_id=None):
+        self.max_bytes = max_bytes
+        self.use_refs = use_refs
+        self.loader = loader
+        self.cache = cache
+        self.logic = logic
+        self.form_id_field = form_id_field
+        self.version_field = version_field
+        self.default_form_id = default_form_id
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.builds = 0
+        self.bytes = 0
+        self._entries = {}
+        # Entrées dont le validateur est en mémoire, de la moins à la plus récemment utilisée
+        self._loaded = OrderedDict()
+        self._versions = {}
+        self._lock = threading.RLock()
+
+    def _add(self, entry):
+        with self._lock:
+            previous = self._entries.get(entry.key)
+            if previous is not None:
+                self._unload(previous)
+            self._entries[entry.key] = entry
+            self._versions.setdefault(entry.key[0], set()).add(entry.key[1])
+        return entry.key
+
+    def register(self, path):
+        """
+        Enregistre un fichier XLSForm sans le convertir. Une version déjà enregistrée est remplacée.
+
+        :return: Clé ``(form_id, version)``
+        """
+        return self._add(_Entry(read_form_key(path), path=path))
+
+    def add(self, xlsform_dict):
+        """
+        Enregistre un dictionnaire XLSForm déjà chargé (gardé en mémoire pour les reconstructions).
+
+        :return: Clé ``(form_id, version)``
+        """
+        return self._add(_Entry(form_key(xlsform_dict), survey=xlsform_dict))
+
+    def warm(self, directory, build=True):
+        """
+        Enregistre les XLSForm d'un répertoire (récursivement) et, avec ``build``, compile
+        leurs validateurs tant que la borne mémoire le permet.
+
+        :return: ``(clés enregistrées, échecs)`` où ``échecs`` associe un chemin à son message d'erreur
+        :rtype: tuple[list[tuple], dict]
+        """
+        from .batch import collect_inputs
+
+        keys = []
+        failures = {}
+        with profiling.stage("warm_registry") as info:
+            for path in collect_inputs([directory]):
+                try:
+                    key = self.register(path)
+                    if build and self.bytes < self.max_bytes:
+                        self.get(*key)
+                except Exception as e:
+                    failures[path] = str(e)
+                    continue
+                keys.append(key)
+            info.update(forms=len(keys), failures=len(failures))
+        return keys, failures
+
+    def keys(self):
+        return list(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _build(self, entry):
+        from .core import generate_json_schema
+        from .validator import compile_schema
+
+        base_dir = None
+        survey = entry.survey
+        if entry.path is not None:
+            from .cli import xlsform_to_dict
+
+            survey = xlsform_to_dict(entry.path, cache=self.cache, loader=self.loader)
+            base_dir = os.path.dirname(os.path.abspath(entry.path))
+        with profiling.stage("build_validator", form_id=entry.key[0], version=entry.key[1]):
+            entry.validator = compile_schema(generate_json_schema(survey, use_refs=self.use_refs, base_dir=base_dir))
+            if self.logic:
+                from .stream import _logic_validator
+                entry.logic = _logic_validator(survey)
+        entry.size = _footprint(entry.validator)
+        self.builds += 1
+
+    def _unload(self, entry):
+        if self._loaded.pop(entry.key, None) is not None:
+            self.bytes -= entry.size
+        entry.validator = entry.logic = None
+        entry.size = 0
+
+    def _entry(self, form_id, version):
+        with self._lock:
+            entry = self._entries.get((form_id, version))
+            if entry is None:
+                raise KeyError(f"Formulaire inconnu : {form_id} (version {version})")
+            if entry.validator is not None:
+                self.hits += 1
+                self._loaded.move_to_end(entry.key)
+                return entry
+            self.misses += 1
+            self._build(entry)
+            self._loaded[entry.key] = entry
+            self.bytes += entry.size
+            # Le validateur qui vient d'être construit est gardé, même s'il dépasse seul la borne
+            while self.bytes > self.max_bytes and len(self._loaded) > 1:
+                _, evicted = self._loaded.popitem(last=False)
+                self.bytes -= evicted.size
+                evicted.validator = evicted.logic = None
+                evicted.size = 0
+                self.evictions += 1
+            return entry
+
+    def get(self, form_id, version=None):
+        """
+        Renvoie le validateur compilé d'une version, construit s'il n'est pas en mémoire.
+
+        :rtype: xlsF2schema.validator.CompiledValidator
+        :raises KeyError: Si la version n'est pas enregistrée
+        """
+        return self._entry(form_id, version).validator
+
+    def key_of(self, record):
+        """
+        Renvoie la clé ``(form_id, version)`` d'une soumission.
+
+        Une soumission sans version est routée vers l'unique version enregistrée de son
+        formulaire, s'il n'y en a qu'une.
+
+        :raises KeyError: Si le formulaire ou la version ne peuvent être déterminés
+        """
+        form_id = record.get(self.form_id_field, self.default_form_id) if isinstance(record, dict) else self.default_form_id
+        if form_id is None:
+            raise KeyError(f"Soumission sans identifiant de formulaire ({self.form_id_field})")
+        version = record.get(self.version_field) if isinstance(record, dict) else None
+        if version is None:
+            versions = self._versions.get(form_id, ())
+            if len(versions) == 1:
+                return form_id, next(iter(versions))
+            return form_id, None
+        return form_id, str(version)
+
+    def route(self, record):
+        """
+        Renvoie le validateur compilé correspondant à une soumission (voir :meth:`key_of`).
+        """
+        return self.get(*self.key_of(record))
+
+    def iter_record_errors(self, record, index=None):
+        """
+        Itère sur les erreurs d'une soumission, au format de :func:`xlsF2schema.stream.validate_stream`
+        (``{"index", "path", "validator", "message"}``). Une soumission d'un formulaire ou
+        d'une version inconnus donne une erreur ``version``.
+        """
+        from .stream import _record_errors
+
+        try:
+            entry = self._entry(*self.key_of(record))
+        except KeyError as e:
+            yield {"index": index, "path": [], "validator": "version", "message": e.args[0]}
+            return
+        yield from _record_errors(entry.validator, index, record, entry.logic)
+
+    def is_valid_record(self, record):
+        return next(self.iter_record_errors(record), None) is None
+
+    def validate_stream(self, fp, out, fmt="json"):
+        """
+        Valide un export mêlant plusieurs formulaires et versions ; les erreurs sont écrites
+        en JSON Lines, comme :func:`xlsF2schema.stream.validate_stream`.
+
+        :return: Résumé ``{"records", "invalid", "errors"}``
+        :rtype: dict
+        """
+        from .stream import iter_records
+
+        summary = {"records": 0, "invalid": 0, "errors": 0}
+        for index, record in enumerate(iter_records(fp, fmt)):
+            summary["records"] += 1
+            errors = list(self.iter_record_errors(record, index))
+            if errors:
+                summary["invalid"] += 1
+                summary["errors"] += len(errors)
+                for error in errors:
+                    out.write(json.dumps(error, ensure_ascii=False) + "\n")
+        return summary
+
+    def clear(self):
+        """
+        Libère tous les validateurs compilés (les versions restent enregistrées).
+        """
+        with self._lock:
+            for entry in list(self._loaded.values()):
+                self._unload(entry)
+
+    def stats(self):
+        return {
+            "forms": len(self._entries),
+            "loaded": len(self._loaded),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "builds": self.builds,
+        }
@@ -0,0 +1,391 @@
+"""
+Service HTTP local de conversion et de validation (asyncio, bibliothèque standard uniquement).
+
+Points d'entrée ::
+
+    POST /forms[?refs=1&loader=native&filename=f.xlsx]   corps : fichier XLSForm brut
+         -> {"form_id": ..., "schema": {...}}
+    GET  /forms/<form_id>                               -> schéma
+    POST /forms/<form_id>/validate                      corps : {"value": [...]} ou tableau JSON
+         -> {"records", "invalid", "errors": [{"index", "path", "validator", "message"}]}
+    GET  /metrics                                       -> latences, file d'attente, cache
+    GET  /health
+
+Le parsing XLSForm est délégué à un pool de processus borné ; au-delà de ``max_queue``
+conversions en attente, le service répond 503. Les schémas et leurs validateurs compilés
+sont gardés dans un LRU indexé par l'empreinte du fichier.
+"""
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_MAX_BODY = 64 * 1024 * 1024
+
+# Nombre de latences conservées par route pour le calcul des percentiles
+LATENCY_WINDOW = 1024
+
+_REASONS = {
+    200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+_FORM_ROUTE = re.compile(r"^/forms/([0-9a-z-]+)(/validate)?$")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _convert_upload(data, suffix, use_refs, loader, cache_dir):
+    """
+    Convertit un XLSForm reçu en mémoire (exécuté dans un processus du pool).
+    """
+    from xlsF2schema.cache import ConversionCache
+    from xlsF2schema.cli import convert_file
+
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="xlsF2schema-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        cache = ConversionCache(cache_dir) if cache_dir else None
+        return convert_file(path, use_refs=use_refs, cache=cache, loader=loader)
+    finally:
+        os.unlink(path)
+
+
+class FormStore:
+    """
+    LRU des formulaires convertis : schéma et validateur compilé (à la demande) par ``form_id``.
+    """
+
+    def __init__(self, capacity=128):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, form_id):
+        entry = self.entries.get(form_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(form_id)
+        return entry
+
+    def put(self, form_id, schema):
+        self.entries[form_id] = {"schema": schema, "validator": None}
+        self.entries.move_to_end(form_id)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def validator(self, entry):
+        if entry["validator"] is None:
+            from xlsF2schema.validator import compile_schema
+            entry["validator"] = compile_schema(entry["schema"])
+        return entry["validator"]
+
+    def stats(self):
+        return {"size": len(self.entries), "capacity": self.capacity, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class Metrics:
+    """
+    Compteurs par route : nombre de requêtes, erreurs et latences (fenêtre glissante).
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.started = time.time()
+
+    def record(self, route, status, seconds):
+        stats = self.routes.setdefault(route, {"count": 0, "errors": 0, "total_seconds": 0.0, "window": deque(maxlen=LATENCY_WINDOW)})
+        stats["count"] += 1
+        stats["errors"] += status >= 400
+        stats["total_seconds"] += seconds
+        stats["window"].append(seconds)
+
+    @staticmethod
+    def _percentile(ordered, q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self):
+        routes = {}
+        for route, stats in self.routes.items():
+            ordered = sorted(stats["window"])
+            routes[route] = {
+                "count": stats["count"],
+                "errors": stats["errors"],
+                "mean_ms": round(1000 * stats["total_seconds"] / stats["count"], 3),
+                "p50_ms": round(1000 * self._percentile(ordered, 0.50), 3),
+                "p95_ms": round(1000 * self._percentile(ordered, 0.95), 3),
+                "max_ms": round(1000 * ordered[-1], 3),
+            }
+        return {"uptime": round(time.time() - self.started, 1), "routes": routes}
+
+
+class FormService:
+    """
+    Logique du service, indépendante du transport HTTP.
+
+    :param workers: Nombre de processus de conversion
+    :type workers: int
+    :param max_queue: Conversions en attente acceptées au-delà des ``workers`` en cours
+    :type max_queue: int
+    :param cache_size: Capacité du LRU des formulaires
+    :type cache_size: int
+    :param cache_dir: Répertoire du cache de conversion sur disque (désactivé si ``None``)
+    :type cache_dir: str | None
+    """
+
+    def __init__(self, workers=2, max_queue=16, cache_size=128, cache_dir=None, max_body=DEFAULT_MAX_BODY):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.cache_dir = cache_dir
+        self.max_body = max_body
+        self.store = FormStore(cache_size)
+        self.metrics = Metrics()
+        # Un fork depuis la boucle hériterait des sockets clients ouverts (la fermeture d'une
+        # connexion n'atteindrait plus le client) : les processus partent d'un état propre
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        self.running = 0
+        self.waiting = 0
+        self._slots = None
+        # Conversions en cours par form_id : les téléversements simultanés d'un même fichier
+        # partagent le même travail
+        self._inflight = {}
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    async def convert(self, data, suffix=".xlsx", use_refs=False, loader="pyxform"):
+        """
+        Convertit un XLSForm (octets) ou renvoie le schéma déjà connu.
+
+        :return: ``(form_id, schema)``
+        :raises HTTPError: 503 si la file d'attente est pleine, 400 si la conversion échoue
+        """
+        variant = ("refs" if use_refs else "inline") + ("" if loader == "pyxform" else f"-{loader}")
+        form_id = hashlib.sha256(data).hexdigest() + ("" if variant == "inline" else f"-{variant}")
+        entry = self.store.get(form_id)
+        if entry is not None:
+            return form_id, entry["schema"]
+        if form_id in self._inflight:
+            return form_id, await asyncio.shield(self._inflight[form_id])
+
+        if self.running + self.waiting >= self.workers + self.max_queue:
+            raise HTTPError(503, "File de conversion pleine, réessayez plus tard")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[form_id] = future
+        try:
+            self.waiting += 1
+            try:
+                await self._slots.acquire()
+            finally:
+                self.waiting -= 1
+            self.running += 1
+            try:
+                schema = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, _convert_upload, data, suffix, use_refs, loader, self.cache_dir,
+                )
+            finally:
+                self.running -= 1
+                self._slots.release()
+        except Exception as e:
+            error = e if isinstance(e, HTTPError) else HTTPError(400, f"Conversion impossible : {e}")
+            future.set_exception(error)
+            # Évite l'avertissement « exception never retrieved » sans attente concurrente
+            future.exception()
+            raise error from e
+        else:
+            self.store.put(form_id, schema)
+            future.set_result(schema)
+        finally:
+            del self._inflight[form_id]
+            if not future.done():
+                # Première requête annulée (client déconnecté, arrêt) : les requêtes en attente
+                # de la même conversion ne doivent pas rester bloquées
+                future.set_exception(HTTPError(503, "Conversion interrompue, réessayez plus tard"))
+                future.exception()
+        return form_id, schema
+
+    async def validate(self, form_id, records):
+        entry = self.store.get(form_id)
+        if entry is None:
+            raise HTTPError(404, f"Formulaire inconnu : {form_id} (à téléverser via POST /forms)")
+        validator = self.store.validator(entry)
+
+        def check():
+            errors = []
+            invalid = 0
+            for index, record in enumerate(records):
+                found = [
+                    {"index": index, "path": list(error.path), "validator": error.validator, "message": error.message}
+                    for error in validator.iter_record_errors(record, index)
+                ]
+                invalid += bool(found)
+                errors.extend(found)
+            return {"records": len(records), "invalid": invalid, "errors": errors}
+
+        return await asyncio.get_running_loop().run_in_executor(None, check)
+
+    def metrics_snapshot(self):
+        snapshot = self.metrics.snapshot()
+        snapshot["queue"] = {"running": self.running, "waiting": self.waiting, "workers": self.workers, "max_queue": self.max_queue}
+        snapshot["forms"] = self.store.stats()
+        return snapshot
+
+    async def handle(self, method, target, body):
+        """
+        Traite une requête ; renvoie ``(statut, objet JSON)``.
+        """
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        path = url.path.rstrip("/") or "/"
+
+        if path == "/health":
+            return 200, {"ok": True}
+        if path == "/metrics":
+            return 200, self.metrics_snapshot()
+        if path == "/forms":
+            if method != "POST":
+                raise HTTPError(405, "Méthode non autorisée")
+            if not body:
+                raise HTTPError(400, "Corps vide : envoyer le fichier XLSForm")
+            loader = query.get("loader", "pyxform")
+            if loader not in ("pyxform", "native"):
+                raise HTTPError(400, f"Chargeur inconnu : {loader}")
+            suffix = os.path.splitext(query.get("filename", ""))[1].lower() or ".xlsx"
+            use_refs = query.get("refs", "").lower() in ["1", "yes", "true"]
+            form_id, schema = await self.convert(body, suffix, use_refs, loader)
+            return 201, {"form_id": form_id, "schema": schema}
+
+        match = _FORM_ROUTE.match(path)
+        if match is None:
+            raise HTTPError(404, f"Route inconnue : {path}")
+        form_id, validate = match.groups()
+        if not validate:
+            if method != "GET":
+                raise HTTPError(405, "Méthode non autorisée")
+            entry = self.store.get(form_id)
+            if entry is None:
+                raise HTTPError(404, f"Formulaire inconnu : {form_id}")
+            return 200, entry["schema"]
+        if method != "POST":
+            raise HTTPError(405, "Méthode non autorisée")
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            raise HTTPError(400, f"JSON invalide : {e}") from e
+        records = data.get("value") if isinstance(data, dict) else data
+        if not isinstance(records, list):
+            raise HTTPError(400, "Attendu : {\"value\": [...]} ou un tableau de soumissions")
+        return 200, await self.validate(form_id, records)
+
+    @staticmethod
+    def route_name(target):
+        path = urlsplit(target).path.rstrip("/") or "/"
+        match = _FORM_ROUTE.match(path)
+        if match:
+            return "/forms/{id}/validate" if match.group(2) else "/forms/{id}"
+        return path
+
+    async def handle_connection(self, reader, writer):
+        """
+        Boucle HTTP/1.1 minimale (keep-alive, corps à longueur fixe) sur une connexion.
+        """
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                started = time.perf_counter()
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                try:
+                    if "chunked" in headers.get("transfer-encoding", "").lower():
+                        keep_alive = False
+                        raise HTTPError(411, "Transfer-Encoding chunked non supporté : fournir Content-Length")
+                    length = int(headers.get("content-length") or 0)
+                    if length > self.max_body:
+                        keep_alive = False
+                        raise HTTPError(413, f"Corps trop volumineux (max {self.max_body} octets)")
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = await self.handle(method.upper(), target, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except asyncio.IncompleteReadError:
+                    return
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                self.metrics.record(self.route_name(target), status, time.perf_counter() - started)
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+
+async def start_server(service, host="127.0.0.1", port=8000):
+    """
+    Démarre le service sur ``host:port`` et renvoie le serveur asyncio.
+    """
+    return await asyncio.start_server(service.handle_connection, host, port)
+
+
+def serve(host="127.0.0.1", port=8000, **options):
+    """
+    Lance le service au premier plan jusqu'à interruption (Ctrl+C).
+
+    :param options: Paramètres de :class:`FormService`
+    """
+    service = FormService(**options)
+
+    async def run():
+        server = await start_server(service, host, port)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
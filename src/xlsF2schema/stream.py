@@ -0,0 +1,261 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .logic import LogicValidator
+from .validator import compile_schema
+
+_CHUNK_SIZE = 1 << 16
+# Taille maximale d'une soumission encore incomplète dans le tampon : au-delà, une erreur
+# de décodage est définitive (sans lire le reste du flux)
+_MAX_RECORD_SIZE = 64 << 20
+# Une erreur plus loin que cette marge de la fin du tampon ne vient pas d'une troncature
+_TOKEN_MARGIN = 64
+_WHITESPACE = " \t\n\r"
+
+_decoder = json.JSONDecoder()
+
+
+class _Buffer:
+    """
+    Tampon de lecture incrémentale sur un flux texte, pour décoder du JSON élément par élément.
+    """
+
+    def __init__(self, fp, chunk_size):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.data = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size=None):
+        """
+        Lit un bloc supplémentaire (d'au moins ``size`` caractères) ; renvoie False en fin de flux.
+        """
+        if self.eof:
+            return False
+        chunk = self.fp.read(max(self.chunk_size, size or 0))
+        if not chunk:
+            self.eof = True
+            return False
+        # Abandonne la partie déjà consommée pour borner la mémoire
+        self.data = self.data[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        Renvoie le prochain caractère significatif (hors espaces), ou "" en fin de flux.
+        """
+        while True:
+            while self.pos < len(self.data) and self.data[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.data):
+                return self.data[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            found = self.peek() or "fin de flux"
+            raise ValueError(f"JSON invalide : '{char}' attendu, '{found}' trouvé")
+        self.pos += 1
+
+    def decode(self):
+        """
+        Décode la prochaine valeur JSON complète, en lisant autant de blocs que nécessaire.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.data, self.pos)
+            except json.JSONDecodeError as e:
+                # Valeur peut-être tronquée par la fin du tampon (ou chaîne non terminée) :
+                # on relit, dans la limite de _MAX_RECORD_SIZE. Le bloc lu est au moins aussi
+                # grand que la valeur en attente (le tampon double) : un enregistrement de
+                # taille n n'est redécodé que O(log n) fois, pour un coût total en O(n)
+                pending = len(self.data) - self.pos
+                truncated = e.msg.startswith("Unterminated string") or e.pos >= len(self.data) - _TOKEN_MARGIN
+                if truncated and pending <= _MAX_RECORD_SIZE and self.fill(pending):
+                    continue
+                raise
+            # Un nombre en fin de tampon peut être tronqué : on relit avant d'accepter
+            if end == len(self.data) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_array(buffer):
+    buffer.expect("[")
+    if buffer.peek() == "]":
+        buffer.pos += 1
+        return
+    while True:
+        yield buffer.decode()
+        separator = buffer.peek()
+        buffer.pos += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"JSON invalide : ',' ou ']' attendu, '{separator or 'fin de flux'}' trouvé")
+
+
+def iter_records(fp, fmt="json", key="value", chunk_size=_CHUNK_SIZE):
+    """
+    Parcourt les soumissions d'un export une par une, sans charger tout le fichier.
+
+    :param fp: Flux texte ouvert en lecture
+    :param fmt: ``"json"`` pour un document ``{"value": [...]}`` (ou un tableau nu),
+        ``"ndjson"`` pour une soumission par ligne
+    :type fmt: str
+    :param key: Clé du tableau des soumissions dans le document enveloppe
+    :type key: str
+    :raises ValueError: Si le document est mal formé ou ne contient pas la clé ``key``
+    """
+    if fmt == "ndjson":
+        for line in fp:
+            if line.strip():
+                yield json.loads(line)
+        return
+
+    buffer = _Buffer(fp, chunk_size)
+    if buffer.peek() == "[":
+        yield from _iter_array(buffer)
+        return
+
+    buffer.expect("{")
+    while buffer.peek() != "}":
+        name = buffer.decode()
+        buffer.expect(":")
+        if name == key:
+            yield from _iter_array(buffer)
+            return
+        # Les autres clés de l'enveloppe (ex: @odata.context) sont décodées puis ignorées
+        buffer.decode()
+        if buffer.peek() == ",":
+            buffer.pos += 1
+    raise ValueError(f"Clé '{key}' introuvable dans le document")
+
+
+def _record_errors(validator, index, record, logic=None):
+    errors = [
+        {
+            "index": index,
+            "path": list(error.path),
+            "validator": error.validator,
+            "message": error.message,
+        }
+        for error in validator.iter_record_errors(record, index)
+    ]
+    if logic is not None:
+        errors.extend({"index": index, **error} for error in logic.iter_record_errors(record, index))
+    return errors
+
+
+_worker_validator = None
+_worker_logic = None
+
+
+def _logic_validator(survey):
+    if survey is None:
+        return None
+    # Les expressions traduites dans le schéma sont déjà vérifiées par le validateur compilé
+    logic = LogicValidator(survey, schema_checked=True)
+    return None if logic.empty else logic
+
+
+def _init_worker(schema, survey=None):
+    global _worker_validator, _worker_logic
+    _worker_validator = compile_schema(schema)
+    _worker_logic = _logic_validator(survey)
+
+
+def _check_batch(validator, batch, logic=None):
+    errors = []
+    invalid = 0
+    for index, record in batch:
+        record_errors = _record_errors(validator, index, record, logic)
+        if record_errors:
+            invalid += 1
+            errors.extend(record_errors)
+    return invalid, errors
+
+
+def _validate_batch(batch):
+    return _check_batch(_worker_validator, batch, _worker_logic)
+
+
+def _batches(records, batch_size):
+    batch = []
+    for index, record in enumerate(records):
+        batch.append((index, record))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def validate_stream(fp, schema, out, fmt="json", workers=1, batch_size=1000, survey=None):
+    """
+    Valide un export de soumissions en streaming et écrit les erreurs en JSON Lines.
+
+    Les soumissions sont lues une par une (voir :func:`iter_records`) et validées avec le
+    validateur compilé. Avec ``workers > 1``, des lots de ``batch_size`` soumissions sont
+    répartis dans un pool de processus ; le nombre de lots en vol est borné, de même
+    que la mémoire. Les erreurs sont écrites dans l'ordre des soumissions.
+
+    Avec le dictionnaire XLSForm (``survey``), les conditions d'affichage et les contraintes
+    sont aussi vérifiées (erreurs ``relevant`` / ``constraint``, voir
+    :class:`xlsF2schema.logic.LogicValidator`).
+
+    :param fp: Flux texte de l'export
+    :param schema: JSON Schema généré par :func:`xlsF2schema.core.generate_json_schema`
+    :type schema: dict
+    :param out: Flux texte recevant une erreur JSON par ligne
+        (``{"index", "path", "validator", "message"}``)
+    :param workers: Nombre de processus de validation
+    :type workers: int
+    :param survey: Dictionnaire XLSForm du formulaire (optionnel)
+    :type survey: dict | None
+    :return: Résumé ``{"records", "invalid", "errors"}``
+    :rtype: dict
+    """
+    summary = {"records": 0, "invalid": 0, "errors": 0}
+
+    def emit(batch_size_done, invalid, errors):
+        summary["records"] += batch_size_done
+        summary["invalid"] += invalid
+        summary["errors"] += len(errors)
+        for error in errors:
+            out.write(json.dumps(error, ensure_ascii=False) + "\n")
+
+    batches = _batches(iter_records(fp, fmt), batch_size)
+
+    if workers <= 1:
+        validator = compile_schema(schema)
+        logic = _logic_validator(survey)
+        for batch in batches:
+            emit(len(batch), *_check_batch(validator, batch, logic))
+        return summary
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(schema, survey)) as executor:
+        for batch in batches:
+            pending.append((len(batch), executor.submit(_validate_batch, batch)))
+            if len(pending) >= workers * 2:
+                done, future = pending.popleft()
+                emit(done, *future.result())
+        while pending:
+            done, future = pending.popleft()
+            emit(done, *future.result())
+    return summary
+
+
+def detect_format(path):
+    """
+    Devine le format d'un export d'après son extension (``.ndjson``/``.jsonl`` -> ndjson).
+    """
+    return "ndjson" if os.path.splitext(path)[1].lower() in (".ndjson", ".jsonl") else "json"
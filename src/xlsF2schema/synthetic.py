@@ -0,0 +1,630 @@
+"""
+Génération de soumissions synthétiques conformes à un formulaire, pour les tests de charge.
+
+Le générateur s'appuie sur la représentation intermédiaire (:func:`xlsF2schema.ir.build_ir`),
+donc sur le même mapping de types et le même parcours des groupes et répétitions que
+:func:`xlsF2schema.core.generate_json_schema`. Les valeurs sont tirées colonne par colonne
+avec numpy, par lots : listes de choix, bornes (y compris celles des contraintes traduites),
+textes (mots prédéfinis, ou construits d'après ``pattern`` et longueurs), dates, heures,
+coordonnées des ``geopoint``/``geotrace``/``geoshape``, valeurs nulles des champs
+facultatifs et nombre d'occurrences des répétitions. Les champs dont la condition
+d'affichage est traduite dans le schéma sont vidés lorsqu'elle est fausse.
+
+Les soumissions produites sont valides pour le schéma généré ; les textes respectent aussi
+la contrainte (``constraint``) de leur champ lorsqu'elle ne porte que sur lui. Une
+contrainte qui référence d'autres champs, ou une contrainte non traduite d'un champ non
+textuel, n'est pas prise en compte : :class:`xlsF2schema.logic.LogicValidator` peut alors
+signaler des erreurs. Un même ``seed`` donne les mêmes soumissions.
+
+Usage ::
+
+    generator = SubmissionGenerator(xlsform_data, seed=42)
+    with open("soumissions.ndjson", "wb") as f:
+        generator.write_ndjson(f, 1_000_000)
+"""
+import csv
+import io
+import json
+import string
+from math import ceil, floor
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError('La génération de soumissions nécessite numpy : pip install "xlsF2schema[synthetic]"') from None
+
+try:
+    from re import _parser as _sre  # Python 3.11+
+except ImportError:
+    import sre_parse as _sre
+
+from . import profiling
+from .core import is_required
+from .ir import Field, Section, build_ir
+from .logic import constraint_keywords
+from .output import _orjson
+from .xpath import XPathError, compile_expression
+
+DEFAULT_BATCH_SIZE = 10000
+
+# Textes candidats des champs libres (filtrés selon les contraintes de chaque champ)
+_WORDS = (
+    "alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliett",
+    "kilo", "lima", "mike", "november", "oscar", "papa", "quebec", "romeo", "sierra", "tango",
+    "a", "b", "ok", "oui", "non", "42", "1", "0", "N/A", "x" * 40,
+)
+
+# Textes construits d'après le schéma (voir SubmissionGenerator._text_candidates) : nombre
+# de tirages d'un pattern, écart de longueur par défaut au-delà de minLength
+_PATTERN_SAMPLES = 64
+_TEXT_SPAN = 10
+
+# Caractères tirés pour ".", les classes niées et les catégories d'un pattern
+_PRINTABLE = string.ascii_letters + string.digits + " -_.@"
+_CATEGORIES = {
+    _sre.CATEGORY_DIGIT: string.digits,
+    _sre.CATEGORY_NOT_DIGIT: string.ascii_letters,
+    _sre.CATEGORY_WORD: string.ascii_letters + string.digits + "_",
+    _sre.CATEGORY_NOT_WORD: " -.@",
+    _sre.CATEGORY_SPACE: " ",
+    _sre.CATEGORY_NOT_SPACE: string.ascii_letters + string.digits,
+}
+
+# Marque d'une réponse à omettre (schéma n'acceptant pas null, ex: enum d'un champ facultatif)
+_MISSING = object()
+
+# Taille du réservoir de sous-ensembles pour les select_multiple à plus de 8 choix
+_SUBSET_POOL = 256
+
+_DATE_ORIGIN = np.datetime64("2020-01-01")
+_DATE_SPAN_DAYS = 5 * 365
+
+
+def _bounds(schema, default_low, default_high):
+    low = schema.get("minimum", schema.get("exclusiveMinimum"))
+    high = schema.get("maximum", schema.get("exclusiveMaximum"))
+    if low is None and high is None:
+        low, high = default_low, default_high
+    elif low is None:
+        low = high - (default_high - default_low)
+    elif high is None:
+        high = low + (default_high - default_low)
+    return low, high
+
+
+class _Column:
+    """
+    Tirage vectorisé des valeurs d'un champ.
+    """
+
+    __slots__ = ("name", "field", "nullable", "missing", "draw")
+
+    def __init__(self, name, field, nullable, missing, draw):
+        self.name = name
+        self.field = field
+        self.nullable = nullable
+        # Valeur d'une réponse absente : None, ou _MISSING (clé omise) si le schéma refuse null
+        self.missing = missing
+        self.draw = draw
+
+
+class SubmissionGenerator:
+    """
+    Générateur de soumissions synthétiques pour un formulaire.
+
+    :param xlsform_dict: Dictionnaire XLSForm (sortie de ``xlsform_to_dict``)
+    :type xlsform_dict: dict
+    :param seed: Graine du générateur aléatoire (``None`` : non reproductible)
+    :type seed: int | None
+    :param null_rate: Proportion de valeurs nulles des champs facultatifs
+    :type null_rate: float
+    :param repeat_range: Nombre minimal et maximal d'occurrences de chaque répétition
+    :type repeat_range: tuple[int, int]
+    :param base_dir: Répertoire des fichiers de choix externes
+    :type base_dir: str | None
+    :raises ValueError: Si un champ obligatoire ne peut recevoir aucune valeur valide
+        (motif ``regex()`` sans texte candidat correspondant)
+    """
+
+    def __init__(self, xlsform_dict, seed=None, null_rate=0.1, repeat_range=(0, 3), base_dir=None):
+        self.form = build_ir(xlsform_dict, base_dir=base_dir)
+        self.null_rate = null_rate
+        self.repeat_range = repeat_range
+        self.rng = np.random.default_rng(seed)
+        self._columns = {}
+        self._conditions = {}
+        for node in self.form.fields():
+            if node.kind != "note":
+                self._columns[id(node)] = self._column(node)
+        for node, _ in self.form.iter_nodes():
+            if isinstance(node, Section):
+                self._prepare_conditions(node)
+        self._prepare_conditions(self.form.root)
+
+    # Préparation (une fois par formulaire)
+
+    def _prepare_conditions(self, section):
+        if not section._conditions:
+            return
+        from .mapping import _thaw
+
+        columns = {child.name: self._columns.get(id(child)) for child in section.children if isinstance(child, Field)}
+        rules = []
+        for rule in _thaw(section._conditions):
+            # Une règle de section_rules par champ : "else" ne porte que ce champ
+            name = next(iter(rule["else"]["properties"]))
+            column = columns.get(name)
+            if column is not None:
+                rules.append((name, rule["if"], column.missing))
+        self._conditions[id(section)] = rules
+
+    def _column(self, field):
+        schema = self.form.field_schema(field)
+        types = schema.get("type")
+        accepts_null = isinstance(types, list) and "null" in types
+        missing = None if accepts_null and _accepts_null(schema) else _MISSING
+        # Un champ obligatoire sous condition accepte null, mais seulement lorsqu'il n'est pas affiché
+        nullable = accepts_null and not is_required(field.item)
+        kind = field.kind
+        if kind in ("select_one", "select_multiple", "rank") and field.choices is not None:
+            values = np.array(field.choices.values, dtype=object)
+            if kind == "select_one":
+                draw = self._choice_draw(values)
+            else:
+                draw = self._subset_draw(values, schema, unique=kind == "select_multiple")
+        elif kind == "integer":
+            draw = self._integer_draw(schema)
+        elif kind == "number":
+            draw = self._number_draw(schema)
+        elif kind == "boolean":
+            draw = lambda n: (self.rng.random(n) < 0.5).tolist()
+        elif kind == "date":
+            draw = self._date_draw
+        elif kind == "date-time":
+            draw = self._datetime_draw
+        elif kind == "time":
+            draw = self._time_draw
+        elif kind == "geopoint":
+            draw = self._geopoint_draw
+        elif kind in ("geotrace", "geoshape"):
+            draw = self._geotrace_draw if kind == "geotrace" else self._geoshape_draw
+        elif kind in ("object", "array"):
+            factory = dict if kind == "object" else list
+            draw = lambda n: [missing] * n if nullable else [factory() for _ in range(n)]
+        else:
+            draw = self._text_draw(field, schema, nullable, missing)
+        return _Column(field.name, field, nullable, missing, draw)
+
+    def _choice_draw(self, values):
+        return lambda n: values[self.rng.integers(0, len(values), n)].tolist()
+
+    def _subset_draw(self, values, schema, unique):
+        count = len(values)
+        low = schema.get("minItems", 1 if count else 0)
+        high = min(schema.get("maxItems", 3), count) if unique else schema.get("maxItems", 3)
+        high = max(high, low)
+        if not count:
+            pool = [[]]
+        elif unique and count <= 8:
+            # Tous les sous-ensembles admissibles sont énumérés une fois
+            pool = [[values[i] for i in range(count) if mask >> i & 1] for mask in range(1 << count)]
+            pool = [subset for subset in pool if low <= len(subset) <= high]
+        else:
+            sizes = self.rng.integers(low, high + 1, _SUBSET_POOL)
+            pool = [list(self.rng.choice(values, size, replace=not unique)) for size in sizes]
+        pool = np.array(pool + [None], dtype=object)[:-1]
+        return lambda n: [list(subset) for subset in pool[self.rng.integers(0, len(pool), n)]]
+
+    def _integer_draw(self, schema):
+        low, high = _bounds(schema, 0, 100)
+        low = floor(low) + 1 if "exclusiveMinimum" in schema and "minimum" not in schema and float(low).is_integer() else ceil(low)
+        high = ceil(high) - 1 if "exclusiveMaximum" in schema and "maximum" not in schema and float(high).is_integer() else floor(high)
+        return lambda n: self.rng.integers(low, high + 1, n).tolist()
+
+    def _number_draw(self, schema):
+        low, high = _bounds(schema, 0, 100)
+        # Marge pour les bornes exclusives, puis arrondi à deux décimales dans l'intervalle
+        step = 0.01
+        low = low + step if "exclusiveMinimum" in schema and "minimum" not in schema else low
+        high = high - step if "exclusiveMaximum" in schema and "maximum" not in schema else high
+        low_rounded, high_rounded = ceil(low / step) * step, floor(high / step) * step
+        return lambda n: np.clip(np.round(self.rng.uniform(low_rounded, high_rounded, n), 2), low, high).tolist()
+
+    def _text_draw(self, field, schema, nullable, missing):
+        from jsonschema import Draft7Validator
+
+        # La contrainte entière, y compris ce que le schéma n'exprime pas (champ facultatif,
+        # termes non traduits), tant qu'elle ne porte que sur le champ lui-même
+        constraint = field.item.get("bind", {}).get("constraint")
+        if constraint:
+            schema = {**schema, **constraint_keywords(constraint, schema, required=True)}
+        predicate = _self_constraint(constraint)
+        checker = Draft7Validator(schema)
+
+        def valid(text):
+            return checker.is_valid(text) and (predicate is None or predicate.test(text))
+
+        candidates = [word for word in _WORDS if valid(word)]
+        if not candidates:
+            try:
+                candidates = [text for text in self._text_candidates(schema) if valid(text)]
+            except ValueError as e:
+                raise ValueError(f"Champ '{'/'.join(field.path)}' : {e}") from None
+        pool = np.array(list(dict.fromkeys(candidates)) + [None], dtype=object)[:-1]
+        if not len(pool):
+            if not nullable:
+                raise ValueError(f"Aucune valeur générable pour le champ obligatoire '{'/'.join(field.path)}'")
+            return lambda n: [missing] * n
+        return lambda n: pool[self.rng.integers(0, len(pool), n)].tolist()
+
+    def _text_candidates(self, schema):
+        """
+        Textes construits d'après le schéma lorsqu'aucun mot de _WORDS ne convient :
+        tirages du ``pattern``, ou mots répétés jusqu'aux longueurs admises.
+        """
+        low = schema.get("minLength", 0)
+        high = schema.get("maxLength", low + _TEXT_SPAN)
+        if "pattern" in schema:
+            return [_pattern_sample(schema["pattern"], self.rng, low) for _ in range(_PATTERN_SAMPLES)]
+        lengths = sorted({low, high, (low + high) // 2})
+        return [(word * (length // len(word) + 1))[:length] for word in _WORDS[:20] for length in lengths]
+
+    # Tirages par type
+
+    def _date_draw(self, n):
+        days = self.rng.integers(0, _DATE_SPAN_DAYS, n)
+        return (_DATE_ORIGIN + days).astype(str).tolist()
+
+    def _datetime_draw(self, n):
+        seconds = self.rng.integers(0, _DATE_SPAN_DAYS * 86400, n)
+        stamps = (_DATE_ORIGIN.astype("datetime64[s]") + seconds).astype(str).tolist()
+        return [stamp + "Z" for stamp in stamps]
+
+    def _time_draw(self, n):
+        seconds = self.rng.integers(0, 86400, n)
+        stamps = (np.datetime64("1970-01-01T00:00:00") + seconds).astype(str).tolist()
+        return [stamp[11:] for stamp in stamps]
+
+    def _coordinates(self, n):
+        latitudes = np.round(self.rng.uniform(-90, 90, n), 6)
+        longitudes = np.round(self.rng.uniform(-180, 180, n), 6)
+        return latitudes, longitudes
+
+    def _geopoint_draw(self, n):
+        latitudes, longitudes = self._coordinates(n)
+        altitudes = np.round(self.rng.uniform(0, 3000, n), 1)
+        accuracies = np.round(self.rng.uniform(1, 50, n), 1)
+        return [
+            {"latitude": lat, "longitude": lon, "altitude": alt, "accuracy": acc}
+            for lat, lon, alt, acc in zip(latitudes.tolist(), longitudes.tolist(), altitudes.tolist(), accuracies.tolist())
+        ]
+
+    def _points(self, counts):
+        # Points [longitude, latitude] (ordre GeoJSON) de toutes les lignes, puis découpés par ligne
+        latitudes, longitudes = self._coordinates(int(counts.sum()))
+        points = np.stack((longitudes, latitudes), axis=1).tolist()
+        offsets = np.cumsum(counts).tolist()
+        return [points[start:end] for start, end in zip([0] + offsets[:-1], offsets)]
+
+    def _geotrace_draw(self, n):
+        return [{"type": "LineString", "coordinates": line} for line in self._points(self.rng.integers(2, 6, n))]
+
+    def _geoshape_draw(self, n):
+        rings = self._points(self.rng.integers(3, 6, n))
+        return [{"type": "Polygon", "coordinates": [ring + [list(ring[0])]]} for ring in rings]
+
+    # Assemblage
+
+    def _values(self, column, n):
+        values = column.draw(n)
+        if column.nullable and self.null_rate > 0:
+            for i in np.flatnonzero(self.rng.random(n) < self.null_rate).tolist():
+                values[i] = column.missing
+        return values
+
+    def _sections(self):
+        # Sections de la racine vers les feuilles (un parent avant ses enfants)
+        sections = [self.form.root]
+        for node, _ in self.form.iter_nodes():
+            if isinstance(node, Section):
+                sections.append(node)
+        return sections
+
+    def batch(self, n):
+        """
+        Génère ``n`` soumissions.
+
+        :rtype: list[dict]
+        """
+        sections = self._sections()
+        # Nombre d'objets de chaque section, du haut vers le bas : une répétition tire le
+        # nombre d'occurrences de chacun de ses parents
+        sizes = {id(self.form.root): n}
+        repeat_counts = {}
+        for node, parent in self.form.iter_nodes():
+            if not isinstance(node, Section):
+                continue
+            parent_size = sizes[id(parent)]
+            if node.repeat:
+                counts = self.rng.integers(self.repeat_range[0], self.repeat_range[1] + 1, parent_size)
+                repeat_counts[id(node)] = counts
+                sizes[id(node)] = int(counts.sum())
+            else:
+                sizes[id(node)] = parent_size
+
+        # Construction des objets, des feuilles vers la racine
+        rows = {}
+        for section in reversed(sections):
+            size = sizes[id(section)]
+            columns = {}
+            # Colonnes pouvant contenir _MISSING (clés à omettre)
+            sparse = set()
+            for child in section.children:
+                if isinstance(child, Field):
+                    column = self._columns.get(id(child))
+                    if column is None:
+                        continue
+                    values = self._values(column, size)
+                    if column.missing is _MISSING:
+                        sparse.add(child.name)
+                elif child.repeat:
+                    objects = rows.pop(id(child))
+                    offsets = np.concatenate(([0], np.cumsum(repeat_counts[id(child)]))).tolist()
+                    values = [objects[offsets[i]:offsets[i + 1]] for i in range(size)]
+                else:
+                    values = rows.pop(id(child))
+                columns[child.name] = values
+            self._apply_conditions(section, columns, size)
+
+            names = list(columns)
+            objects = [dict(zip(names, values)) for values in zip(*columns.values())] if columns else [{} for _ in range(size)]
+            for name in sparse:
+                for i in [i for i, value in enumerate(columns[name]) if value is _MISSING]:
+                    del objects[i][name]
+            rows[id(section)] = objects
+        return rows[id(self.form.root)]
+
+    def _apply_conditions(self, section, columns, size):
+        """
+        Vide (``null``, ou clé omise si le schéma refuse ``null``) les réponses dont la condition
+        d'affichage est fausse.
+        """
+        rules = [rule for rule in self._conditions.get(id(section), ()) if rule[0] in columns]
+        # Une réponse vidée peut rendre fausse une condition déjà évaluée : on itère jusqu'à stabilité
+        arrays = {}
+        changed = True
+        while changed:
+            changed = False
+            for name, condition, missing in rules:
+                values = columns[name]
+                hidden = np.flatnonzero(~_evaluate(condition, columns, size, arrays) & _answered(_array(name, columns, arrays))).tolist()
+                if hidden:
+                    for i in hidden:
+                        values[i] = missing
+                    arrays.pop(name, None)
+                    changed = True
+
+    def iter_records(self, count, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Produit ``count`` soumissions, générées par lots de ``batch_size``.
+        """
+        remaining = count
+        while remaining > 0:
+            size = min(batch_size, remaining)
+            yield from self.batch(size)
+            remaining -= size
+
+    def write_ndjson(self, fp, count, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Écrit ``count`` soumissions en NDJSON (une par ligne) dans un fichier binaire ou texte.
+
+        :return: Nombre de soumissions écrites
+        :rtype: int
+        """
+        orjson = _orjson()
+        binary = not isinstance(fp, io.TextIOBase)
+        remaining = count
+        with profiling.stage("generate_ndjson", records=count):
+            while remaining > 0:
+                size = min(batch_size, remaining)
+                records = self.batch(size)
+                if orjson is not None:
+                    data = b"\n".join(map(orjson.dumps, records)) + b"\n"
+                else:
+                    data = ("\n".join(map(json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode, records)) + "\n").encode("utf-8")
+                fp.write(data if binary else data.decode("utf-8"))
+                remaining -= size
+        return count
+
+    def csv_columns(self, separator="/"):
+        """
+        Renvoie les colonnes d'un export à plat (voir :mod:`xlsF2schema.tabular`) : champs
+        hors répétitions, groupes aplatis avec ``separator``.
+        """
+        return [column for column, _ in self.form.tables(separator)[0].columns]
+
+    def write_csv(self, fp, count, separator="/", batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Écrit ``count`` soumissions en export à plat CSV (fichier texte ouvert avec ``newline=""``) :
+        choix multiples séparés par des espaces, ``geopoint`` en ``"latitude longitude altitude précision"``,
+        traces en points séparés par des ``;``. Les répétitions ne sont pas exportées.
+
+        :return: Nombre de soumissions écrites
+        :rtype: int
+        """
+        columns = self.form.tables(separator)[0].columns
+        writer = csv.writer(fp)
+        writer.writerow([name for name, _ in columns])
+        remaining = count
+        with profiling.stage("generate_csv", records=count):
+            while remaining > 0:
+                size = min(batch_size, remaining)
+                records = self.batch(size)
+                cells = [[_flat(_lookup(record, field.path), field.kind) for record in records] for _, field in columns]
+                writer.writerows(zip(*cells))
+                remaining -= size
+        return count
+
+
+def _evaluate(condition, columns, size, arrays):
+    """
+    Évalue, pour chaque objet d'une section, une condition produite par
+    :func:`xlsF2schema.logic.relevance_condition` ; renvoie un masque booléen.
+
+    :param arrays: Cache des colonnes converties en tableaux numpy (``object``)
+    """
+    if "allOf" in condition or "anyOf" in condition:
+        parts = [_evaluate(part, columns, size, arrays) for part in condition.get("allOf") or condition["anyOf"]]
+        return np.logical_and.reduce(parts) if "allOf" in condition else np.logical_or.reduce(parts)
+    if "not" in condition:
+        return ~_evaluate(condition["not"], columns, size, arrays)
+    result = np.ones(size, dtype=bool)
+    for name in condition.get("required", ()):
+        if name not in columns:
+            return np.zeros(size, dtype=bool)
+        result &= _array(name, columns, arrays) != _MISSING
+    for name, subschema in condition.get("properties", {}).items():
+        if name in columns:
+            values = _array(name, columns, arrays)
+            result &= (values == _MISSING) | _value_test(subschema, values)
+    return result
+
+
+def _answered(values):
+    return (values != _MISSING) & (values != None)  # noqa: E711 (comparaison élément par élément)
+
+
+def _array(name, columns, arrays):
+    array = arrays.get(name)
+    if array is None:
+        array = arrays[name] = np.fromiter(columns[name], dtype=object, count=len(columns[name]))
+    return array
+
+
+def _value_test(subschema, values):
+    # Sous-schémas de relevance_condition : const, not const, contains const, bornes numériques.
+    # Les colonnes comparées sont des textes ou des nombres générés (jamais de booléens).
+    if "const" in subschema:
+        return (values == subschema["const"]).astype(bool)
+    if "not" in subschema:
+        return ~_value_test(subschema["not"], values)
+    if "contains" in subschema:
+        expected = subschema["contains"]["const"]
+        return np.array([isinstance(value, list) and expected in value for value in values], dtype=bool)
+    numbers = np.array([value if isinstance(value, (int, float)) else np.nan for value in values], dtype=float)
+    for keyword, compare in (("minimum", np.greater_equal), ("maximum", np.less_equal), ("exclusiveMinimum", np.greater), ("exclusiveMaximum", np.less)):
+        if keyword in subschema:
+            return compare(numbers, subschema[keyword])
+    raise ValueError(f"Condition non gérée par le générateur : {subschema}")
+
+
+def _pattern_sample(pattern, rng, min_length=0):
+    """
+    Tire un texte reconnu par ``pattern`` : littéraux, ``.``, classes de caractères,
+    catégories (``\\d``, ``\\w``, ``\\s``), groupes, alternatives, ancres et quantificateurs.
+
+    :param min_length: Longueur visée par les répétitions non bornées (``+``, ``*``, ``{n,}``)
+    :raises ValueError: Si le pattern utilise une autre construction (références arrière,
+        assertions avant/arrière...)
+    """
+    out = []
+    stack = [iter(_sre.parse(pattern))]
+    while stack:
+        node = next(stack[-1], None)
+        if node is None:
+            stack.pop()
+            continue
+        op, av = node
+        if op is _sre.LITERAL:
+            out.append(chr(av))
+        elif op is _sre.NOT_LITERAL:
+            out.append(_choice(rng, _PRINTABLE.replace(chr(av), "")))
+        elif op is _sre.ANY:
+            out.append(_choice(rng, string.ascii_letters))
+        elif op is _sre.IN:
+            out.append(_choice(rng, _charset(av)))
+        elif op is _sre.AT:
+            continue
+        elif op is _sre.SUBPATTERN:
+            stack.append(iter(av[-1]))
+        elif op is _sre.BRANCH:
+            stack.append(iter(av[1][int(rng.integers(0, len(av[1])))]))
+        elif op in (_sre.MAX_REPEAT, _sre.MIN_REPEAT):
+            low, high, sub = av
+            if high is _sre.MAXREPEAT:
+                high = max(low + 3, min_length)
+            count = int(rng.integers(low, high + 1))
+            stack.append(iter(list(sub) * count))
+        else:
+            raise ValueError(f"Pattern non géré par le générateur : {pattern!r}")
+    return "".join(out)
+
+
+def _charset(items):
+    negate = bool(items) and items[0][0] is _sre.NEGATE
+    chars = set()
+    for op, av in items[negate:]:
+        if op is _sre.LITERAL:
+            chars.add(chr(av))
+        elif op is _sre.RANGE:
+            chars.update(chr(code) for code in range(av[0], min(av[1], av[0] + 255) + 1))
+        elif op is _sre.CATEGORY and av in _CATEGORIES:
+            chars.update(_CATEGORIES[av])
+        else:
+            raise ValueError(f"Classe de caractères non gérée par le générateur : {op}")
+    if negate:
+        chars = set(_PRINTABLE) - chars
+    return "".join(sorted(chars))
+
+
+def _choice(rng, chars):
+    if not chars:
+        raise ValueError("Classe de caractères vide")
+    return chars[int(rng.integers(0, len(chars)))]
+
+
+def _self_constraint(constraint):
+    """
+    Compile une contrainte qui ne référence aucun autre champ ; ``None`` sinon.
+    """
+    if not constraint or not constraint.strip():
+        return None
+    try:
+        expression = compile_expression(constraint)
+    except XPathError:
+        return None
+    return None if expression.refs else expression
+
+
+def _accepts_null(schema):
+    from jsonschema import Draft7Validator
+
+    return Draft7Validator(schema).is_valid(None)
+
+
+def _lookup(record, path):
+    value = record
+    for name in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(name)
+    return value
+
+
+def _flat(value, kind):
+    # Valeur d'une cellule d'export à plat
+    if value is None:
+        return ""
+    if kind == "geopoint":
+        return " ".join(str(value[k]) for k in ("latitude", "longitude", "altitude", "accuracy") if k in value)
+    if kind == "geotrace":
+        return ";".join(f"{lat} {lon} 0 0" for lon, lat in value["coordinates"])
+    if kind == "geoshape":
+        return ";".join(f"{lat} {lon} 0 0" for lon, lat in value["coordinates"][0])
+    if isinstance(value, list):
+        return " ".join(map(str, value))
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
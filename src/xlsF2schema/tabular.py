@@ -0,0 +1,332 @@
+"""
+Validation vectorisée d'exports tabulaires (CSV / XLSX) avec pandas.
+
+Les exports « à plat » ont une colonne par champ, nommée d'après le chemin de ses
+groupes (``gr_enqueter/enqueteur``) ; les réponses ``select_multiple`` y sont séparées
+par des espaces et les ``geopoint`` écrits ``"latitude longitude altitude précision"``.
+
+:class:`TabularValidator` parcourt le formulaire avec :func:`xlsF2schema.core.walk_items`,
+comme :func:`~xlsF2schema.core.generate_json_schema`, et déduit du schéma de chaque champ
+des tests portant sur la colonne entière (conversion de type, ``isin`` pour les listes
+de choix, bornes, formats de date, coordonnées) au lieu de valider ligne par ligne.
+Le résultat est un ``DataFrame`` d'une ligne par violation.
+
+Les champs des répétitions (exportés dans des tables séparées) et les conditions
+``relevant`` / ``constraint`` non traduites en JSON Schema ne sont pas vérifiés ici.
+
+Nécessite pandas (``pip install "xlsF2schema[tabular]"``).
+"""
+import os
+
+from .core import RECORD_POINTER, required_names, section_body, walk_items
+from .mapping import ChoiceResolver
+
+# Colonnes du DataFrame des violations
+VIOLATION_COLUMNS = ["index", "column", "validator", "value", "message"]
+
+TABULAR_EXTENSIONS = (".csv", ".tsv", ".xlsx", ".xls")
+
+_BOOLEAN_VALUES = ["true", "false", "1", "0", "yes", "no", "ok"]
+_TIME_PATTERN = r"\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?"
+_DATE_FORMATS = {"date": "%Y-%m-%d", "date-time": "ISO8601"}
+
+# Comparaisons des bornes JSON Schema : (test de violation, message)
+_BOUNDS = {
+    "minimum": (lambda values, bound: values < bound, "inférieur au minimum {}"),
+    "maximum": (lambda values, bound: values > bound, "supérieur au maximum {}"),
+    "exclusiveMinimum": (lambda values, bound: values <= bound, "inférieur ou égal à {}"),
+    "exclusiveMaximum": (lambda values, bound: values >= bound, "supérieur ou égal à {}"),
+}
+
+
+def _pandas():
+    try:
+        import pandas
+    except ImportError:
+        raise ImportError('La validation tabulaire nécessite pandas : pip install "xlsF2schema[tabular]"') from None
+    return pandas
+
+
+def read_table(path, sheet=0):
+    """
+    Lit un export CSV, TSV ou XLSX en ``DataFrame`` de textes (aucune conversion implicite
+    de pandas : les tests de type sont faits par :class:`TabularValidator`).
+
+    :param sheet: Feuille à lire pour un classeur (nom ou position)
+    """
+    pd = _pandas()
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xls"):
+        return pd.read_excel(path, sheet_name=sheet, dtype=str)
+    return pd.read_csv(path, sep="\t" if extension == ".tsv" else ",", dtype=str, keep_default_na=False, na_values=[""])
+
+
+class TabularField:
+    """
+    Colonne attendue d'un export à plat : chemin, schéma du champ et caractère obligatoire.
+    """
+
+    __slots__ = ("column", "name", "schema", "required")
+
+    def __init__(self, column, name, schema, required):
+        self.column = column
+        self.name = name
+        self.schema = schema
+        self.required = required
+
+    def __repr__(self):
+        return f"TabularField({self.column!r})"
+
+
+def _is_section(schema):
+    # Coquille de section produite par walk_items : properties vides, jamais rattachées
+    return schema.get("type") in ("object", "array") and section_body(schema).get("properties") == {}
+
+
+def tabular_fields(xlsform_dict, separator="/", base_dir=None):
+    """
+    Renvoie les colonnes d'un export à plat, dans l'ordre du formulaire.
+
+    :param separator: Séparateur des groupes dans les noms de colonnes
+    :type separator: str
+    :param base_dir: Répertoire des fichiers de choix externes (voir
+        :func:`xlsF2schema.core.generate_json_schema`)
+    :rtype: list[TabularField]
+    """
+    survey_tab = xlsform_dict.get("children", [])
+    choices_tab = ChoiceResolver(xlsform_dict.get("choices", {}), base_dir=base_dir)
+    top_names = required_names(survey_tab)
+    top_required = set(top_names)
+    # Objet portant les propriétés d'une section -> (préfixe de colonne, dans une répétition)
+    sections = {None: ("", False)}
+    fields = []
+    for _, name, schema, parent in walk_items(survey_tab, choices_tab, RECORD_POINTER, pointers=False, required=top_names):
+        prefix, in_repeat = sections[None if parent is None else id(parent)]
+        column = prefix + name
+        if _is_section(schema):
+            sections[id(section_body(schema))] = (column + separator, in_repeat or schema["type"] == "array")
+            continue
+        if in_repeat:
+            continue
+        required = name in top_required if parent is None else name in parent.get("required", ())
+        fields.append(TabularField(column, name, schema, required))
+    return fields
+
+
+def _types(schema):
+    value = schema.get("type", [])
+    types = [value] if isinstance(value, str) else list(value)
+    return [t for t in types if t != "null"]
+
+
+def _numbers(pd, text):
+    """
+    Convertit une colonne de textes en flottants (``NaN`` pour les valeurs absentes ou invalides).
+    """
+    values = text.to_numpy(dtype=object, na_value="nan")
+    try:
+        # Cas courant (colonne entièrement numérique) : conversion C directe, bien plus rapide
+        return pd.Series(values.astype(float), index=text.index)
+    except (TypeError, ValueError):
+        return pd.to_numeric(text, errors="coerce").astype(float)
+
+
+def _numeric_checks(pd, text, present, schema, integer):
+    numbers = _numbers(pd, text)
+    invalid = present & numbers.isna()
+    if integer:
+        invalid |= present & numbers.notna() & (numbers % 1 != 0)
+    yield "type", invalid, "nombre entier attendu" if integer else "nombre attendu"
+    for keyword, (test, message) in _BOUNDS.items():
+        if keyword in schema:
+            yield keyword, numbers.notna() & test(numbers, schema[keyword]), message.format(schema[keyword])
+
+
+def _string_checks(pd, text, present, schema):
+    fmt = schema.get("format")
+    if fmt in _DATE_FORMATS:
+        parsed = pd.to_datetime(text, format=_DATE_FORMATS[fmt], errors="coerce", utc=fmt == "date-time")
+        yield "format", present & parsed.isna(), f"format {fmt} attendu"
+    elif fmt == "time":
+        yield "format", present & ~text.str.fullmatch(_TIME_PATTERN).fillna(False).astype(bool), "format time attendu"
+    if "enum" in schema:
+        yield "enum", present & ~text.isin(schema["enum"]), "valeur absente de la liste de choix"
+    if "pattern" in schema:
+        matches = text.str.contains(schema["pattern"], regex=True).fillna(False).astype(bool)
+        yield "pattern", present & ~matches, f"ne correspond pas au motif {schema['pattern']}"
+    if "minLength" in schema or "maxLength" in schema:
+        lengths = text.str.len()
+        if "minLength" in schema:
+            yield "minLength", present & (lengths < schema["minLength"]), f"moins de {schema['minLength']} caractère(s)"
+        if "maxLength" in schema:
+            yield "maxLength", present & (lengths > schema["maxLength"]), f"plus de {schema['maxLength']} caractère(s)"
+
+
+def _array_checks(pd, text, present, schema):
+    tokens = text[present].str.split().explode()
+    items = schema.get("items", {})
+    if "enum" in items:
+        unknown = tokens.notna() & ~tokens.isin(items["enum"])
+        rows = unknown.groupby(level=0).any()
+        yield "enum", rows.reindex(text.index, fill_value=False), "choix absent de la liste"
+    if schema.get("uniqueItems"):
+        pairs = tokens.dropna().reset_index()
+        duplicated = pairs.duplicated().groupby(pairs.iloc[:, 0]).any()
+        yield "uniqueItems", duplicated.reindex(text.index, fill_value=False), "choix répété"
+    counts = text.str.split().str.len()
+    if "minItems" in schema:
+        yield "minItems", present & (counts < schema["minItems"]), f"moins de {schema['minItems']} choix"
+    if "maxItems" in schema:
+        yield "maxItems", present & (counts > schema["maxItems"]), f"plus de {schema['maxItems']} choix"
+
+
+def _coordinate_checks(pd, parts, present, properties, required):
+    # Une colonne par composante (latitude, longitude, altitude, précision), dans l'ordre du schéma
+    invalid = present & False
+    for position, (name, subschema) in enumerate(properties.items()):
+        component = parts[position] if position in parts.columns else pd.Series(None, index=parts.index, dtype=object)
+        numbers = _numbers(pd, component)
+        given = component.notna()
+        invalid |= present & given & numbers.isna()
+        if name in required:
+            invalid |= present & ~given
+        for keyword, (test, _) in _BOUNDS.items():
+            if keyword in subschema:
+                invalid |= present & numbers.notna() & test(numbers, subschema[keyword])
+    return invalid
+
+
+def _split_components(text):
+    # Un seul espace sépare les composantes dans les exports : découpage sans expression
+    # régulière, puis repli sur les blancs quelconques pour les lignes irrégulières
+    parts = text.str.split(" ", regex=False, expand=True)
+    irregular = parts.isin([""]).any(axis=1)
+    if irregular.any():
+        parts = parts.reindex(columns=range(max(len(parts.columns), 1)))
+        respaced = text[irregular].str.split(expand=True)
+        parts = parts.astype(object)
+        parts.loc[irregular, :] = None
+        parts.loc[irregular, respaced.columns] = respaced
+    return parts
+
+
+def _object_checks(pd, text, present, schema):
+    properties = schema.get("properties", {})
+    if "latitude" in properties:
+        # geopoint : "latitude longitude [altitude [précision]]"
+        parts = _split_components(text)
+        invalid = _coordinate_checks(pd, parts, present, properties, schema.get("required", []))
+        yield "geopoint", invalid, "coordonnées invalides (latitude -90..90, longitude -180..180)"
+    elif "coordinates" in properties:
+        # geotrace / geoshape : points "latitude longitude ..." séparés par des ';'
+        points = text[present].str.split(";").explode().str.strip()
+        points = points[points != ""]
+        parts = _split_components(points)
+        point_properties = {"latitude": {"minimum": -90, "maximum": 90}, "longitude": {"minimum": -180, "maximum": 180}}
+        invalid = _coordinate_checks(pd, parts, parts.notna().any(axis=1), point_properties, ["latitude", "longitude"])
+        rows = invalid.groupby(level=0).any().reindex(text.index, fill_value=False)
+        yield "geopoint", rows, "point invalide (latitude -90..90, longitude -180..180)"
+
+
+def _field_checks(pd, text, present, field):
+    """
+    Produit les tests d'une colonne : ``(mot-clé, masque des lignes en violation, message)``.
+    """
+    if field.required:
+        yield "required", ~present, "valeur obligatoire manquante"
+    schema = field.schema
+    types = _types(schema)
+    if "integer" in types or "number" in types:
+        yield from _numeric_checks(pd, text, present, schema, integer="number" not in types)
+    elif "boolean" in types:
+        yield "type", present & ~text.str.lower().isin(_BOOLEAN_VALUES), "booléen attendu"
+    elif "array" in types:
+        yield from _array_checks(pd, text, present, schema)
+    elif "object" in types:
+        yield from _object_checks(pd, text, present, schema)
+    elif "string" in types:
+        yield from _string_checks(pd, text, present, schema)
+
+
+class TabularValidator:
+    """
+    Validateur vectorisé d'exports à plat, construit une fois par formulaire.
+
+    :param xlsform_dict: Dictionnaire XLSForm (sortie de ``xlsform_to_dict``)
+    :type xlsform_dict: dict
+    :param separator: Séparateur des groupes dans les noms de colonnes (``/`` pour
+        Kobo, ``-`` pour ODK Central)
+    :type separator: str
+    :param base_dir: Répertoire des fichiers de choix externes
+    :type base_dir: str | None
+    :ivar fields: Colonnes attendues (:class:`TabularField`)
+    """
+
+    def __init__(self, xlsform_dict, separator="/", base_dir=None):
+        self.separator = separator
+        self.fields = tabular_fields(xlsform_dict, separator, base_dir)
+
+    @property
+    def columns(self):
+        return [field.column for field in self.fields]
+
+    def validate(self, frame):
+        """
+        Valide un ``DataFrame`` (une ligne par soumission, une colonne par champ).
+
+        Les colonnes inconnues du formulaire (métadonnées d'export) sont ignorées ; une
+        colonne absente n'est signalée que si son champ est obligatoire.
+
+        :return: Une ligne par violation : ``index`` (étiquette de la ligne), ``column``,
+            ``validator`` (mot-clé JSON Schema correspondant), ``value`` et ``message``,
+            triées par ligne puis dans l'ordre du formulaire
+        :rtype: pandas.DataFrame
+        """
+        pd = _pandas()
+        import numpy as np
+
+        pieces = []
+        for order, field in enumerate(self.fields):
+            # Les tests portent sur les valeurs distinctes de la colonne (souvent bien moins
+            # nombreuses que les lignes : choix, dates, codes), puis sont ramenés aux lignes
+            # par les codes de factorize ; la dernière valeur représente les cellules vides.
+            if field.column in frame.columns:
+                codes, uniques = pd.factorize(frame[field.column].to_numpy(dtype=object))
+            else:
+                codes, uniques = np.full(len(frame), -1, dtype=np.intp), np.array([], dtype=object)
+            codes = np.where(codes < 0, len(uniques), codes)
+            text = pd.Series(np.append(uniques, None), dtype="string").str.strip()
+            text = text.mask(text == "")
+            present = text.notna()
+            for keyword, mask, message in _field_checks(pd, text, present, field):
+                rows = mask.fillna(False).astype(bool).to_numpy()[codes].nonzero()[0]
+                if not len(rows):
+                    continue
+                values = text.iloc[codes[rows]]
+                pieces.append(pd.DataFrame({
+                    "_position": rows,
+                    "column": field.column,
+                    "validator": keyword,
+                    "value": values.astype(object).where(values.notna(), None).to_numpy(),
+                    "message": message,
+                    "_order": order,
+                }))
+        if not pieces:
+            return pd.DataFrame({name: pd.Series(dtype=object) for name in VIOLATION_COLUMNS})
+        violations = pd.concat(pieces, ignore_index=True).sort_values(["_position", "_order"], kind="stable")
+        violations.insert(0, "index", frame.index[violations["_position"].to_numpy()])
+        return violations[VIOLATION_COLUMNS].reset_index(drop=True)
+
+    def is_valid(self, frame):
+        return self.validate(frame).empty
+
+
+def validate_table(data, xlsform_dict, separator="/", base_dir=None):
+    """
+    Valide un export tabulaire contre un formulaire.
+
+    :param data: ``DataFrame`` ou chemin d'un fichier CSV / TSV / XLSX (voir :func:`read_table`)
+    :return: DataFrame des violations (voir :meth:`TabularValidator.validate`)
+    """
+    frame = read_table(data) if isinstance(data, (str, os.PathLike)) else data
+    return TabularValidator(xlsform_dict, separator, base_dir).validate(frame)
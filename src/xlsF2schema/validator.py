@@ -0,0 +1,386 @@
+import re
+from collections import deque
+from numbers import Number
+
+from .core import generate_json_schema
+
+# Mots-clés sans effet sur la validation (annotations), ignorés comme le fait jsonschema
+# ("format" n'est pas vérifié par défaut par jsonschema.validate)
+_ANNOTATIONS = {
+    "$schema", "$id", "$comment", "title", "description", "default", "examples",
+    "readOnly", "writeOnly", "format", "definitions",
+}
+
+# Mots-clés compilés en tests Python directs
+_COMPILED = {
+    "type", "enum", "const", "properties", "required", "items", "uniqueItems",
+    "minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum",
+    "minItems", "maxItems", "minLength", "maxLength", "pattern", "allOf", "$ref",
+}
+
+# Au-delà de cette profondeur d'imbrication dans une même fonction générée, le
+# sous-schéma est compilé dans sa propre fonction (limites de blocs imbriqués de CPython)
+_MAX_INLINE_DEPTH = 6
+
+_TYPE_TESTS = {
+    "string": "isinstance({v}, str)",
+    "object": "isinstance({v}, dict)",
+    "array": "isinstance({v}, list)",
+    "boolean": "isinstance({v}, bool)",
+    "null": "{v} is None",
+    "number": "({v}.__class__ is int or {v}.__class__ is float or ({v}.__class__ is not bool and isinstance({v}, _Number)))",
+    "integer": "(({v}.__class__ is int) or ({v}.__class__ is float and {v}.is_integer()) or (isinstance({v}, int) and not isinstance({v}, bool)))",
+}
+
+# Messages identiques à ceux de jsonschema (draft-07)
+_MESSAGES = {
+    "type": lambda x, value, extra: f"{x!r} is not of type {', '.join(repr(t) for t in (value if isinstance(value, list) else [value]))}",
+    "enum": lambda x, value, extra: f"{x!r} is not one of {value!r}",
+    "const": lambda x, value, extra: f"{value!r} was expected",
+    "required": lambda x, value, extra: f"{extra!r} is a required property",
+    "uniqueItems": lambda x, value, extra: f"{x!r} has non-unique elements",
+    "minimum": lambda x, value, extra: f"{x!r} is less than the minimum of {value!r}",
+    "maximum": lambda x, value, extra: f"{x!r} is greater than the maximum of {value!r}",
+    "exclusiveMinimum": lambda x, value, extra: f"{x!r} is less than or equal to the minimum of {value!r}",
+    "exclusiveMaximum": lambda x, value, extra: f"{x!r} is greater than or equal to the maximum of {value!r}",
+    "minItems": lambda x, value, extra: f"{x!r} {'should be non-empty' if value == 1 else 'is too short'}",
+    "maxItems": lambda x, value, extra: f"{x!r} {'is expected to be empty' if value == 0 else 'is too long'}",
+    "minLength": lambda x, value, extra: f"{x!r} {'should be non-empty' if value == 1 else 'is too short'}",
+    "maxLength": lambda x, value, extra: f"{x!r} {'is expected to be empty' if value == 0 else 'is too long'}",
+    "pattern": lambda x, value, extra: f"{x!r} does not match {value!r}",
+    "false": lambda x, value, extra: f"False schema does not allow {x!r}",
+}
+
+
+class _Site:
+    """
+    Point de contrôle du code généré : de quoi reconstruire l'erreur jsonschema correspondante.
+    """
+
+    __slots__ = ("keyword", "value", "schema", "schema_path", "extra")
+
+    def __init__(self, keyword, value, schema, schema_path, extra=None):
+        self.keyword = keyword
+        self.value = value
+        self.schema = schema
+        self.schema_path = schema_path
+        self.extra = extra
+
+
+def _resolve_ref(root, ref):
+    if not ref.startswith("#"):
+        raise ValueError(f"Référence non locale non supportée : {ref}")
+    target = root
+    for token in ref[1:].split("/")[1:]:
+        token = token.replace("~1", "/").replace("~0", "~")
+        target = target[int(token)] if isinstance(target, list) else target[token]
+    return target
+
+
+class _Compiler:
+    """
+    Traduit un JSON Schema (sous-ensemble produit par generate_json_schema) en code Python.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.sites = []
+        self.namespace = {"_Number": Number}
+        self.functions = []
+        self.ref_functions = {}
+        self._counter = 0
+
+    def _name(self, prefix):
+        self._counter += 1
+        return f"_{prefix}{self._counter}"
+
+    def _const(self, prefix, value):
+        name = self._name(prefix)
+        self.namespace[name] = value
+        return name
+
+    def _site(self, keyword, value, schema, schema_path, extra=None):
+        self.sites.append(_Site(keyword, value, schema, tuple(schema_path), extra))
+        return len(self.sites) - 1
+
+    def function(self, schema, schema_path, name=None):
+        """
+        Compile un sous-schéma en une fonction ``f(x, p, e)`` qui ajoute ses erreurs à ``e``.
+        """
+        name = name or self._name("check")
+        body = self.node(schema, "x", "p", schema_path, 1, 0)
+        self.functions.append("\n".join([f"def {name}(x, p, e):"] + (body or ["    pass"])))
+        return name
+
+    def node(self, schema, v, path, schema_path, indent, depth):
+        pad = "    " * indent
+        if schema is True or schema == {}:
+            return []
+        if schema is False:
+            site = self._site("false", False, schema, schema_path)
+            return [f"{pad}e.append(({site}, {path}, {v}))"]
+
+        if "$ref" in schema:
+            # draft-07 : les mots-clés voisins de $ref sont ignorés
+            ref = schema["$ref"]
+            if ref not in self.ref_functions:
+                # Nom réservé avant compilation pour supporter les références récursives
+                self.ref_functions[ref] = self._name("ref")
+                self.function(_resolve_ref(self.root, ref), list(schema_path) + ["$ref"], self.ref_functions[ref])
+            return [f"{pad}{self.ref_functions[ref]}({v}, {path}, e)"]
+
+        if any(k not in _COMPILED and k not in _ANNOTATIONS for k in schema) or isinstance(schema.get("items"), list):
+            return self._fallback(schema, v, path, schema_path, pad)
+
+        if depth >= _MAX_INLINE_DEPTH or (depth > 0 and "properties" in schema):
+            return [f"{pad}{self.function(schema, schema_path)}({v}, {path}, e)"]
+
+        lines = []
+        for keyword, value in schema.items():
+            sp = list(schema_path) + [keyword]
+            method = getattr(self, "_kw_" + keyword.replace("$", ""), None)
+            if method is not None:
+                lines.extend(method(schema, value, v, path, sp, pad, indent, depth))
+        return lines
+
+    def _fallback(self, schema, v, path, schema_path, pad):
+        name = self._const("fallback", (schema, tuple(schema_path)))
+        return [f"{pad}e.extend((None, {path}, _err) for _err in _descend({v}, {name}))"]
+
+    def _kw_type(self, schema, value, v, path, sp, pad, indent, depth):
+        types = value if isinstance(value, list) else [value]
+        tests = [_TYPE_TESTS[t].format(v=v) for t in types if t in _TYPE_TESTS]
+        site = self._site("type", value, schema, sp)
+        return [f"{pad}if not ({' or '.join(tests) or 'False'}):", f"{pad}    e.append(({site}, {path}, {v}))"]
+
+    def _kw_enum(self, schema, value, v, path, sp, pad, indent, depth):
+        site = self._site("enum", value, schema, sp)
+        if all(isinstance(c, str) for c in value):
+            members = self._const("enum", frozenset(value))
+            test = f"isinstance({v}, str) and {v} in {members}"
+        else:
+            members = self._const("enum", value)
+            test = f"_in_enum({v}, {members})"
+        return [f"{pad}if not ({test}):", f"{pad}    e.append(({site}, {path}, {v}))"]
+
+    def _kw_const(self, schema, value, v, path, sp, pad, indent, depth):
+        site = self._site("const", value, schema, sp)
+        expected = self._const("const", [value])
+        return [f"{pad}if not _in_enum({v}, {expected}):", f"{pad}    e.append(({site}, {path}, {v}))"]
+
+    def _kw_properties(self, schema, value, v, path, sp, pad, indent, depth):
+        lines = [f"{pad}if isinstance({v}, dict):"]
+        child = f"v{depth + 1}"
+        for name, subschema in value.items():
+            child_path = f"{path} + ({name!r},)"
+            body = self.node(subschema, child, child_path, sp + [name], indent + 2, depth + 1)
+            if body:
+                lines.append(f"{pad}    if {name!r} in {v}:")
+                lines.append(f"{pad}        {child} = {v}[{name!r}]")
+                lines.extend(body)
+        return lines if len(lines) > 1 else []
+
+    def _kw_required(self, schema, value, v, path, sp, pad, indent, depth):
+        if not value:
+            return []
+        lines = [f"{pad}if isinstance({v}, dict):"]
+        for name in value:
+            site = self._site("required", value, schema, sp, extra=name)
+            lines.append(f"{pad}    if {name!r} not in {v}:")
+            lines.append(f"{pad}        e.append(({site}, {path}, {v}))")
+        return lines
+
+    def _kw_items(self, schema, value, v, path, sp, pad, indent, depth):
+        index, child = f"i{depth + 1}", f"v{depth + 1}"
+        body = self.node(value, child, f"{path} + ({index},)", sp, indent + 2, depth + 1)
+        if not body:
+            return []
+        return [f"{pad}if isinstance({v}, list):", f"{pad}    for {index}, {child} in enumerate({v}):"] + body
+
+    def _kw_allOf(self, schema, value, v, path, sp, pad, indent, depth):
+        lines = []
+        for i, subschema in enumerate(value):
+            lines.extend(self.node(subschema, v, path, sp + [i], indent, depth))
+        return lines
+
+    def _kw_uniqueItems(self, schema, value, v, path, sp, pad, indent, depth):
+        if not value:
+            return []
+        site = self._site("uniqueItems", value, schema, sp)
+        return [f"{pad}if isinstance({v}, list) and not _unique({v}):", f"{pad}    e.append(({site}, {path}, {v}))"]
+
+    def _bound(self, keyword, operator, test_type, schema, value, v, path, sp, pad):
+        site = self._site(keyword, value, schema, sp)
+        return [f"{pad}if {_TYPE_TESTS[test_type].format(v=v)} and {v} {operator} {value!r}:", f"{pad}    e.append(({site}, {path}, {v}))"]
+
+    def _kw_minimum(self, schema, value, v, path, sp, pad, indent, depth):
+        return self._bound("minimum", "<", "number", schema, value, v, path, sp, pad)
+
+    def _kw_maximum(self, schema, value, v, path, sp, pad, indent, depth):
+        return self._bound("maximum", ">", "number", schema, value, v, path, sp, pad)
+
+    def _kw_exclusiveMinimum(self, schema, value, v, path, sp, pad, indent, depth):
+        return self._bound("exclusiveMinimum", "<=", "number", schema, value, v, path, sp, pad)
+
+    def _kw_exclusiveMaximum(self, schema, value, v, path, sp, pad, indent, depth):
+        return self._bound("exclusiveMaximum", ">=", "number", schema, value, v, path, sp, pad)
+
+    def _length(self, keyword, operator, test_type, schema, value, v, path, sp, pad):
+        site = self._site(keyword, value, schema, sp)
+        return [f"{pad}if {_TYPE_TESTS[test_type].format(v=v)} and len({v}) {operator} {value!r}:", f"{pad}    e.append(({site}, {path}, {v}))"]
+
+    def _kw_minItems(self, schema, value, v, path, sp, pad, indent, depth):
+        return self._length("minItems", "<", "array", schema, value, v, path, sp, pad)
+
+    def _kw_maxItems(self, schema, value, v, path, sp, pad, indent, depth):
+        return self._length("maxItems", ">", "array", schema, value, v, path, sp, pad)
+
+    def _kw_minLength(self, schema, value, v, path, sp, pad, indent, depth):
+        return self._length("minLength", "<", "string", schema, value, v, path, sp, pad)
+
+    def _kw_maxLength(self, schema, value, v, path, sp, pad, indent, depth):
+        return self._length("maxLength", ">", "string", schema, value, v, path, sp, pad)
+
+    def _kw_pattern(self, schema, value, v, path, sp, pad, indent, depth):
+        site = self._site("pattern", value, schema, sp)
+        regex = self._const("pattern", re.compile(value))
+        return [f"{pad}if isinstance({v}, str) and not {regex}.search({v}):", f"{pad}    e.append(({site}, {path}, {v}))"]
+
+
+class CompiledValidator:
+    """
+    Validateur spécialisé généré à partir d'un JSON Schema xlsF2schema.
+
+    Chaque champ du formulaire est traduit en tests Python directs (``isinstance``,
+    appartenance à un ``frozenset`` pour les listes de choix, comparaisons de bornes),
+    sans réinterpréter l'arbre du schéma à chaque soumission. Les erreurs sont des
+    ``jsonschema.ValidationError`` avec les mêmes messages, mots-clés et chemins que
+    ``jsonschema.Draft7Validator``.
+
+    :ivar schema: Schéma source
+    :ivar source: Code Python généré (pour inspection)
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        compiler = _Compiler(schema)
+        self._root_name = compiler.function(schema, [])
+        record_schema = schema.get("properties", {}).get("value", {}).get("items")
+        self._record_name = None
+        if isinstance(record_schema, dict):
+            self._record_name = compiler.function(record_schema, ["properties", "value", "items"])
+
+        self.source = "\n\n".join(compiler.functions)
+        namespace = dict(compiler.namespace)
+        namespace.update(_unique=self._unique, _in_enum=self._in_enum, _descend=self._descend)
+        exec(compile(self.source, "<xlsF2schema-validator>", "exec"), namespace)
+        self._sites = compiler.sites
+        self._root = namespace[self._root_name]
+        self._record = namespace[self._record_name] if self._record_name else None
+        self._jsonschema_validator = None
+
+    def _draft7(self):
+        if self._jsonschema_validator is None:
+            from jsonschema import Draft7Validator
+            self._jsonschema_validator = Draft7Validator(self.schema)
+        return self._jsonschema_validator
+
+    def _unique(self, values):
+        if all(isinstance(x, str) for x in values):
+            return len(set(values)) == len(values)
+        return self._draft7().evolve(schema={"uniqueItems": True}).is_valid(values)
+
+    def _in_enum(self, value, members):
+        return self._draft7().evolve(schema={"enum": members}).is_valid(value)
+
+    def _descend(self, value, fallback):
+        subschema, schema_path = fallback
+        for error in self._draft7().descend(value, subschema):
+            error.relative_schema_path.extendleft(reversed(schema_path))
+            yield error
+
+    def _materialize(self, raw_errors):
+        from jsonschema import Draft7Validator
+        from jsonschema.exceptions import ValidationError
+
+        for site_index, path, instance in raw_errors:
+            if site_index is None:
+                # Erreur déjà construite par jsonschema (mot-clé non compilé)
+                instance.relative_path.extendleft(reversed(path))
+                yield instance
+                continue
+            site = self._sites[site_index]
+            yield ValidationError(
+                _MESSAGES[site.keyword](instance, site.value, site.extra),
+                validator=site.keyword,
+                path=deque(path),
+                validator_value=site.value,
+                instance=instance,
+                schema=site.schema,
+                schema_path=deque(site.schema_path),
+                type_checker=Draft7Validator.TYPE_CHECKER,
+            )
+
+    def iter_errors(self, instance):
+        """
+        Itère sur les erreurs de validation d'un document complet (enveloppe ``value``).
+        """
+        raw_errors = []
+        self._root(instance, (), raw_errors)
+        return self._materialize(raw_errors)
+
+    def is_valid(self, instance):
+        raw_errors = []
+        self._root(instance, (), raw_errors)
+        return not raw_errors
+
+    def validate(self, instance):
+        """
+        Lève la meilleure ``ValidationError`` (comme ``jsonschema.validate``) si le document est invalide.
+        """
+        from jsonschema.exceptions import best_match
+
+        error = best_match(self.iter_errors(instance))
+        if error is not None:
+            raise error
+
+    def iter_record_errors(self, record, index=None):
+        """
+        Itère sur les erreurs d'une seule soumission (un élément du tableau ``value``).
+
+        :param record: Soumission à valider
+        :param index: Position de la soumission dans ``value`` ; si fournie, les chemins
+            d'erreur sont préfixés par ``("value", index)`` comme pour un document complet
+        """
+        if self._record is None:
+            raise ValueError("Le schéma ne décrit pas de tableau 'value' de soumissions")
+        raw_errors = []
+        self._record(record, () if index is None else ("value", index), raw_errors)
+        return self._materialize(raw_errors)
+
+    def is_valid_record(self, record):
+        if self._record is None:
+            raise ValueError("Le schéma ne décrit pas de tableau 'value' de soumissions")
+        raw_errors = []
+        self._record(record, (), raw_errors)
+        return not raw_errors
+
+
+def compile_schema(schema):
+    """
+    Compile un JSON Schema déjà généré en :class:`CompiledValidator`.
+    """
+    return CompiledValidator(schema)
+
+
+def compile_validator(xlsform_dict, use_refs=False):
+    """
+    Génère le JSON Schema d'un dictionnaire XLSForm et le compile en validateur spécialisé.
+
+    :param xlsform_dict: Dictionnaire XLSForm (sortie de ``xlsform_to_dict``)
+    :type xlsform_dict: dict
+    :param use_refs: Voir :func:`xlsF2schema.core.generate_json_schema`
+    :type use_refs: bool
+    :rtype: CompiledValidator
+    """
+    return CompiledValidator(generate_json_schema(xlsform_dict, use_refs=use_refs))
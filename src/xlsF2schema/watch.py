@@ -0,0 +1,242 @@
+"""
+Surveillance d'un répertoire de formulaires : seuls les XLSForm dont le contenu a changé
+sont reconvertis.
+
+Le répertoire est parcouru toutes les ``interval`` secondes. Un fichier dont la taille ou
+la date de modification change n'est pris en compte qu'une fois stable depuis ``debounce``
+secondes (une rafale d'enregistrements ne donne qu'une conversion) ; son empreinte SHA-256
+est alors comparée à celle du manifeste, et il n'est reconverti que si son contenu diffère.
+Les conversions (``xlsform_to_dict`` puis ``generate_json_schema``) s'exécutent dans un
+petit pool de processus et chaque schéma est écrit de façon atomique dans ``output_dir``,
+à la même position relative que son formulaire (``sous/dossier/form.xlsx`` ->
+``sous/dossier/form.json``).
+
+Le manifeste (``output_dir/.xlsF2schema-manifest.json``) garde l'empreinte de chaque
+formulaire converti : au redémarrage, les formulaires inchangés ne sont pas reconvertis.
+Il est invalidé si les options de conversion ou les versions de xlsF2schema/pyxform changent.
+
+Usage ::
+
+    watcher = FormWatcher("formulaires/", "schemas/", workers=2)
+    watcher.run()  # jusqu'à Ctrl+C ; watcher.sync() pour un seul passage
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from . import profiling
+from .batch import _convert_one, _is_xlsform, write_atomic
+from .cache import _package_version, file_digest
+
+MANIFEST_NAME = ".xlsF2schema-manifest.json"
+MANIFEST_VERSION = 1
+
+DEFAULT_DEBOUNCE = 2.0
+DEFAULT_INTERVAL = 1.0
+
+
+class FormWatcher:
+    """
+    Garde les schémas d'un répertoire de XLSForm à jour.
+
+    :param directory: Répertoire surveillé (récursivement)
+    :type directory: str
+    :param output_dir: Répertoire des schémas (créé si besoin)
+    :type output_dir: str
+    :param workers: Nombre de processus de conversion (1 = sans pool)
+    :type workers: int
+    :param cache_dir: Répertoire du cache de conversion, ou ``None`` pour le désactiver
+    :type cache_dir: str | None
+    :param output_options: Options d'écriture des schémas (voir :func:`xlsF2schema.output.write_json`)
+    :type output_options: dict | None
+    :param debounce: Délai (secondes) sans modification avant de traiter un fichier
+    :type debounce: float
+    :param interval: Délai (secondes) entre deux parcours du répertoire
+    :type interval: float
+    :param manifest: Chemin du manifeste (défaut: ``output_dir/.xlsF2schema-manifest.json``)
+    :type manifest: str | None
+    :param prune: Supprimer le schéma d'un formulaire supprimé
+    :type prune: bool
+    :param on_result: ``callback(result)`` appelé pour chaque conversion ou suppression
+        (``{"input", "output", "status", "seconds", "error"?}`` ; ``status`` : ``ok``, ``error`` ou ``removed``)
+    """
+
+    def __init__(self, directory, output_dir, workers=2, use_refs=False, loader="pyxform", cache_dir=None,
+                 output_options=None, debounce=DEFAULT_DEBOUNCE, interval=DEFAULT_INTERVAL, manifest=None,
+                 prune=False, on_result=None):
+        self.directory = directory
+        self.output_dir = output_dir
+        self.workers = workers
+        self.use_refs = use_refs
+        self.loader = loader
+        self.cache_dir = cache_dir
+        self.output_options = output_options
+        self.debounce = debounce
+        self.interval = interval
+        self.manifest_path = manifest or os.path.join(output_dir, MANIFEST_NAME)
+        self.prune = prune
+        self.on_result = on_result
+        # Chemin relatif -> (taille, mtime_ns) au dernier parcours
+        self._stats = {}
+        # Chemin relatif -> (taille, mtime_ns) ou None (supprimé), et instant du dernier changement
+        self._pending = {}
+        self._executor = None
+        self.forms = self._load_manifest()
+
+    # Manifeste
+
+    def _options(self):
+        return {
+            "use_refs": self.use_refs,
+            "loader": self.loader,
+            "output_options": self.output_options or {},
+            "versions": [_package_version("xlsF2schema"), _package_version("pyxform")],
+        }
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Options différentes : toutes les sorties sont à régénérer
+        if data.get("version") != MANIFEST_VERSION or data.get("options") != json.loads(json.dumps(self._options())):
+            return {}
+        return data.get("forms", {})
+
+    def _save_manifest(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.manifest_path)), exist_ok=True)
+        data = {"version": MANIFEST_VERSION, "options": self._options(), "forms": self.forms}
+        write_atomic(data, self.manifest_path, {"indent": 2, "sort_keys": True})
+
+    # Parcours
+
+    def _output_path(self, relative):
+        return os.path.join(self.output_dir, os.path.splitext(relative)[0] + ".json")
+
+    def _listing(self):
+        found = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not _is_xlsform(name):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found[os.path.relpath(path, self.directory)] = (stat.st_size, stat.st_mtime_ns)
+        return found
+
+    def scan(self, now=None):
+        """
+        Parcourt le répertoire et renvoie les chemins relatifs stables depuis ``debounce``
+        secondes parmi ceux modifiés, ajoutés ou supprimés.
+
+        :rtype: list[str]
+        """
+        now = time.monotonic() if now is None else now
+        listing = self._listing()
+        for relative in set(self._stats) - set(listing):
+            self._pending[relative] = (None, now)
+        for relative, signature in listing.items():
+            if self._stats.get(relative) != signature:
+                self._pending[relative] = (signature, now)
+        self._stats = listing
+        return sorted(relative for relative, (_, changed) in self._pending.items() if now - changed >= self.debounce)
+
+    # Conversion
+
+    def _submit(self, jobs):
+        if self.workers <= 1 or len(jobs) <= 1:
+            return [_convert_one(*job) for job in jobs]
+        if self._executor is None:
+            # Pool gardé d'un passage à l'autre : pyxform n'est importé qu'une fois par processus
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return list(self._executor.map(_convert_one, *zip(*jobs)))
+
+    def build(self, relatives):
+        """
+        Reconvertit les formulaires dont le contenu diffère du manifeste et retire du manifeste
+        ceux qui ont été supprimés.
+
+        :return: Résultats des conversions et suppressions
+        :rtype: list[dict]
+        """
+        results = []
+        jobs = []
+        digests = {}
+        for relative in relatives:
+            self._pending.pop(relative, None)
+            path = os.path.join(self.directory, relative)
+            entry = self.forms.get(relative)
+            try:
+                digest = file_digest(path)
+            except OSError:
+                if entry is not None:
+                    del self.forms[relative]
+                    output = self._output_path(relative)
+                    if self.prune and os.path.exists(output):
+                        os.remove(output)
+                    results.append({"input": path, "output": output if not self.prune else None, "status": "removed", "seconds": 0.0})
+                continue
+            output = self._output_path(relative)
+            if entry is not None and entry["digest"] == digest and (entry["status"] == "error" or os.path.exists(output)):
+                continue
+            digests[path] = relative, digest
+            os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+            jobs.append((path, output, self.use_refs, self.loader, self.cache_dir, self.output_options))
+
+        if jobs:
+            with profiling.stage("watch_build", forms=len(jobs)):
+                converted = self._submit(jobs)
+            for result in converted:
+                relative, digest = digests[result["input"]]
+                entry = {"digest": digest, "status": result["status"]}
+                if result["status"] != "ok":
+                    # Un contenu en échec n'est pas reconverti tant qu'il ne change pas
+                    entry["error"] = result["error"]
+                self.forms[relative] = entry
+            results.extend(converted)
+        if results:
+            self._save_manifest()
+            if self.on_result is not None:
+                for result in results:
+                    self.on_result(result)
+        return results
+
+    def poll(self, now=None):
+        """
+        Un passage : parcours du répertoire, puis conversion des formulaires stables.
+        """
+        ready = self.scan(now)
+        return self.build(ready) if ready else []
+
+    def sync(self):
+        """
+        Met immédiatement à jour tous les schémas, sans attendre ``debounce`` : formulaires
+        nouveaux ou modifiés depuis le manifeste, et formulaires supprimés depuis.
+        """
+        self.scan()
+        missing = set(self.forms) - set(self._stats)
+        return self.build(sorted(set(self._stats) | missing))
+
+    def run(self, stop=None):
+        """
+        Surveille le répertoire jusqu'à ``stop.set()`` (``threading.Event``) ou une interruption,
+        après une première mise à jour complète (:meth:`sync`).
+        """
+        stop = stop or threading.Event()
+        try:
+            self.sync()
+            while not stop.wait(self.interval):
+                self.poll()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,482 @@
+"""
+Sous-ensemble d'XPath utilisé par les colonnes ``relevant`` et ``constraint`` des XLSForms.
+
+Chaque expression est analysée une seule fois (mémoïsation par texte source) puis compilée
+en fonction Python ``f(v, s, R)`` :
+
+- ``v`` est la valeur du champ courant (``.``) ;
+- ``s`` est la pile des objets englobants de la soumission (la soumission, puis chaque
+  groupe ou instance de répétition jusqu'au champ) ;
+- ``R`` associe chaque référence ``${nom}`` à ``(profondeur, clés)`` : l'objet ``s[profondeur]``
+  d'où descendre par ``clés`` jusqu'à la valeur.
+
+Les valeurs suivent les règles de conversion d'XPath 1.0 (chaîne vide -> NaN, comparaison
+numérique dès qu'un opérande est un nombre...) ; les dates ISO sont comparées en jours
+depuis l'epoch, comme le fait JavaRosa.
+"""
+import math
+import operator
+import re
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+
+class XPathError(ValueError):
+    """
+    Expression hors du sous-ensemble supporté, ou mal formée.
+    """
+
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<number>\d+(?:\.\d*)?|\.\d+)
+      | (?P<string>'[^']*'|"[^"]*")
+      | \$\{(?P<ref>[^}]+)\}
+      | (?P<op>!=|<=|>=|=|<|>|\+|-|\*|\(|\)|,)
+      | (?P<name>[A-Za-z_][\w.-]*(?::[A-Za-z_][\w.-]*)?)
+      | (?P<dot>\.)
+      | (?P<other>\S)
+    )""", re.VERBOSE)
+
+_BINARY = {
+    "or": 1, "and": 2,
+    "=": 3, "!=": 3,
+    "<": 4, "<=": 4, ">": 4, ">=": 4,
+    "+": 5, "-": 5,
+    "*": 6, "div": 6, "mod": 6,
+}
+
+_COMPARISONS = ("=", "!=", "<", "<=", ">", ">=")
+
+
+def _tokenize(source):
+    tokens = []
+    for match in _TOKEN.finditer(source):
+        kind = match.lastgroup
+        if kind is None:
+            continue
+        value = match.group(kind)
+        if kind == "other":
+            raise XPathError(f"Caractère inattendu {value!r} dans : {source}")
+        # "and", "or", "div", "mod" ne sont des opérateurs qu'après un opérande
+        after_operand = bool(tokens) and (tokens[-1][0] in ("number", "string", "ref", "dot") or tokens[-1] == ("op", ")"))
+        if kind == "name" and value in ("and", "or", "div", "mod") and after_operand:
+            kind = "binary"
+        elif kind == "op" and value not in ("(", ")", ","):
+            kind = "binary"
+        tokens.append((kind, value))
+    tokens.append(("end", None))
+    return tokens
+
+
+class _Parser:
+    """
+    Analyseur descendant à précédence d'opérateurs ; produit un arbre de tuples :
+    ``("num", x)``, ``("str", s)``, ``("ref", nom)``, ``("self",)``, ``("neg", a)``,
+    ``("op", opérateur, a, b)`` et ``("call", fonction, (arguments...))``.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.tokens = _tokenize(source)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos]
+
+    def take(self, kind=None, value=None):
+        token = self.tokens[self.pos]
+        if (kind and token[0] != kind) or (value and token[1] != value):
+            found = token[1] if token[1] is not None else "fin d'expression"
+            raise XPathError(f"{value or kind!r} attendu, {found!r} trouvé dans : {self.source}")
+        self.pos += 1
+        return token
+
+    def parse(self):
+        tree = self.expression(0)
+        self.take("end")
+        return tree
+
+    def expression(self, min_precedence):
+        left = self.unary()
+        while True:
+            kind, value = self.peek()
+            precedence = _BINARY.get(value) if kind == "binary" else None
+            if precedence is None or precedence <= min_precedence:
+                return left
+            self.pos += 1
+            left = ("op", value, left, self.expression(precedence))
+
+    def unary(self):
+        if self.peek() == ("binary", "-"):
+            self.pos += 1
+            return ("neg", self.unary())
+        return self.primary()
+
+    def primary(self):
+        kind, value = self.take()
+        if kind == "number":
+            number = float(value)
+            return ("num", int(number) if number.is_integer() else number)
+        if kind == "string":
+            return ("str", value[1:-1])
+        if kind == "ref":
+            return ("ref", value.strip())
+        if kind == "dot":
+            return ("self",)
+        if kind == "op" and value == "(":
+            tree = self.expression(0)
+            self.take("op", ")")
+            return tree
+        if kind == "name" and self.peek() == ("op", "("):
+            self.pos += 1
+            args = []
+            if self.peek() != ("op", ")"):
+                args.append(self.expression(0))
+                while self.peek() == ("op", ","):
+                    self.pos += 1
+                    args.append(self.expression(0))
+            self.take("op", ")")
+            return ("call", value, tuple(args))
+        raise XPathError(f"Terme non supporté {value!r} dans : {self.source}")
+
+
+@lru_cache(maxsize=None)
+def parse(source):
+    """
+    Analyse une expression XPath et renvoie son arbre (voir :class:`_Parser`).
+
+    :raises XPathError: Si l'expression est mal formée ou hors du sous-ensemble supporté
+    """
+    return _Parser(source).parse()
+
+
+def references(tree):
+    """
+    Renvoie les noms référencés (``${nom}``) par un arbre, sans doublons et dans l'ordre.
+    """
+    found = {}
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node[0] == "ref":
+            found.setdefault(node[1], None)
+        elif node[0] == "neg":
+            stack.append(node[1])
+        elif node[0] == "op":
+            stack.extend((node[3], node[2]))
+        elif node[0] == "call":
+            stack.extend(reversed(node[2]))
+    return tuple(found)
+
+
+# Conversions XPath ------------------------------------------------------------------
+
+_EPOCH = date(1970, 1, 1)
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+
+def _num(x):
+    if x is None:
+        return math.nan
+    if x is True or x is False:
+        return 1.0 if x else 0.0
+    if isinstance(x, (int, float)):
+        return float(x)
+    if isinstance(x, str):
+        x = x.strip()
+        try:
+            return float(x)
+        except ValueError:
+            pass
+        if _ISO_DATE.match(x):
+            return _days(x)
+    return math.nan
+
+
+def _days(text):
+    """
+    Convertit une date (ou date-heure) ISO en jours depuis l'epoch.
+    """
+    try:
+        if len(text) == 10:
+            return float((date.fromisoformat(text) - _EPOCH).days)
+        moment = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        return math.nan
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment - datetime(1970, 1, 1, tzinfo=timezone.utc)).total_seconds() / 86400
+
+
+def _str(x):
+    if x is None:
+        return ""
+    if x is True or x is False:
+        return "true" if x else "false"
+    if isinstance(x, float):
+        if math.isnan(x):
+            return "NaN"
+        if math.isinf(x):
+            return "Infinity" if x > 0 else "-Infinity"
+        return str(int(x)) if x.is_integer() else repr(x)
+    if isinstance(x, list):
+        # Les réponses de select_multiple sont une liste séparée par des espaces en XForm
+        return " ".join(_str(item) for item in x)
+    if isinstance(x, dict):
+        return ""
+    return str(x)
+
+
+def _bool(x):
+    if x is None:
+        return False
+    if x is True or x is False:
+        return x
+    if isinstance(x, (int, float)):
+        return x == x and x != 0
+    if isinstance(x, (str, list, dict)):
+        return len(x) > 0
+    return bool(x)
+
+
+def _is_number(x):
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+
+def _equals(a, b):
+    if isinstance(a, bool) or isinstance(b, bool):
+        return _bool(a) == _bool(b)
+    if _is_number(a) or _is_number(b):
+        return _num(a) == _num(b)
+    return _str(a) == _str(b)
+
+
+_RELATIONS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+
+def _compare(op, a, b):
+    if op == "=":
+        return _equals(a, b)
+    if op == "!=":
+        return not _equals(a, b)
+    return _RELATIONS[op](_num(a), _num(b))
+
+
+def _divide(a, b):
+    a, b = _num(a), _num(b)
+    if b == 0:
+        return math.nan if a == 0 or a != a else math.copysign(math.inf, a)
+    return a / b
+
+
+def _modulo(a, b):
+    a, b = _num(a), _num(b)
+    return math.nan if b == 0 else math.fmod(a, b)
+
+
+def _ref(s, R, name):
+    depth, keys = R[name]
+    node = s[depth] if depth < len(s) else None
+    for key in keys:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(key)
+    return node
+
+
+def _selected(x, value):
+    value = _str(value).strip()
+    if isinstance(x, list):
+        return value in (_str(item) for item in x)
+    return value in _str(x).split()
+
+
+def _selected_at(x, index):
+    items = [_str(item) for item in x] if isinstance(x, list) else _str(x).split()
+    index = _num(index)
+    return items[int(index)] if index == index and 0 <= index < len(items) else ""
+
+
+def _count_selected(x):
+    return float(len(x) if isinstance(x, list) else len(_str(x).split()))
+
+
+def _count(x):
+    if isinstance(x, list):
+        return float(len(x))
+    return 0.0 if x is None or x == "" else 1.0
+
+
+def _int(x):
+    x = _num(x)
+    return x if x != x or math.isinf(x) else float(math.trunc(x))
+
+
+def _round(x, digits=0):
+    x, digits = _num(x), int(_num(digits) or 0)
+    if x != x or math.isinf(x):
+        return x
+    factor = 10.0 ** digits
+    # XPath arrondit les demis vers +infini
+    return math.floor(x * factor + 0.5) / factor
+
+
+def _substr(x, start, end=None):
+    text = _str(x)
+    start = int(_num(start))
+    return text[start:] if end is None else text[start:int(_num(end))]
+
+
+@lru_cache(maxsize=256)
+def _pattern(pattern):
+    return re.compile(pattern)
+
+
+def _regex(x, pattern):
+    return _pattern(_str(pattern)).search(_str(x)) is not None
+
+
+def _today():
+    return date.today().isoformat()
+
+
+def _now():
+    return datetime.now().astimezone().isoformat(timespec="milliseconds")
+
+
+def _date(x):
+    if _is_number(x):
+        return (_EPOCH + timedelta(days=int(x))).isoformat()
+    return _str(x)
+
+
+def _coalesce(a, b):
+    return a if _str(a) != "" else b
+
+
+_RUNTIME = {
+    "_num": _num, "_str": _str, "_bool": _bool, "_compare": _compare, "_ref": _ref,
+    "_divide": _divide, "_modulo": _modulo, "_math": math,
+}
+
+# Fonctions supportées : nom -> (implémentation, nombre minimal et maximal d'arguments)
+_FUNCTIONS = {
+    "not": (lambda x: not _bool(x), 1, 1),
+    "true": (lambda: True, 0, 0),
+    "false": (lambda: False, 0, 0),
+    "boolean": (_bool, 1, 1),
+    "number": (_num, 1, 1),
+    "int": (_int, 1, 1),
+    "round": (_round, 1, 2),
+    "abs": (lambda x: abs(_num(x)), 1, 1),
+    "string": (_str, 1, 1),
+    "string-length": (lambda x: float(len(_str(x))), 1, 1),
+    "concat": (lambda *args: "".join(_str(a) for a in args), 0, None),
+    "contains": (lambda a, b: _str(b) in _str(a), 2, 2),
+    "starts-with": (lambda a, b: _str(a).startswith(_str(b)), 2, 2),
+    "ends-with": (lambda a, b: _str(a).endswith(_str(b)), 2, 2),
+    "substr": (_substr, 2, 3),
+    "regex": (_regex, 2, 2),
+    "selected": (_selected, 2, 2),
+    "selected-at": (_selected_at, 2, 2),
+    "count-selected": (_count_selected, 1, 1),
+    "count": (_count, 1, 1),
+    "coalesce": (_coalesce, 2, 2),
+    "today": (_today, 0, 0),
+    "now": (_now, 0, 0),
+    "date": (_date, 1, 1),
+    "date-time": (_date, 1, 1),
+}
+
+
+def _source(tree, functions):
+    """
+    Traduit un arbre en expression Python (les fonctions utilisées sont ajoutées à ``functions``).
+    """
+    kind = tree[0]
+    if kind in ("num", "str"):
+        return repr(tree[1])
+    if kind == "self":
+        return "v"
+    if kind == "ref":
+        return f"_ref(s, R, {tree[1]!r})"
+    if kind == "neg":
+        return f"(-_num({_source(tree[1], functions)}))"
+    if kind == "op":
+        op, left, right = tree[1], _source(tree[2], functions), _source(tree[3], functions)
+        if op in ("and", "or"):
+            return f"(_bool({left}) {op} _bool({right}))"
+        if op in _COMPARISONS:
+            return f"_compare({op!r}, {left}, {right})"
+        if op == "div":
+            return f"_divide({left}, {right})"
+        if op == "mod":
+            return f"_modulo({left}, {right})"
+        return f"(_num({left}) {op} _num({right}))"
+
+    name, args = tree[1], tree[2]
+    if name == "if":
+        if len(args) != 3:
+            raise XPathError("if() attend 3 arguments")
+        condition, then, otherwise = (_source(a, functions) for a in args)
+        return f"({then} if _bool({condition}) else {otherwise})"
+    if name not in _FUNCTIONS:
+        raise XPathError(f"Fonction non supportée : {name}()")
+    func, least, most = _FUNCTIONS[name]
+    if len(args) < least or (most is not None and len(args) > most):
+        raise XPathError(f"Nombre d'arguments incorrect pour {name}()")
+    if name == "regex" and args[1][0] == "str":
+        try:
+            _pattern(args[1][1])
+        except re.error as e:
+            raise XPathError(f"Expression régulière invalide {args[1][1]!r} : {e}") from e
+    alias = "_f_" + re.sub(r"\W", "_", name)
+    functions[alias] = func
+    return f"{alias}({', '.join(_source(a, functions) for a in args)})"
+
+
+class Expression:
+    """
+    Expression XPath compilée, appelable comme ``expression(v, s, R)``.
+
+    :ivar source: Texte d'origine
+    :ivar tree: Arbre syntaxique (voir :func:`parse`)
+    :ivar refs: Noms référencés par ``${nom}``
+    :ivar code: Source Python générée
+    """
+
+    __slots__ = ("source", "tree", "refs", "code", "function")
+
+    def __init__(self, source, tree, code, function):
+        self.source = source
+        self.tree = tree
+        self.refs = references(tree)
+        self.code = code
+        self.function = function
+
+    def __call__(self, v, s=(), R=None):
+        return self.function(v, s, R)
+
+    def test(self, v, s=(), R=None):
+        """
+        Évalue l'expression comme un booléen XPath.
+        """
+        return _bool(self.function(v, s, R))
+
+    def __repr__(self):
+        return f"Expression({self.source!r})"
+
+
+@lru_cache(maxsize=4096)
+def compile_expression(source):
+    """
+    Compile une expression XPath en :class:`Expression` (mémoïsé par texte source).
+
+    :raises XPathError: Si l'expression est hors du sous-ensemble supporté
+    """
+    tree = parse(source)
+    namespace = dict(_RUNTIME)
+    code = f"def _expression(v, s, R):\n    return {_source(tree, namespace)}\n"
+    exec(compile(code, f"<xpath {source[:40]!r}>", "exec"), namespace)
+    return Expression(source, tree, code, namespace["_expression"])
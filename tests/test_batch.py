@@ -0,0 +1,62 @@
+"""
+Tests unitaires pour la conversion par lot
+"""
+import json
+import os
+import shutil
+import stat
+from pathlib import Path
+
+from xlsF2schema.batch import collect_inputs, convert_batch, write_atomic
+
+SAMPLES_DIR = Path(__file__).parent / "samples"
+
+
+def test_collect_inputs_sources_and_manifest(tmp_path):
+    """Test de la résolution des répertoires, motifs glob et manifestes"""
+    forms = tmp_path / "forms"
+    (forms / "sub").mkdir(parents=True)
+    shutil.copy(SAMPLES_DIR / "test_odk.xlsx", forms / "a.xlsx")
+    shutil.copy(SAMPLES_DIR / "test_odk.xlsx", forms / "sub" / "b.xlsx")
+    (forms / "~$a.xlsx").write_text("lock")
+    (forms / "notes.txt").write_text("rien")
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# commentaire\nforms/sub/b.xlsx\n")
+
+    assert [Path(p).name for p in collect_inputs([str(forms)])] == ["a.xlsx", "b.xlsx"]
+    assert [Path(p).name for p in collect_inputs([str(forms / "*.xlsx")])] == ["a.xlsx"]
+    assert [Path(p).name for p in collect_inputs([], manifest=str(manifest))] == ["b.xlsx"]
+
+
+def test_convert_batch_collects_failures(tmp_path):
+    """Test qu'un formulaire invalide n'interrompt pas le lot"""
+    broken = tmp_path / "broken.xlsx"
+    broken.write_text("pas un classeur")
+    paths = [str(SAMPLES_DIR / "test_odk.xlsx"), str(SAMPLES_DIR / "Household.xlsx"), str(broken)]
+
+    report = convert_batch(paths, str(tmp_path / "out"), workers=2)
+
+    assert report["total"] == 3
+    assert report["succeeded"] == 2
+    assert report["failed"] == 1
+    failure = next(r for r in report["results"] if r["status"] == "error")
+    assert failure["input"] == str(broken)
+    schema = json.loads((tmp_path / "out" / "test_odk.json").read_text(encoding="utf-8"))
+    assert "value" in schema["properties"]
+
+
+def test_write_atomic_follows_umask(tmp_path):
+    """Test que le fichier écrit a les droits d'un open() classique, pas le 0600 de mkstemp"""
+    previous = os.umask(0o022)
+    try:
+        write_atomic({"a": 1}, str(tmp_path / "out.json"))
+        with open(tmp_path / "reference.json", "w"):
+            pass
+    finally:
+        os.umask(previous)
+
+    assert json.loads((tmp_path / "out.json").read_text(encoding="utf-8")) == {"a": 1}
+    mode = stat.S_IMODE(os.stat(tmp_path / "out.json").st_mode)
+    assert mode == stat.S_IMODE(os.stat(tmp_path / "reference.json").st_mode)
+    if os.name == "posix":
+        assert mode == 0o644
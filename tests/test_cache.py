@@ -0,0 +1,56 @@
+"""
+Tests unitaires pour le cache de conversion sur disque
+"""
+import os
+import shutil
+from pathlib import Path
+
+from xlsF2schema.cache import ConversionCache
+from xlsF2schema.cli import convert_file
+
+SAMPLES_DIR = Path(__file__).parent / "samples"
+
+
+def test_cache_key_follows_content(tmp_path):
+    """Test que la clé dépend du contenu et non du chemin"""
+    cache = ConversionCache(str(tmp_path / "cache"))
+    copy = tmp_path / "copie.xlsx"
+    shutil.copy(SAMPLES_DIR / "test_odk.xlsx", copy)
+
+    assert cache.key(str(copy)) == cache.key(str(SAMPLES_DIR / "test_odk.xlsx"))
+    assert cache.key(str(copy)) != cache.key(str(SAMPLES_DIR / "Household.xlsx"))
+
+
+def test_convert_file_uses_cache(tmp_path):
+    """Test qu'une conversion en cache renvoie le même schéma sans repasser par pyxform"""
+    cache = ConversionCache(str(tmp_path / "cache"))
+    path = str(SAMPLES_DIR / "test_odk.xlsx")
+
+    cold = convert_file(path, cache=cache)
+    key = cache.key(path)
+    assert cache.get_survey(key) is not None
+    assert cache.get_schema(key, "inline") == cold
+
+    # Un schéma modifié en cache prouve que la seconde conversion vient du disque
+    cache.put_schema(key, {"cached": True}, "inline")
+    assert convert_file(path, cache=cache) == {"cached": True}
+    assert convert_file(path) == cold
+
+
+def test_cache_lru_eviction(tmp_path):
+    """Test que les entrées les moins récemment utilisées sont évincées"""
+    cache = ConversionCache(str(tmp_path / "cache"), max_bytes=250)
+    payload = {"data": "x" * 100}
+
+    cache.put_survey("ancien", payload)
+    os.utime(cache._entry_path("ancien", "survey"), (1, 1))
+    cache.put_survey("recent", payload)
+    os.utime(cache._entry_path("recent", "survey"), (2, 2))
+    cache.get_survey("ancien")
+    cache.put_survey("nouveau", payload)
+
+    assert cache.get_survey("recent") is None
+    assert cache.get_survey("ancien") == payload
+    assert cache.get_survey("nouveau") == payload
+    assert cache.size() <= 250
+    assert cache.clear() == 2
@@ -4,7 +4,8 @@ Tests unitaires pour la conversion XLSForm vers JSON Schema
 import pytest
 import json
 from pathlib import Path
-from xlsF2schema.core import generate_json_schema
+from xlsF2schema.core import generate_json_schema, iter_schema
+from xlsF2schema.diff import apply_patch
 
 # Chemin vers les fichiers de test
 SAMPLES_DIR = Path(__file__).parent / "samples"
@@ -193,5 +194,72 @@ def test_generate_json_schema_with_choices():
     assert "genre" in items["required"]
 
 
+def test_generate_json_schema_with_refs():
+    """Test que les listes de choix partagées sont mutualisées dans 'definitions'"""
+    xlsform_data = {
+        "children": [
+            {"type": "select_one lieux", "name": "depart", "bind": {"required": "yes"}},
+            {"type": "select_multiple lieux", "name": "etapes", "bind": {"required": "yes"}},
+        ],
+        "choices": {
+            "lieux": [{"name": "lome"}, {"name": "kara"}]
+        }
+    }
+
+    schema = generate_json_schema(xlsform_data, use_refs=True)
+    items = schema["properties"]["value"]["items"]
+
+    assert schema["definitions"] == {"lieux": {"enum": ["lome", "kara"]}}
+    assert items["properties"]["depart"]["allOf"] == [{"$ref": "#/definitions/lieux"}]
+    assert items["properties"]["etapes"]["items"]["allOf"] == [{"$ref": "#/definitions/lieux"}]
+    assert "enum" not in items["properties"]["depart"]
+
+    inline = generate_json_schema(xlsform_data)
+    assert "definitions" not in inline
+    assert inline["properties"]["value"]["items"]["properties"]["depart"]["enum"] == ["lome", "kara"]
+
+
+def _nested_form(depth):
+    """Formulaire alternant groupes et répétitions sur ``depth`` niveaux"""
+    leaf = {"type": "text", "name": "feuille", "bind": {"required": "yes"}}
+    for level in reversed(range(depth)):
+        leaf = {
+            "type": "group" if level % 2 == 0 else "repeat",
+            "name": f"section_{level}",
+            "children": [{"type": "integer", "name": f"n_{level}"}, leaf],
+        }
+    return {"children": [leaf], "choices": {}}
+
+
+def test_generate_json_schema_deep_nesting():
+    """La profondeur d'imbrication n'est pas limitée par la pile d'appels"""
+    import sys
+    depth = sys.getrecursionlimit() * 2
+    schema = generate_json_schema(_nested_form(depth))
+
+    node = schema["properties"]["value"]["items"]
+    for level in range(depth):
+        node = node["properties"][f"section_{level}"]
+        if node["type"] == "array":
+            node = node["items"]
+    assert node["required"] == ["feuille"]
+
+
+@pytest.mark.parametrize("use_refs", [False, True])
+def test_iter_schema_rebuilds_schema(use_refs):
+    """Les couples (pointeur, sous-schéma) reconstruisent le schéma complet"""
+    xlsform_data = _nested_form(4)
+    xlsform_data["children"].append({"type": "select one", "name": "statut", "itemset": "oui_non"})
+    xlsform_data["choices"] = {"oui_non": [{"name": "oui"}, {"name": "non"}]}
+
+    pairs = list(iter_schema(xlsform_data, use_refs=use_refs))
+    assert pairs[0][0] == ""
+    assert pairs[1][0] == "/properties/value/items/properties/section_0"
+    assert "/properties/value/items/properties/section_0/properties/section_1/items/properties/n_1" in dict(pairs)
+
+    rebuilt = apply_patch({}, [{"op": "add", "path": p, "value": s} for p, s in pairs])
+    assert rebuilt == generate_json_schema(xlsform_data, use_refs=use_refs)
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,69 @@
+"""
+Tests unitaires pour le démon de conversion (socket Unix)
+"""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import pytest
+
+from xlsF2schema import daemon
+from xlsF2schema.cli import convert_file
+
+SAMPLES_DIR = Path(__file__).parent / "samples"
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="sockets Unix non disponibles")
+
+
+@pytest.fixture
+def socket_path():
+    # Les chemins de socket sont limités à ~100 caractères : tmp_path peut être trop long
+    directory = tempfile.mkdtemp(prefix="xf2s-")
+    yield os.path.join(directory, "d.sock")
+    os.rmdir(directory)
+
+
+def test_daemon_converts_and_stops(socket_path):
+    """Test qu'un démon renvoie le même schéma qu'une conversion locale, puis s'arrête"""
+    server = threading.Thread(target=daemon.serve, args=(socket_path, 0))
+    server.start()
+    try:
+        for _ in range(200):
+            if daemon.is_running(socket_path):
+                break
+            server.join(0.05)
+        path = str(SAMPLES_DIR / "test_odk.xlsx")
+
+        assert daemon.convert(path, socket_path=socket_path) == convert_file(path)
+        assert daemon.convert(path, use_refs=True, socket_path=socket_path) == convert_file(path, use_refs=True)
+        with pytest.raises(ValueError):
+            daemon.convert(str(SAMPLES_DIR / "absent.xlsx"), socket_path=socket_path)
+        assert daemon.request({"op": "ping"}, socket_path)["served"] == 3
+    finally:
+        daemon.stop(socket_path)
+        server.join(10)
+
+    assert not server.is_alive()
+    assert not os.path.exists(socket_path)
+
+
+def test_cli_falls_back_without_daemon(socket_path):
+    """Test que --daemon convertit localement si aucun démon n'écoute, sans importer pyxform avant"""
+    with pytest.raises(daemon.DaemonUnavailable):
+        daemon.request({"op": "ping"}, socket_path)
+
+    env = dict(os.environ, XLSF2SCHEMA_SOCKET=socket_path)
+    code = (
+        "import sys; from xlsF2schema import cli; "
+        "assert 'pyxform' not in sys.modules; "
+        "cli.main(['--daemon', sys.argv[1]])"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code, str(SAMPLES_DIR / "test_odk.xlsx")],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    assert '"$schema"' in result.stdout
@@ -0,0 +1,114 @@
+"""
+Tests unitaires pour la mise à jour incrémentale et le JSON Patch
+"""
+import copy
+
+import pytest
+
+from xlsF2schema.core import generate_json_schema
+from xlsF2schema.diff import apply_patch, json_patch, update_schema
+
+OLD_SURVEY = {
+    "children": [
+        {"type": "text", "name": "nom", "bind": {"required": "yes"}},
+        {"type": "select_one lieux", "name": "lieu"},
+        {
+            "type": "group",
+            "name": "menage",
+            "children": [
+                {"type": "integer", "name": "taille"},
+                {"type": "repeat", "name": "membres", "children": [{"type": "text", "name": "prenom"}]},
+            ]
+        },
+        {"type": "geopoint", "name": "gps"},
+    ],
+    "choices": {"lieux": [{"name": "lome"}, {"name": "kara"}], "vide": []}
+}
+
+
+def _new_survey():
+    survey = copy.deepcopy(OLD_SURVEY)
+    survey["children"][2]["children"][0]["bind"] = {"required": "yes"}
+    survey["children"][2]["children"][1]["children"].append({"type": "date", "name": "naissance"})
+    survey["children"].pop(0)
+    survey["choices"]["lieux"].append({"name": "sokode"})
+    return survey
+
+
+@pytest.mark.parametrize("use_refs", [False, True])
+def test_update_schema_matches_full_generation(use_refs):
+    """Test que la mise à jour incrémentale équivaut à une régénération complète"""
+    old_schema = generate_json_schema(OLD_SURVEY, use_refs=use_refs)
+    new_survey = _new_survey()
+
+    schema, patch, stats = update_schema(new_survey, OLD_SURVEY, old_schema, use_refs=use_refs)
+
+    assert schema == generate_json_schema(new_survey, use_refs=use_refs)
+    assert apply_patch(old_schema, patch) == schema
+    assert stats["reused"] >= 2
+    # Le point GPS inchangé est repris sans copie
+    old_gps = old_schema["properties"]["value"]["items"]["properties"]["gps"]
+    assert schema["properties"]["value"]["items"]["properties"]["gps"] is old_gps
+
+
+def test_update_schema_relevance_of_unchanged_field():
+    """Test qu'un champ inchangé est régénéré si sa condition d'affichage n'est plus traduite"""
+    old_survey = {"children": [
+        {"type": "integer", "name": "age"},
+        {"type": "text", "name": "conjoint", "bind": {"required": "yes", "relevant": "${age} >= 18"}},
+    ]}
+    new_survey = copy.deepcopy(old_survey)
+    new_survey["children"][0]["type"] = "text"
+
+    schema = update_schema(new_survey, old_survey, generate_json_schema(old_survey))[0]
+
+    assert schema == generate_json_schema(new_survey)
+    assert schema["properties"]["value"]["items"]["properties"]["conjoint"] == {"type": "string"}
+
+
+def test_update_schema_deep_nesting():
+    """La profondeur d'imbrication n'est pas limitée par la pile d'appels"""
+    import sys
+
+    def nested(leaf_bind):
+        node = {"type": "text", "name": "feuille", "bind": leaf_bind}
+        for level in reversed(range(sys.getrecursionlimit() * 2)):
+            node = {"type": "group" if level % 2 else "repeat", "name": f"s{level}", "children": [node]}
+        return {"children": [node]}
+
+    old_survey, new_survey = nested({"required": "yes"}), nested({})
+    old_schema = generate_json_schema(old_survey)
+
+    schema, patch, stats = update_schema(new_survey, old_survey, old_schema)
+
+    assert stats == {"reused": 0, "regenerated": 1}
+    assert [op["op"] for op in patch] == ["remove", "replace"]
+    assert patch[1]["path"].endswith("/properties/feuille/type")
+    node = apply_patch(old_schema, patch)["properties"]["value"]["items"]
+    for level in range(sys.getrecursionlimit() * 2):
+        node = node["properties"][f"s{level}"]
+        node = node["items"] if node["type"] == "array" else node
+    assert node["properties"]["feuille"] == {"type": ["string", "null"]} and "required" not in node
+
+
+def test_update_schema_from_old_schema_only():
+    """Test du mode sans ancien dictionnaire : génération complète puis comparaison"""
+    old_schema = generate_json_schema(OLD_SURVEY)
+    new_survey = _new_survey()
+
+    schema, patch, _ = update_schema(new_survey, old_schema=old_schema)
+
+    assert apply_patch(old_schema, patch) == schema
+    with pytest.raises(ValueError):
+        update_schema(new_survey)
+
+
+def test_json_patch_operations():
+    """Test des opérations produites et de l'échappement des pointeurs"""
+    patch = json_patch({"a/b": 1, "c": [1], "d": True, "f": 0}, {"a/b": 2, "c": [1], "e": None, "d": 1})
+    assert patch == [
+        {"op": "remove", "path": "/f"},
+        {"op": "replace", "path": "/a~1b", "value": 2},
+        {"op": "add", "path": "/e", "value": None},
+        {"op": "replace", "path": "/d", "value": 1},
+    ]
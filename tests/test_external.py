@@ -0,0 +1,101 @@
+"""
+Tests unitaires pour les listes de choix externes (select_one_from_file)
+"""
+import json
+import os
+
+import pytest
+from openpyxl import Workbook
+
+from xlsF2schema import external
+from xlsF2schema.cli import convert_file, load_schema
+from xlsF2schema.external import ExternalChoices, LookupFiles, iter_values
+from xlsF2schema.validator import compile_schema
+
+
+def _write_form(path):
+    workbook = Workbook()
+    survey = workbook.active
+    survey.title = "survey"
+    for row in [
+        ("type", "name", "label", "parameters", "required"),
+        ("select_one_from_file villes.csv", "ville", "Ville", None, "yes"),
+        ("select_multiple_from_file regions.xml", "regions", "Régions", None, None),
+        ("select_one_from_file lieux.geojson", "lieu", "Lieu", None, None),
+        ("select_one_from_file villes.csv", "code", "Code", "value=code", None),
+    ]:
+        survey.append(row)
+    workbook.save(path)
+
+
+@pytest.fixture
+def form(tmp_path):
+    (tmp_path / "villes.csv").write_text("name,label,code\nparis,Paris,75\nlyon,Lyon,69\nlyon,Lyon (doublon),69\n", encoding="utf-8")
+    (tmp_path / "regions.xml").write_text(
+        "<root><item><name>idf</name><label>IDF</label></item><item><name>ara</name></item></root>", encoding="utf-8"
+    )
+    (tmp_path / "lieux.geojson").write_text(json.dumps({
+        "type": "FeatureCollection",
+        "name": "features",
+        "features": [
+            {"type": "Feature", "id": "p1", "geometry": {"type": "Point", "coordinates": [2.35, 48.85]}, "properties": {}},
+            {"type": "Feature", "geometry": None, "properties": {"id": "p2"}},
+        ],
+    }), encoding="utf-8")
+    path = tmp_path / "form.xlsx"
+    _write_form(path)
+    return path
+
+
+@pytest.mark.parametrize("loader", ["pyxform", "native"])
+def test_external_lists_are_resolved(form, loader):
+    """Test que les fichiers CSV, XML et GeoJSON à côté du formulaire deviennent des enum"""
+    properties = convert_file(str(form), loader=loader)["properties"]["value"]["items"]["properties"]
+    assert properties["ville"]["enum"] == ["paris", "lyon"]
+    assert properties["regions"]["items"]["enum"] == ["idf", "ara"]
+    assert properties["lieu"]["enum"] == ["p1", "p2"]
+    assert properties["code"]["enum"] == ["75", "69"]
+
+
+def test_geojson_is_streamed_across_chunks(form, monkeypatch):
+    """Test que la lecture en flux du GeoJSON ne dépend pas du découpage en blocs"""
+    monkeypatch.setattr(external, "_CHUNK_SIZE", 7)
+    assert list(iter_values(str(form.parent / "lieux.geojson"))) == ["p1", "p2"]
+
+
+def test_cache_is_invalidated_by_mtime(form):
+    """Test qu'une liste est partagée tant que le fichier ne change pas, puis relue"""
+    cache = ExternalChoices()
+    path = str(form.parent / "villes.csv")
+    first = cache.load(path)
+    assert cache.load(path) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("nice,Nice,06\n")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert cache.load(path) == ("paris", "lyon", "nice")
+    assert cache.misses == 2
+
+
+def test_lookup_side_files(form, tmp_path):
+    """Test que les grandes listes sont écrites à part et rechargées pour la validation"""
+    output_dir = tmp_path / "sortie"
+    lookup = LookupFiles(str(output_dir / "listes"), threshold=2, ref_base=str(output_dir))
+    schema = convert_file(str(form), lookup=lookup)
+    ville = schema["properties"]["value"]["items"]["properties"]["ville"]
+    ref = ville["allOf"][0]["$ref"]
+    assert ref.startswith("listes/villes.csv-") and "enum" not in ville
+
+    (output_dir / "schema.json").write_text(json.dumps(schema), encoding="utf-8")
+    validator = compile_schema(load_schema(str(output_dir / "schema.json")))
+    assert validator.is_valid_record({"ville": "lyon", "regions": ["idf"], "lieu": "p1"})
+    assert not validator.is_valid_record({"ville": "marseille"})
+
+
+def test_missing_external_file(form):
+    """Test qu'un fichier de choix externe absent est signalé"""
+    os.remove(form.parent / "regions.xml")
+    with pytest.raises(ValueError, match="regions.xml"):
+        convert_file(str(form))
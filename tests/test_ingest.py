@@ -0,0 +1,117 @@
+"""
+Tests unitaires pour le chargement de soumissions en tables Parquet/Arrow
+"""
+import io
+import json
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from xlsF2schema.cli import ingest_main
+from xlsF2schema.ingest import ColumnarWriter, ingest_stream
+
+XLSFORM_DATA = {
+    "name": "menage",
+    "children": [
+        {"type": "select_one oui_non", "name": "consent", "bind": {"required": "yes"}},
+        {"type": "date", "name": "jour"},
+        {
+            "type": "group",
+            "name": "lieu",
+            "children": [
+                {"type": "geopoint", "name": "position"},
+                {"type": "select_multiple couleurs", "name": "couleurs"},
+            ]
+        },
+        {
+            "type": "repeat",
+            "name": "membres",
+            "children": [
+                {"type": "text", "name": "nom"},
+                {"type": "integer", "name": "age"},
+                {"type": "repeat", "name": "visites", "children": [{"type": "dateTime", "name": "quand"}]},
+            ]
+        },
+    ],
+    "choices": {
+        "oui_non": [{"name": "oui"}, {"name": "non"}],
+        "couleurs": [{"name": "rouge"}, {"name": "vert"}],
+    }
+}
+
+RECORDS = [
+    {
+        "consent": "oui",
+        "jour": "2026-01-02",
+        "lieu": {"position": {"latitude": 48.8, "longitude": 2.3, "altitude": 35.0, "accuracy": 5.0}, "couleurs": ["vert", "rouge"]},
+        "membres": [
+            {"nom": "Awa", "age": 30, "visites": [{"quand": "2026-01-02T10:00:00Z"}, {"quand": "2026-01-03T10:00:00+01:00"}]},
+            {"nom": "Kodjo", "age": None},
+        ],
+    },
+    {"consent": "non", "jour": None, "lieu": None},
+    {"consent": "oui", "membres": [{"nom": "Ama", "age": 7, "visites": [{"quand": None}]}]},
+]
+
+
+def _read(summary, name):
+    return pq.read_table(summary["tables"][name]["path"]).to_pylist()
+
+
+@pytest.mark.parametrize("batch_size, workers", [(10, 1), (1, 1), (1, 2)])
+def test_ingest_tables(tmp_path, batch_size, workers):
+    """Test des tables produites : colonnes aplaties, clés des répétitions, quel que soit le découpage en lots"""
+    data = io.StringIO("".join(json.dumps(record) + "\n" for record in RECORDS))
+    summary = ingest_stream(data, XLSFORM_DATA, str(tmp_path), fmt="ndjson", workers=workers, batch_size=batch_size)
+
+    assert summary["records"] == 3
+    assert {name: table["rows"] for name, table in summary["tables"].items()} == {"menage": 3, "menage/membres": 3, "menage/membres/visites": 3}
+    menage = _read(summary, "menage")
+    assert menage[0]["lieu/position/latitude"] == 48.8
+    assert menage[0]["lieu/couleurs"] == ["vert", "rouge"]
+    assert [row["_id"] for row in menage] == [1, 2, 3]
+    assert [row["consent"] for row in menage] == ["oui", "non", "oui"]
+    assert str(menage[0]["jour"]) == "2026-01-02" and menage[1]["jour"] is None
+    membres = _read(summary, "menage/membres")
+    assert [(row["_id"], row["_parent_id"], row["_index"], row["nom"]) for row in membres] == [(1, 1, 1, "Awa"), (2, 1, 2, "Kodjo"), (3, 3, 1, "Ama")]
+    visites = _read(summary, "menage/membres/visites")
+    assert [(row["_parent_id"], row["_index"]) for row in visites] == [(1, 1), (1, 2), (3, 1)]
+    assert visites[1]["quand"].isoformat() == "2026-01-03T09:00:00+00:00"
+
+
+def test_ingest_schema_and_arrow_format(tmp_path):
+    """Test des types : select_one encodé avec le dictionnaire de sa liste, format Arrow en flux"""
+    with ColumnarWriter(XLSFORM_DATA, str(tmp_path), format="arrow") as writer:
+        writer.write(RECORDS)
+    table = pa.ipc.open_stream(writer.paths["menage"]).read_all()
+
+    consent = table.column("consent").combine_chunks()
+    assert pa.types.is_dictionary(consent.type)
+    assert consent.dictionary.to_pylist() == ["oui", "non"]
+    assert table.schema.field("lieu/position/accuracy").type == pa.float64()
+    assert table.schema == writer.schemas["menage"]
+
+    with pytest.raises(ValueError, match="consent"):
+        with ColumnarWriter(XLSFORM_DATA, str(tmp_path / "ko")) as writer:
+            writer.write([{"consent": "peut-être"}])
+
+
+def test_ingest_cli(tmp_path, capsys):
+    """Test de la sous-commande ingest"""
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    survey = workbook.active
+    survey.title = "survey"
+    for row in [("type", "name", "label"), ("integer", "age", "Âge"), ("begin_repeat", "enfants", "Enfants"), ("text", "prenom", "Prénom"), ("end_repeat", None, None)]:
+        survey.append(row)
+    workbook.save(tmp_path / "form.xlsx")
+    (tmp_path / "export.json").write_text(json.dumps({"value": [{"age": 40, "enfants": [{"prenom": "Yao"}]}, {"age": 12}]}), encoding="utf-8")
+
+    ingest_main([str(tmp_path / "form.xlsx"), str(tmp_path / "export.json"), "-d", str(tmp_path / "tables")])
+
+    err = capsys.readouterr().err
+    assert "2 soumission(s) chargée(s)" in err
+    assert sorted(p.name for p in (tmp_path / "tables").iterdir()) == ["form.parquet", "form__enfants.parquet"]
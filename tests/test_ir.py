@@ -0,0 +1,95 @@
+"""
+Tests unitaires pour la représentation intermédiaire et ses émetteurs
+"""
+import sqlite3
+
+import pytest
+
+from xlsF2schema.core import generate_json_schema
+from xlsF2schema.ir import ChoiceList, build_ir, register_emitter
+
+XLSFORM_DATA = {
+    "name": "enquete",
+    "children": [
+        {"type": "select_one couleurs", "name": "couleur", "bind": {"required": "yes"}},
+        {"type": "select_multiple couleurs", "name": "autres"},
+        {"type": "integer", "name": "age", "bind": {"relevant": "${couleur} = 'rouge'", "constraint": ". >= 18"}},
+        {"type": "note", "name": "info"},
+        {
+            "type": "group",
+            "name": "lieu",
+            "children": [
+                {"type": "geopoint", "name": "position", "bind": {"required": "yes"}},
+                {"type": "date", "name": "jour"},
+            ]
+        },
+        {
+            "type": "repeat",
+            "name": "visites",
+            "children": [
+                {"type": "select_one couleurs", "name": "teinte", "bind": {"required": "yes"}},
+                {"type": "repeat", "name": "notes", "children": [{"type": "text", "name": "texte"}]},
+            ]
+        },
+    ],
+    "choices": {"couleurs": [{"name": "rouge"}, {"name": "vert"}], "autre_liste": [{"name": "rouge"}, {"name": "vert"}]}
+}
+
+
+@pytest.mark.parametrize("use_refs", [False, True])
+def test_ir_json_schema_matches_generate(use_refs):
+    """Test que l'émetteur JSON Schema reproduit generate_json_schema, y compris en émissions répétées"""
+    form = build_ir(XLSFORM_DATA)
+    expected = generate_json_schema(XLSFORM_DATA, use_refs=use_refs)
+
+    first = form.emit("json_schema", use_refs=use_refs)
+    assert first == expected
+    first["properties"]["value"]["items"]["properties"]["couleur"]["type"] = "integer"
+    assert form.emit("json_schema", use_refs=use_refs) == expected
+
+
+def test_ir_structure_and_interned_choices():
+    """Test de l'arbre, des types logiques et du partage des listes de choix"""
+    form = build_ir(XLSFORM_DATA)
+    fields = {"/".join(f.path): f for f in form.fields()}
+
+    assert [f.kind for f in fields.values()] == ["select_one", "select_multiple", "integer", "note", "geopoint", "date", "select_one", "string"]
+    assert fields["couleur"].required and not fields["age"].required and fields["lieu/position"].required
+    assert fields["couleur"].choices is fields["visites/teinte"].choices is build_ir(XLSFORM_DATA).fields()[0].choices
+    assert isinstance(fields["couleur"].choices, ChoiceList) and "vert" in fields["couleur"].choices
+    assert [(t.name, t.parent and t.parent.name) for t in form.tables()] == [
+        ("enquete", None), ("enquete/visites", "enquete"), ("enquete/visites/notes", "enquete/visites")
+    ]
+    assert [c for c, _ in form.tables()[0].columns] == ["couleur", "autres", "age", "lieu/position", "lieu/jour"]
+
+
+def test_ir_sql_ddl():
+    """Test des ordres CREATE TABLE : tables enfants, NOT NULL, contraintes CHECK"""
+    ddl = build_ir(XLSFORM_DATA).emit("sql", dialect="sqlite")
+    connection = sqlite3.connect(":memory:")
+    connection.executescript(ddl)
+
+    columns = {row[1]: row for row in connection.execute('PRAGMA table_info("enquete")')}
+    assert list(columns) == ["_id", "couleur", "autres", "age", "lieu__position__latitude", "lieu__position__longitude",
+                             "lieu__position__altitude", "lieu__position__accuracy", "lieu__jour"]
+    assert columns["couleur"][3] == 1 and columns["lieu__position__latitude"][3] == 0
+    assert [row[2] for row in connection.execute('PRAGMA foreign_key_list("enquete__visites__notes")')] == ["enquete__visites"]
+    with pytest.raises(sqlite3.IntegrityError):
+        connection.execute('INSERT INTO "enquete" ("_id", "couleur") VALUES (1, \'bleu\')')
+    with pytest.raises(ValueError):
+        build_ir(XLSFORM_DATA).emit("sql", dialect="oracle")
+
+
+def test_ir_pandas_dtypes_and_custom_emitter():
+    """Test des dtypes pandas et d'un émetteur personnalisé"""
+    form = build_ir(XLSFORM_DATA)
+    dtypes = form.emit("pandas")
+
+    assert dtypes["enquete"]["age"] == "Int64" and dtypes["enquete"]["lieu/position"] == "string"
+    assert list(dtypes["enquete"]["couleur"].categories) == ["rouge", "vert"]
+    assert list(dtypes["enquete/visites"])[:3] == ["_id", "_parent_id", "_index"]
+
+    register_emitter("columns", lambda form, separator="/": [c for t in form.tables(separator) for c, _ in t.columns], override=True)
+    assert form.emit("columns", separator=".")[-2:] == ["teinte", "texte"]
+    with pytest.raises(ValueError):
+        form.emit("inconnu")
@@ -0,0 +1,162 @@
+"""
+Tests unitaires pour les expressions XPath (relevant / constraint)
+"""
+import io
+import json
+
+import pytest
+from jsonschema import Draft7Validator
+
+from xlsF2schema.core import generate_json_schema
+from xlsF2schema.logic import LogicValidator, constraint_keywords
+from xlsF2schema.stream import validate_stream
+from xlsF2schema.xpath import XPathError, compile_expression
+
+XLSFORM_DATA = {
+    "children": [
+        {"type": "integer", "name": "age", "bind": {"required": "yes", "constraint": ". >= 0 and . < 120"}},
+        {"type": "select one", "name": "marie", "itemset": "oui_non", "bind": {"relevant": "${age} >= 18", "required": "yes"}},
+        {"type": "select all that apply", "name": "langues", "itemset": "langues"},
+        {"type": "text", "name": "autre", "bind": {"relevant": "selected(${langues}, 'autre')"}},
+        {
+            "type": "repeat", "name": "enfants",
+            "bind": {"relevant": "${marie} = 'oui'"},
+            "children": [
+                {"type": "integer", "name": "age_enfant", "bind": {"constraint": ". < ${age}"}},
+                {"type": "text", "name": "code", "bind": {"constraint": "regex(., '^[A-Z]{3}$')", "jr:constraintMsg": "Code invalide"}},
+            ],
+        },
+    ],
+    "choices": {
+        "oui_non": [{"name": "oui"}, {"name": "non"}],
+        "langues": [{"name": "fr"}, {"name": "autre"}],
+    },
+}
+
+
+@pytest.mark.parametrize("source, value, expected", [
+    (". >= 0 and . < 120", 30, True),
+    (". >= 0 and . < 120", 120, False),
+    (". = '5'", 5, True),
+    ("string-length(.) <= 3 or . = 'long'", "long", True),
+    ("if(. > 1, 'a', 'b') = 'a'", 2, True),
+    ("count-selected(.) = 2 and not(selected(., 'c'))", ["a", "b"], True),
+    ("-. + 6 div 4 mod 5 = 0.5", 1, True),
+    (". > '2024-01-31'", "2024-02-01", True),
+    ("(. + 1) and (. - 1)", 1, False),
+])
+def test_compile_expression(source, value, expected):
+    """Test de l'évaluation XPath sur la valeur courante"""
+    assert compile_expression(source).test(value) is expected
+    assert compile_expression(source) is compile_expression(source)
+
+
+@pytest.mark.parametrize("source", ["/data/age > 1", "position(..) = 1", "inconnue(.)", "regex(., '[')", ". >"])
+def test_compile_expression_unsupported(source):
+    """Test que les expressions hors du sous-ensemble sont refusées"""
+    with pytest.raises(XPathError):
+        compile_expression(source)
+
+
+def test_constraint_and_relevant_translation():
+    """Test des traductions en mots-clés JSON Schema et en if/then/else"""
+    assert constraint_keywords(". > 0 and . <= 10 and . <= 5", {"type": "integer"}) == {"exclusiveMinimum": 0, "maximum": 5}
+    assert constraint_keywords("regex(., 'a') and string-length(.) < 4", {"type": "string"}, required=True) == {"pattern": "a", "maxLength": 3}
+    assert constraint_keywords("regex(., 'a')", {"type": ["string", "null"]}) == {}
+
+    items = generate_json_schema(XLSFORM_DATA)["properties"]["value"]["items"]
+    assert items["properties"]["age"] == {"type": "integer", "minimum": 0, "exclusiveMaximum": 120}
+    assert items["required"] == ["age"]
+    assert items["allOf"][0] == {
+        "if": {"properties": {"age": {"type": "number", "minimum": 18}}, "required": ["age"]},
+        "then": {"required": ["marie"], "properties": {"marie": {"not": {"type": "null"}}}},
+        "else": {"properties": {"marie": {"enum": [None, "", [], {}]}}},
+    }
+    # Obligatoire sous condition : null est refusé par "then", pas par le schéma du champ
+    assert items["properties"]["marie"]["type"] == ["string", "null"]
+    # La condition d'affichage d'une répétition reste vérifiée par LogicValidator
+    assert len(items["allOf"]) == 2
+    validator = Draft7Validator(items)
+    assert validator.is_valid({"age": 40, "marie": "oui", "langues": ["autre"], "autre": "x"})
+    assert validator.is_valid({"age": 10})
+    assert not validator.is_valid({"age": 40})
+    assert not validator.is_valid({"age": 10, "marie": "non"})
+    assert not validator.is_valid({"age": 40, "marie": "oui", "langues": ["fr"], "autre": "x"})
+
+
+@pytest.mark.parametrize("record, valid", [
+    ({"age": 40, "marie": "non", "enfants": []}, True),
+    ({"age": 40, "marie": "non", "enfants": [{}]}, True),
+    ({"age": 10, "autre": ""}, True),
+    ({"age": 10, "autre": None}, True),
+    ({"age": 10, "langues": [], "autre": ""}, True),
+    ({"age": 40, "marie": None}, False),
+    ({"age": 10, "marie": "oui"}, False),
+    ({"age": 10, "autre": "x"}, False),
+])
+def test_relevant_translation_empty_values(record, valid):
+    """Test, sur le schéma complet, que les valeurs vides de LogicValidator sont acceptées pour un élément non affiché"""
+    schema = generate_json_schema(XLSFORM_DATA)
+    assert Draft7Validator(schema).is_valid({"value": [record]}) is valid
+    # Un élément non affiché mais vide n'est pas signalé non plus
+    if valid:
+        assert LogicValidator(XLSFORM_DATA, schema_checked=True).is_valid_record(record)
+
+
+def test_relevant_translation_hidden_required_with_pattern():
+    """Test qu'un champ obligatoire sous condition, non affiché, peut être vide malgré sa contrainte de chaîne"""
+    form = {"children": [
+        {"type": "text", "name": "a"},
+        {"type": "text", "name": "code", "bind": {
+            "required": "yes", "relevant": "${a} = 'x'", "constraint": "regex(., '^[A-Z]+$') and string-length(.) >= 2",
+        }},
+    ]}
+    validator = Draft7Validator(generate_json_schema(form))
+    assert validator.is_valid({"value": [{"a": "y", "code": ""}]})
+    assert validator.is_valid({"value": [{"a": "x", "code": "AB"}]})
+    assert not validator.is_valid({"value": [{"a": "x"}]})
+    # La contrainte n'étant plus traduite, LogicValidator la vérifie même avec schema_checked
+    checked = LogicValidator(form, schema_checked=True)
+    assert checked.is_valid_record({"a": "y", "code": ""})
+    assert [e["validator"] for e in checked.iter_record_errors({"a": "x", "code": "a1"})] == ["constraint"]
+
+
+def test_logic_validator_records():
+    """Test de la vérification des soumissions, y compris dans les répétitions"""
+    logic = LogicValidator(XLSFORM_DATA)
+    assert logic.skipped == []
+
+    record = {
+        "age": 30, "marie": "non",
+        "enfants": [{"age_enfant": 3, "code": "ABC"}, {"age_enfant": 31, "code": "abc"}],
+    }
+    errors = list(logic.iter_record_errors(record, 4))
+    assert [(e["path"], e["validator"]) for e in errors] == [(["value", 4, "enfants"], "relevant")]
+
+    record["marie"] = "oui"
+    errors = list(logic.iter_record_errors(record))
+    assert [(e["path"], e["validator"], e["message"]) for e in errors] == [
+        (["enfants", 1, "age_enfant"], "constraint", "31 ne respecte pas la contrainte . < ${age}"),
+        (["enfants", 1, "code"], "constraint", "Code invalide"),
+    ]
+    assert logic.is_valid_record({"age": 10, "enfants": [{"age_enfant": None}]})
+
+    # Les expressions déjà traduites dans le schéma ne sont pas signalées deux fois
+    record = {"age": 150, "enfants": [{"age_enfant": 160}]}
+    assert [e["path"] for e in logic.iter_record_errors(record)] == [["age"], ["enfants"]]
+    checked = LogicValidator(XLSFORM_DATA, schema_checked=True)
+    assert [e["path"] for e in checked.iter_record_errors(record)] == [["enfants"]]
+    record["marie"] = "oui"
+    assert [e["path"] for e in checked.iter_record_errors(record)] == [["enfants", 0, "age_enfant"]]
+
+
+def test_validate_stream_checks_logic():
+    """Test que la validation en streaming rapporte aussi les erreurs de logique"""
+    records = [{"age": 30, "marie": "oui", "enfants": [{"age_enfant": 40}]}, {"age": 30, "marie": "oui"}]
+    out = io.StringIO()
+    summary = validate_stream(io.StringIO(json.dumps(records)), generate_json_schema(XLSFORM_DATA), out, survey=XLSFORM_DATA)
+
+    errors = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert summary == {"records": 2, "invalid": 1, "errors": 1}
+    assert errors[0]["validator"] == "constraint"
+    assert errors[0]["path"] == ["value", 0, "enfants", 0, "age_enfant"]
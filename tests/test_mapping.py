@@ -0,0 +1,50 @@
+"""
+Tests unitaires pour le registre de types XLSForm
+"""
+import pytest
+from xlsF2schema.mapping import (
+    get_comprehensive_mapping,
+    parse_type,
+    register_type,
+    unregister_type,
+)
+
+
+def test_parse_type_pyxform_spellings():
+    """Test que les orthographes pyxform des sélections sont normalisées"""
+    assert parse_type("select_one list_A") == ("select_one", "list_A")
+    assert parse_type("select one") == ("select_one", "")
+    assert parse_type("select all that apply") == ("select_multiple", "")
+    assert parse_type("dateTime") == ("datetime", "")
+
+
+def test_mapping_returns_independent_copies():
+    """Test que les gabarits figés ne sont jamais partagés entre deux champs"""
+    first = get_comprehensive_mapping({"type": "geopoint"}, {})
+    first["properties"]["latitude"]["minimum"] = 0
+    first["type"] = ["object", "null"]
+
+    second = get_comprehensive_mapping({"type": "geopoint"}, {})
+    assert second["type"] == "object"
+    assert second["properties"]["latitude"]["minimum"] == -90
+
+
+def test_mapping_select_uses_itemset():
+    """Test qu'un 'select one' pyxform récupère sa liste via 'itemset'"""
+    choices = {"genres": [{"name": "homme"}, {"name": "femme"}]}
+    schema = get_comprehensive_mapping({"type": "select one", "itemset": "genres"}, choices)
+    assert schema == {"type": "string", "enum": ["homme", "femme"]}
+
+
+def test_register_custom_type():
+    """Test de l'enregistrement et du remplacement d'un type personnalisé"""
+    register_type("email", {"type": "string", "format": "email"})
+    try:
+        assert get_comprehensive_mapping({"type": "email"}, {}) == {"type": "string", "format": "email"}
+        with pytest.raises(ValueError):
+            register_type("email", {"type": "string"})
+        register_type("email", {"type": "string", "pattern": "@"}, override=True)
+        assert get_comprehensive_mapping({"type": "email"}, {})["pattern"] == "@"
+    finally:
+        unregister_type("email")
+    assert get_comprehensive_mapping({"type": "email"}, {}) == {"type": "string"}
@@ -0,0 +1,70 @@
+"""
+Tests unitaires pour l'écriture des schémas JSON
+"""
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from xlsF2schema.cli import convert_file, main
+from xlsF2schema.output import canonical_json, dumps_json, iter_json, schema_digest, write_json
+
+SAMPLES_DIR = Path(__file__).parent / "samples"
+
+DOCUMENTS = [
+    {},
+    [],
+    {"a": [], "b": {}, "c": [[]]},
+    [1, [2, [3, {}]], {"b": [None, True, 1.5, "é\n "]}],
+    {"z": 1, "a": {"d": [{"x": 1}], "c": " "}, 1: "clé numérique"},
+]
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+@pytest.mark.parametrize("indent", [None, 2, 4])
+def test_streaming_matches_json_dumps(document, indent):
+    """Test que l'écriture en flux produit exactement la sortie de json.dumps"""
+    separators = (",", ":") if indent is None else None
+    expected = json.dumps(document, indent=indent, ensure_ascii=False, separators=separators)
+    assert "".join(iter_json(document, indent=indent)) == expected
+    assert dumps_json(document, indent=indent, backend="json") == expected
+
+    out = io.BytesIO()
+    assert write_json(document, out, indent=indent, backend="json") == len(expected.encode("utf-8"))
+    assert out.getvalue().decode("utf-8") == expected
+
+
+def test_canonical_output_is_stable():
+    """Test que la forme canonique ne dépend pas de l'ordre d'insertion des clés"""
+    schema = convert_file(str(SAMPLES_DIR / "test_odk.xlsx"))
+    reordered = json.loads(json.dumps(schema, sort_keys=True))
+    assert list(reordered) != list(schema)
+    assert canonical_json(reordered) == canonical_json(schema)
+    assert schema_digest(reordered) == schema_digest(schema)
+    assert json.loads(canonical_json(schema)) == schema
+
+
+def test_orjson_backend():
+    """Test que le backend orjson produit le même document que l'encodeur standard"""
+    pytest.importorskip("orjson")
+    schema = convert_file(str(SAMPLES_DIR / "test_odk.xlsx"))
+    assert json.loads(dumps_json(schema, indent=None, backend="orjson")) == schema
+    assert dumps_json(schema, indent=2, sort_keys=True, backend="orjson") == json.dumps(schema, indent=2, sort_keys=True, ensure_ascii=False)
+    with pytest.raises(ValueError):
+        dumps_json(schema, indent=4, backend="orjson")
+
+
+def test_cli_output_modes(tmp_path):
+    """Test que la CLI écrit le schéma indenté par défaut, compact ou canonique sur option"""
+    source = str(SAMPLES_DIR / "test_odk.xlsx")
+    schema = convert_file(source)
+
+    main([source, "-o", str(tmp_path / "indente.json")])
+    assert (tmp_path / "indente.json").read_text(encoding="utf-8") == json.dumps(schema, indent=4, ensure_ascii=False)
+
+    main([source, "-o", str(tmp_path / "compact.json"), "--compact"])
+    assert "\n" not in (tmp_path / "compact.json").read_text(encoding="utf-8")
+
+    main([source, "-o", str(tmp_path / "canonique.json"), "--canonical"])
+    assert (tmp_path / "canonique.json").read_bytes() == canonical_json(schema)
@@ -0,0 +1,52 @@
+"""
+Tests unitaires pour l'instrumentation des étapes de conversion
+"""
+import json
+from pathlib import Path
+
+from xlsF2schema import profiling
+from xlsF2schema.cli import convert_file, main
+from xlsF2schema.profiling import Profiler
+
+SAMPLES_DIR = Path(__file__).parent / "samples"
+
+
+def test_profiler_reports_conversion_stages():
+    """Test que chaque étape est rapportée avec sa durée, ses compteurs et son pic d'allocation"""
+    with Profiler(trace_memory=True) as profiler:
+        schema = convert_file(str(SAMPLES_DIR / "test_odk.xlsx"))
+    assert schema == convert_file(str(SAMPLES_DIR / "test_odk.xlsx"))
+    assert not profiling.active()
+
+    stages = {event["stage"]: event for event in profiler.report()["stages"]}
+    for name in ["create_survey_from_path", "to_json_dict", "generate_json_schema", "process_items", "get_comprehensive_mapping"]:
+        assert stages[name]["seconds"] >= 0
+    assert stages["process_items"]["parent"] == "generate_json_schema"
+    assert stages["generate_json_schema"]["fields"] == stages["get_comprehensive_mapping"]["calls"]
+    assert stages["generate_json_schema"]["choice_lists"] >= 1
+    assert stages["convert_file"]["peak_kb"] >= stages["process_items"]["peak_kb"]
+    assert profiler.report()["peak_kb"] > 0
+
+
+def test_profiler_without_reset_peak(monkeypatch):
+    """Test du repli sans tracemalloc.reset_peak (Python 3.8) : accroissement de la mémoire par étape"""
+    monkeypatch.setattr(profiling, "_reset_peak", None)
+    with Profiler(trace_memory=True) as profiler:
+        convert_file(str(SAMPLES_DIR / "test_odk.xlsx"))
+
+    stages = {event["stage"]: event for event in profiler.report()["stages"]}
+    assert stages["process_items"]["peak_kb"] >= 0
+    assert stages["convert_file"]["peak_kb"] >= stages["process_items"]["peak_kb"]
+
+
+def test_profile_cli_option(tmp_path):
+    """Test que --profile écrit les statistiques et --cprofile un profil lisible par pstats"""
+    import pstats
+
+    stats, prof = tmp_path / "stats.json", tmp_path / "conversion.prof"
+    main([str(SAMPLES_DIR / "test_odk.xlsx"), "-o", str(tmp_path / "schema.json"), "--profile", str(stats), "--cprofile", str(prof)])
+
+    report = json.loads(stats.read_text(encoding="utf-8"))
+    assert report["stages"][-1]["stage"] == "serialize"
+    assert report["stages"][-1]["bytes"] == (tmp_path / "schema.json").stat().st_size
+    assert pstats.Stats(str(prof)).total_calls > 0
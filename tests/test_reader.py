@@ -0,0 +1,66 @@
+"""
+Tests unitaires pour le chargeur XLSForm natif (sans pyxform)
+"""
+from pathlib import Path
+
+import pytest
+from openpyxl import Workbook
+
+from xlsF2schema.cli import xlsform_to_dict
+from xlsF2schema.core import generate_json_schema
+from xlsF2schema.reader import read_xlsform
+
+SAMPLES_DIR = Path(__file__).parent / "samples"
+
+
+@pytest.mark.parametrize("sample", ["test_odk.xlsx", "PUBLISHED.xlsx", "Household.xlsx"])
+def test_native_loader_matches_pyxform(sample):
+    """Test que les deux chargeurs produisent le même schéma"""
+    path = str(SAMPLES_DIR / sample)
+    expected = generate_json_schema(xlsform_to_dict(path))
+    assert generate_json_schema(xlsform_to_dict(path, loader="native")) == expected
+
+
+def _write_form(path, survey_rows, choices_rows=()):
+    workbook = Workbook()
+    survey = workbook.active
+    survey.title = "survey"
+    for row in survey_rows:
+        survey.append(row)
+    choices = workbook.create_sheet("choices")
+    for row in choices_rows:
+        choices.append(row)
+    workbook.save(path)
+
+
+def test_native_loader_nesting(tmp_path):
+    """Test de la résolution des begin/end group et repeat en enfants imbriqués"""
+    path = tmp_path / "form.xlsx"
+    _write_form(path, [
+        ("type", "name", "required"),
+        ("begin group", "g", None),
+        ("begin_repeat", "r", None),
+        ("select_one couleurs", "couleur", "yes"),
+        ("end_repeat", None, None),
+        ("end group", None, None),
+    ], [
+        ("list_name", "name", "label"),
+        ("couleurs", "rouge", "Rouge"),
+        ("couleurs", 1, "Un"),
+    ])
+
+    data = read_xlsform(str(path))
+    group = data["children"][0]
+    assert group["type"] == "group"
+    repeat = group["children"][0]
+    assert repeat["type"] == "repeat"
+    assert repeat["children"] == [{"name": "couleur", "type": "select_one couleurs", "bind": {"required": "yes"}}]
+    assert data["choices"]["couleurs"] == [{"name": "rouge", "label": "Rouge"}, {"name": "1", "label": "Un"}]
+
+
+def test_native_loader_unbalanced_sections(tmp_path):
+    """Test qu'une section mal fermée est signalée"""
+    path = tmp_path / "form.xlsx"
+    _write_form(path, [("type", "name"), ("begin group", "g"), ("end repeat", None)])
+    with pytest.raises(ValueError):
+        read_xlsform(str(path))
@@ -0,0 +1,87 @@
+"""
+Tests unitaires pour le registre de validateurs multi-versions
+"""
+import json
+
+import pytest
+from openpyxl import Workbook
+
+from xlsF2schema.cli import validate_main
+from xlsF2schema.registry import ValidatorRegistry, read_form_key
+
+
+def _write_form(path, version, age_type):
+    workbook = Workbook()
+    survey = workbook.active
+    survey.title = "survey"
+    for row in [("type", "name", "label", "required"), (age_type, "age", "Âge", "yes")]:
+        survey.append(row)
+    settings = workbook.create_sheet("settings")
+    settings.append(("form_id", "version"))
+    settings.append(("enquete", version))
+    workbook.save(path)
+
+
+@pytest.fixture
+def forms(tmp_path):
+    directory = tmp_path / "formulaires"
+    directory.mkdir()
+    _write_form(directory / "v1.xlsx", "1", "integer")
+    _write_form(directory / "v2.xlsx", "2", "text")
+    return directory
+
+
+def test_registry_routing_and_counters(forms):
+    """Test du routage par version, de la construction paresseuse et des compteurs"""
+    registry = ValidatorRegistry(loader="native")
+    keys, failures = registry.warm(str(forms), build=False)
+
+    assert sorted(keys) == [("enquete", "1"), ("enquete", "2")] and not failures
+    assert read_form_key(str(forms / "v2.xlsx")) == ("enquete", "2")
+    assert registry.stats()["loaded"] == 0
+
+    record = {"_xform_id_string": "enquete", "age": "douze"}
+    assert not registry.is_valid_record({**record, "__version__": "1"})
+    assert registry.is_valid_record({**record, "__version__": "2"})
+    assert registry.is_valid_record({**record, "__version__": "2"})
+    stats = registry.stats()
+    assert (stats["builds"], stats["misses"], stats["hits"], stats["evictions"]) == (2, 2, 1, 0)
+
+    errors = list(registry.iter_record_errors({**record, "__version__": "3"}, index=7))
+    assert [(e["index"], e["validator"]) for e in errors] == [(7, "version")]
+
+
+def test_registry_eviction(forms):
+    """Test de l'éviction LRU sous la borne mémoire et de la reconstruction"""
+    registry = ValidatorRegistry(max_bytes=1, loader="native", default_form_id="enquete")
+    registry.warm(str(forms))
+    registry.add({"id_string": "autre", "children": [{"type": "integer", "name": "n"}]})
+
+    assert registry.stats()["loaded"] == 1
+    registry.get("enquete", "1")
+    registry.get("enquete", "2")
+    registry.get("autre")
+    stats = registry.stats()
+    assert stats["loaded"] == 1 and stats["evictions"] == stats["builds"] - 1
+    assert not registry.is_valid_record({"n": "x", "_xform_id_string": "autre"})
+    # Sans __version__, deux versions possibles : pas de routage implicite
+    with pytest.raises(KeyError):
+        registry.route({})
+
+
+def test_validate_cli_form_directory(forms, tmp_path, capsys):
+    """Test de la sous-commande validate avec un répertoire de formulaires"""
+    data = tmp_path / "export.ndjson"
+    data.write_text("\n".join(json.dumps(r) for r in [
+        {"_xform_id_string": "enquete", "__version__": "1", "age": 3},
+        {"_xform_id_string": "enquete", "__version__": "1", "age": "trois"},
+        {"_xform_id_string": "enquete", "__version__": "2", "age": "trois"},
+    ]), encoding="utf-8")
+
+    with pytest.raises(SystemExit) as exc:
+        validate_main([str(forms), str(data), "--loader", "native", "-o", str(tmp_path / "erreurs.jsonl")])
+
+    assert exc.value.code == 1
+    errors = [json.loads(line) for line in (tmp_path / "erreurs.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [(e["index"], e["validator"]) for e in errors] == [(1, "type")]
+    assert "3 soumission(s), 1 invalide(s)" in capsys.readouterr().err
@@ -0,0 +1,101 @@
+"""
+Tests unitaires pour le service HTTP de conversion et de validation
+"""
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from xlsF2schema.cli import convert_file
+from xlsF2schema.server import FormService, start_server
+
+SAMPLES_DIR = Path(__file__).parent / "samples"
+
+
+@pytest.fixture
+def service():
+    service = FormService(workers=1, max_queue=1, cache_size=2)
+    yield service
+    service.close()
+
+
+async def _http(port, method, target, body=b""):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"{method} {target} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), json.loads(payload)
+
+
+def test_upload_and_validate_over_http(service):
+    """Test du parcours complet : téléversement, lecture du schéma, validation et métriques"""
+    path = SAMPLES_DIR / "test_odk.xlsx"
+
+    async def scenario():
+        server = await start_server(service, port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            status, created = await _http(port, "POST", "/forms?filename=test_odk.xlsx", path.read_bytes())
+            assert status == 201
+            form_id = created["form_id"]
+            assert created["schema"] == convert_file(str(path))
+
+            status, schema = await _http(port, "GET", f"/forms/{form_id}")
+            assert (status, schema) == (200, created["schema"])
+
+            body = json.dumps({"value": [{}, {"__version__": 1}]}).encode()
+            status, report = await _http(port, "POST", f"/forms/{form_id}/validate", body)
+            assert status == 200
+            assert report["records"] == 2
+            assert report["invalid"] == len({e["index"] for e in report["errors"]})
+            assert all(e["index"] in (0, 1) for e in report["errors"])
+
+            assert (await _http(port, "POST", "/forms/inconnu/validate", b"[]"))[0] == 404
+            status, metrics = await _http(port, "GET", "/metrics")
+            assert metrics["routes"]["/forms"]["count"] == 1
+            assert metrics["routes"]["/forms/{id}/validate"]["errors"] == 1
+            assert metrics["queue"]["running"] == 0
+            return metrics
+
+    metrics = asyncio.run(scenario())
+    assert metrics["forms"]["size"] == 1
+
+
+def test_convert_reuses_lru_and_rejects_bad_upload(service):
+    """Test que les téléversements identiques partagent une conversion et que l'erreur est un 400"""
+    data = (SAMPLES_DIR / "test_odk.xlsx").read_bytes()
+
+    async def scenario():
+        first, second = await asyncio.gather(service.convert(data), service.convert(data))
+        assert first[0] == second[0]
+        assert (await service.convert(data, use_refs=True))[0] == first[0] + "-refs"
+        with pytest.raises(Exception) as excinfo:
+            await service.convert(b"pas un classeur")
+        return excinfo.value.status
+
+    assert asyncio.run(scenario()) == 400
+    assert service.store.hits == 0
+    assert service.store.stats()["size"] == 2
+
+
+def test_convert_cancelled_does_not_block_waiters(service):
+    """Test qu'une conversion annulée libère les requêtes qui l'attendaient (503)"""
+    data = (SAMPLES_DIR / "Household.xlsx").read_bytes()
+
+    async def scenario():
+        first = asyncio.ensure_future(service.convert(data))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(service.convert(data))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(Exception) as excinfo:
+            await asyncio.wait_for(second, timeout=5)
+        return excinfo.value.status
+
+    assert asyncio.run(scenario()) == 503
+    assert not service._inflight
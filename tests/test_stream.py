@@ -0,0 +1,77 @@
+"""
+Tests unitaires pour la validation en streaming
+"""
+import io
+import json
+
+import pytest
+
+from xlsF2schema.core import generate_json_schema
+from xlsF2schema.stream import iter_records, validate_stream
+
+XLSFORM_DATA = {
+    "children": [
+        {"type": "select_one couleurs", "name": "couleur", "bind": {"required": "yes"}},
+        {"type": "integer", "name": "age"},
+    ],
+    "choices": {"couleurs": [{"name": "rouge"}, {"name": "vert"}]}
+}
+
+
+def test_iter_records_small_chunks():
+    """Test du découpage incrémental avec des blocs plus petits que les soumissions"""
+    records = [{"couleur": "rouge", "note": "a ] b }", "age": 12345}, {"couleur": "vert"}]
+    document = json.dumps({"@odata.context": {"x": [1, "value"]}, "value": records, "fin": 1}, indent=2)
+
+    assert list(iter_records(io.StringIO(document), chunk_size=3)) == records
+    assert list(iter_records(io.StringIO(json.dumps(records)), chunk_size=5)) == records
+    ndjson = "\n".join(json.dumps(r) for r in records) + "\n\n"
+    assert list(iter_records(io.StringIO(ndjson), fmt="ndjson")) == records
+
+
+def test_iter_records_malformed_record_stops_reading():
+    """Test qu'une soumission mal formée est signalée sans lire le reste du flux"""
+    records = [{"couleur": "rouge"}, {"couleur": "vert", "age": 1}] * 2000
+    document = '{"value": [{"couleur": "rouge"}, {"couleur": vert}, ' + json.dumps(records)[1:] + "}"
+    fp = io.StringIO(document)
+
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_records(fp, chunk_size=64))
+    assert fp.tell() < 1024 < len(document)
+
+
+def test_iter_records_large_record_reads():
+    """Test qu'une soumission bien plus grande que les blocs n'est pas redécodée à chaque bloc"""
+    record = {"couleur": "rouge", "notes": ["x" * 100] * 10000, "fin": "a" * 100000}
+
+    class CountingIO(io.StringIO):
+        reads = 0
+
+        def read(self, size=-1):
+            self.reads += 1
+            return super().read(size)
+
+    fp = CountingIO(json.dumps({"value": [record, {"couleur": "vert"}]}))
+    assert list(iter_records(fp, chunk_size=64)) == [record, {"couleur": "vert"}]
+    assert fp.reads < 40
+
+
+def test_iter_records_missing_key():
+    """Test qu'un document sans tableau 'value' est signalé"""
+    with pytest.raises(ValueError):
+        list(iter_records(io.StringIO('{"autre": []}')))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_validate_stream_writes_json_lines(workers):
+    """Test que les erreurs sont écrites par soumission, dans l'ordre"""
+    schema = generate_json_schema(XLSFORM_DATA)
+    records = [{"couleur": "rouge"}, {"couleur": "bleu"}, {"age": "x", "couleur": "vert"}, {}]
+    out = io.StringIO()
+
+    summary = validate_stream(io.StringIO(json.dumps({"value": records})), schema, out, workers=workers, batch_size=1)
+
+    assert summary == {"records": 4, "invalid": 3, "errors": 3}
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [(line["index"], line["validator"]) for line in lines] == [(1, "enum"), (2, "type"), (3, "required")]
+    assert lines[0]["path"] == ["value", 1, "couleur"]
@@ -0,0 +1,136 @@
+"""
+Tests unitaires pour le générateur de soumissions synthétiques
+"""
+import io
+import json
+
+import pandas as pd
+import pytest
+from jsonschema import Draft7Validator
+from openpyxl import Workbook
+
+from xlsF2schema.cli import generate_main
+from xlsF2schema.core import generate_json_schema
+from xlsF2schema.logic import LogicValidator
+from xlsF2schema.synthetic import SubmissionGenerator
+from xlsF2schema.tabular import TabularValidator
+from xlsF2schema.validator import compile_schema
+
+XLSFORM_DATA = {
+    "children": [
+        {"type": "select_one oui_non", "name": "consent", "bind": {"required": "yes"}},
+        {"type": "integer", "name": "age", "bind": {"constraint": ". >= 18 and . <= 99"}},
+        {"type": "text", "name": "nom", "bind": {"relevant": "${consent} = 'oui'", "required": "yes"}},
+        {"type": "select_multiple couleurs", "name": "couleurs"},
+        {
+            "type": "group",
+            "name": "lieu",
+            "children": [
+                {"type": "geopoint", "name": "position"},
+                {"type": "date", "name": "jour", "bind": {"required": "yes"}},
+                {"type": "geotrace", "name": "trace"},
+            ]
+        },
+        {
+            "type": "repeat",
+            "name": "membres",
+            "children": [
+                {"type": "decimal", "name": "taille", "bind": {"constraint": ". > 0.5"}},
+                {"type": "dateTime", "name": "vu"},
+            ]
+        },
+    ],
+    "choices": {
+        "oui_non": [{"name": "oui"}, {"name": "non"}],
+        "couleurs": [{"name": "rouge"}, {"name": "vert"}, {"name": "bleu"}],
+    }
+}
+
+
+def test_generated_records_are_valid():
+    """Test que les soumissions générées sont valides pour le schéma généré (avec et sans $ref)"""
+    records = SubmissionGenerator(XLSFORM_DATA, seed=1).batch(500)
+
+    for use_refs in (False, True):
+        schema = generate_json_schema(XLSFORM_DATA, use_refs=use_refs)
+        assert compile_schema(schema).is_valid({"value": records})
+        assert Draft7Validator(schema).is_valid({"value": records})
+    # Condition d'affichage : "nom" n'est renseigné que si consent = oui, null sinon
+    assert all((r["nom"] is not None) == (r["consent"] == "oui") for r in records)
+    assert all(18 <= r["age"] <= 99 for r in records if r.get("age") is not None)
+    assert {len(r["membres"]) for r in records} == {0, 1, 2, 3}
+
+
+def test_generated_text_follows_pattern_and_length():
+    """Test des textes construits d'après pattern et longueurs quand aucun mot prédéfini ne convient"""
+    form = {"children": [
+        {"type": "text", "name": "telephone", "bind": {"required": "yes", "constraint": "regex(., '^[0-9]{8}$')"}},
+        {"type": "text", "name": "code", "bind": {"required": "yes", "constraint": "regex(., '^(TG|BJ)-[A-Z]{2}\\d+$')"}},
+        {"type": "text", "name": "description", "bind": {"required": "yes", "constraint": "string-length(.) >= 50"}},
+    ]}
+    records = SubmissionGenerator(form, seed=1).batch(200)
+
+    assert Draft7Validator(generate_json_schema(form)).is_valid({"value": records})
+    assert len({r["telephone"] for r in records}) > 10
+    with pytest.raises(ValueError, match="secret"):
+        SubmissionGenerator({"children": [{"type": "text", "name": "secret", "bind": {"required": "yes", "constraint": "regex(., '^(a)\\1$')"}}]})
+
+
+def test_generated_text_follows_untranslated_constraint():
+    """Test que les textes respectent aussi la contrainte d'un champ facultatif, vérifiée par LogicValidator"""
+    form = {"children": [
+        {"type": "text", "name": "autre", "bind": {"constraint": "regex(., '^[^\",;/:$]+$')"}},
+        {"type": "text", "name": "initiales", "bind": {"constraint": "regex(., '^[A-Z]{2}$') and . != 'ZZ'"}},
+    ]}
+    records = SubmissionGenerator(form, seed=1, null_rate=0).batch(300)
+
+    logic = LogicValidator(form)
+    assert all(logic.is_valid_record(record) for record in records)
+    assert "N/A" not in {r["autre"] for r in records}
+    assert all(len(r["initiales"]) == 2 for r in records)
+
+
+def test_generator_seed():
+    """Test de la reproductibilité : même graine, mêmes soumissions (fichier binaire ou texte)"""
+    first = io.BytesIO()
+    SubmissionGenerator(XLSFORM_DATA, seed=7).write_ndjson(first, 50, batch_size=50)
+    second = io.BytesIO()
+    SubmissionGenerator(XLSFORM_DATA, seed=7).write_ndjson(second, 50, batch_size=50)
+
+    assert first.getvalue() == second.getvalue()
+    assert len(first.getvalue().splitlines()) == 50
+    assert SubmissionGenerator(XLSFORM_DATA, seed=7).batch(50) != SubmissionGenerator(XLSFORM_DATA, seed=8).batch(50)
+    text = io.StringIO()
+    assert SubmissionGenerator(XLSFORM_DATA, seed=7).write_ndjson(text, 50) == 50
+    assert [json.loads(line) for line in text.getvalue().splitlines()] == [json.loads(line) for line in first.getvalue().splitlines()]
+
+
+def test_generated_csv_is_valid():
+    """Test que l'export à plat généré passe la validation tabulaire"""
+    generator = SubmissionGenerator(XLSFORM_DATA, seed=3)
+    out = io.StringIO(newline="")
+    generator.write_csv(out, 300, batch_size=100)
+
+    frame = pd.read_csv(io.StringIO(out.getvalue()), dtype=str, keep_default_na=False)
+    assert list(frame.columns) == generator.csv_columns() == ["consent", "age", "nom", "couleurs", "lieu/position", "lieu/jour", "lieu/trace"]
+    assert len(frame) == 300
+    assert TabularValidator(XLSFORM_DATA).validate(frame).empty
+
+
+def test_generate_cli(tmp_path, capsys):
+    """Test de la sous-commande generate"""
+    workbook = Workbook()
+    survey = workbook.active
+    survey.title = "survey"
+    for row in [("type", "name", "label", "required"), ("integer", "age", "Âge", "yes"), ("geopoint", "gps", "GPS", None)]:
+        survey.append(row)
+    workbook.save(tmp_path / "form.xlsx")
+
+    generate_main([str(tmp_path / "form.xlsx"), "-n", "25", "--seed", "1", "-o", str(tmp_path / "data.ndjson")])
+
+    records = [json.loads(line) for line in (tmp_path / "data.ndjson").read_text(encoding="utf-8").splitlines()]
+    assert len(records) == 25 and all(isinstance(r["age"], int) for r in records)
+    assert "25 soumission(s) générée(s)" in capsys.readouterr().err
+
+    with pytest.raises(SystemExit):
+        generate_main([str(tmp_path / "absent.xlsx")])
@@ -0,0 +1,113 @@
+"""
+Tests unitaires pour la validation vectorisée d'exports à plat
+"""
+import json
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from xlsF2schema.cli import validate_main
+from xlsF2schema.tabular import VIOLATION_COLUMNS, TabularValidator, tabular_fields
+from xlsF2schema.validator import compile_validator
+
+XLSFORM_DATA = {
+    "children": [
+        {"type": "select_one couleurs", "name": "couleur", "bind": {"required": "yes"}},
+        {"type": "select_multiple couleurs", "name": "autres"},
+        {"type": "integer", "name": "age"},
+        {
+            "type": "group",
+            "name": "lieu",
+            "children": [
+                {"type": "geopoint", "name": "position"},
+                {"type": "date", "name": "jour", "bind": {"required": "yes"}},
+            ]
+        },
+        {"type": "repeat", "name": "visites", "children": [{"type": "text", "name": "note"}]},
+    ],
+    "choices": {"couleurs": [{"name": "rouge"}, {"name": "vert"}]}
+}
+
+FRAME = pd.DataFrame({
+    "couleur": ["rouge", "bleu", None, "vert"],
+    "autres": ["vert rouge", "vert vert", "jaune", ""],
+    "age": ["12", "2.5", "x", " 40 "],
+    "lieu/position": ["48.8 2.3 35 5", "120 2", "48.8", None],
+    "lieu/jour": ["2026-01-01", "2026-13-01", "2026-02-03", "2026-02-03"],
+    "_uuid": ["a", "b", "c", "d"],
+}, index=[10, 11, 11, 12])
+
+
+def test_tabular_fields():
+    """Test des colonnes attendues : chemins des groupes, répétitions exclues"""
+    fields = tabular_fields(XLSFORM_DATA)
+
+    assert [f.column for f in fields] == ["couleur", "autres", "age", "lieu/position", "lieu/jour"]
+    assert [f.required for f in fields] == [True, False, False, False, True]
+    assert [f.column for f in tabular_fields(XLSFORM_DATA, separator="-")][3] == "lieu-position"
+
+
+def test_tabular_violations():
+    """Test des violations par ligne : étiquettes d'index (même dupliquées), ordre du formulaire"""
+    violations = TabularValidator(XLSFORM_DATA).validate(FRAME)
+
+    assert list(violations.columns) == VIOLATION_COLUMNS
+    assert [tuple(row) for row in violations[["index", "column", "validator", "value"]].itertuples(index=False)] == [
+        (11, "couleur", "enum", "bleu"),
+        (11, "autres", "uniqueItems", "vert vert"),
+        (11, "age", "type", "2.5"),
+        (11, "lieu/position", "geopoint", "120 2"),
+        (11, "lieu/jour", "format", "2026-13-01"),
+        (11, "couleur", "required", None),
+        (11, "autres", "enum", "jaune"),
+        (11, "age", "type", "x"),
+        (11, "lieu/position", "geopoint", "48.8"),
+    ]
+    assert TabularValidator(XLSFORM_DATA).is_valid(FRAME.iloc[[0, 3]])
+
+
+def test_tabular_missing_required_column():
+    """Test qu'une colonne absente n'est signalée que pour un champ obligatoire"""
+    violations = TabularValidator(XLSFORM_DATA).validate(FRAME[["couleur", "lieu/position"]].iloc[[0]])
+
+    assert violations[["column", "validator"]].values.tolist() == [["lieu/jour", "required"]]
+
+
+def test_tabular_matches_compiled_validator():
+    """Test que les lignes invalides sont celles rejetées par le validateur compilé"""
+    form = {"children": XLSFORM_DATA["children"][:3], "choices": XLSFORM_DATA["choices"]}
+    frame = FRAME[["couleur", "autres", "age"]].reset_index(drop=True)
+    records = []
+    for row in frame.to_dict("records"):
+        record = {"couleur": row["couleur"], "age": None}
+        if row["autres"]:
+            record["autres"] = row["autres"].split()
+        if row["age"].strip().lstrip("-").isdigit():
+            record["age"] = int(row["age"])
+        elif row["age"].strip():
+            record["age"] = row["age"]
+        records.append(record)
+
+    compiled = compile_validator(form)
+    expected = {i for i, record in enumerate(records) if not compiled.is_valid_record(record)}
+    assert set(TabularValidator(form).validate(frame)["index"]) == expected
+
+
+def test_validate_cli_table(tmp_path, capsys):
+    """Test de la sous-commande validate sur un export CSV"""
+    workbook = Workbook()
+    survey = workbook.active
+    survey.title = "survey"
+    for row in [("type", "name", "label", "required"), ("integer", "age", "Âge", "yes"), ("geopoint", "gps", "GPS", None)]:
+        survey.append(row)
+    workbook.save(tmp_path / "form.xlsx")
+    (tmp_path / "export.csv").write_text("age,gps,_id\n12,1 2 0 0,1\nx,91 0,2\n,,3\n", encoding="utf-8")
+
+    with pytest.raises(SystemExit) as exc:
+        validate_main([str(tmp_path / "form.xlsx"), str(tmp_path / "export.csv"), "-o", str(tmp_path / "erreurs.jsonl")])
+
+    assert exc.value.code == 1
+    errors = [json.loads(line) for line in (tmp_path / "erreurs.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [(e["index"], e["column"], e["validator"]) for e in errors] == [(1, "age", "type"), (1, "gps", "geopoint"), (2, "age", "required")]
+    assert "3 soumission(s), 2 invalide(s), 3 erreur(s)" in capsys.readouterr().err
@@ -0,0 +1,71 @@
+"""
+Tests unitaires pour le validateur compilé
+"""
+import pytest
+from jsonschema import Draft7Validator, ValidationError
+
+from xlsF2schema.validator import compile_schema, compile_validator
+
+XLSFORM_DATA = {
+    "children": [
+        {"type": "select_one couleurs", "name": "couleur", "bind": {"required": "yes"}},
+        {"type": "select_multiple couleurs", "name": "autres"},
+        {"type": "integer", "name": "age"},
+        {
+            "type": "repeat",
+            "name": "visites",
+            "children": [
+                {"type": "geopoint", "name": "position"},
+                {"type": "date", "name": "jour", "bind": {"required": "yes"}},
+            ]
+        }
+    ],
+    "choices": {"couleurs": [{"name": "rouge"}, {"name": "vert"}]}
+}
+
+INVALID_DOCUMENT = {
+    "value": [
+        {"couleur": "bleu", "autres": ["vert", "vert"], "age": 2.5},
+        {"age": True, "visites": [{"position": {"latitude": 120}}, {"jour": 3}]},
+        "pas un objet",
+    ]
+}
+
+
+def _errors(errors):
+    return sorted((e.message, tuple(e.path), e.validator) for e in errors)
+
+
+@pytest.mark.parametrize("use_refs", [False, True])
+def test_compiled_validator_matches_jsonschema(use_refs):
+    """Test que le validateur compilé rapporte les mêmes erreurs que jsonschema"""
+    validator = compile_validator(XLSFORM_DATA, use_refs=use_refs)
+    reference = Draft7Validator(validator.schema)
+
+    expected = _errors(reference.iter_errors(INVALID_DOCUMENT))
+    assert expected
+    assert _errors(validator.iter_errors(INVALID_DOCUMENT)) == expected
+    assert not validator.is_valid(INVALID_DOCUMENT)
+
+
+def test_compiled_validator_valid_document():
+    """Test d'un document valide et de la validation par soumission"""
+    validator = compile_validator(XLSFORM_DATA)
+    record = {"couleur": "rouge", "autres": None, "visites": [{"position": {"latitude": 1, "longitude": 2}, "jour": "2026-01-01"}]}
+
+    assert validator.is_valid({"value": [record]})
+    validator.validate({"value": [record]})
+    assert validator.is_valid_record(record)
+
+    errors = list(validator.iter_record_errors({"couleur": "bleu"}, index=4))
+    assert [tuple(e.path) for e in errors] == [("value", 4, "couleur")]
+    with pytest.raises(ValidationError):
+        validator.validate({"value": [{"couleur": "bleu"}]})
+
+
+def test_compiled_validator_fallback_keywords():
+    """Test que les mots-clés non compilés sont délégués à jsonschema"""
+    schema = {"type": "object", "properties": {"code": {"type": "string", "not": {"const": "x"}}}}
+    validator = compile_schema(schema)
+    errors = list(validator.iter_errors({"code": "x"}))
+    assert [(e.validator, tuple(e.path)) for e in errors] == [("not", ("code",))]
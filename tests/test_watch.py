@@ -0,0 +1,83 @@
+"""
+Tests unitaires pour la surveillance d'un répertoire de formulaires
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from xlsF2schema.cli import watch_main
+from xlsF2schema.watch import MANIFEST_NAME, FormWatcher
+
+SAMPLES_DIR = Path(__file__).parent / "samples"
+
+
+def _statuses(results):
+    return sorted((Path(r["input"]).name, r["status"]) for r in results)
+
+
+def test_watch_sync_and_manifest(tmp_path):
+    """Test que seuls les formulaires nouveaux ou modifiés sont reconvertis, y compris après redémarrage"""
+    forms = tmp_path / "forms"
+    (forms / "sub").mkdir(parents=True)
+    shutil.copy(SAMPLES_DIR / "test_odk.xlsx", forms / "a.xlsx")
+    shutil.copy(SAMPLES_DIR / "Household.xlsx", forms / "sub" / "b.xlsx")
+    (forms / "broken.xlsx").write_text("pas un classeur")
+    out = tmp_path / "out"
+
+    watcher = FormWatcher(str(forms), str(out), workers=1)
+    assert _statuses(watcher.sync()) == [("a.xlsx", "ok"), ("b.xlsx", "ok"), ("broken.xlsx", "error")]
+    assert "value" in json.loads((out / "sub" / "b.json").read_text(encoding="utf-8"))["properties"]
+    assert not list(out.rglob("*.tmp"))
+
+    # Redémarrage : le manifeste évite toute reconversion, même après un simple "touch"
+    os.utime(forms / "a.xlsx")
+    assert FormWatcher(str(forms), str(out), workers=1).sync() == []
+    manifest = json.loads((out / MANIFEST_NAME).read_text(encoding="utf-8"))
+    assert manifest["forms"]["broken.xlsx"]["status"] == "error"
+
+    # Contenu modifié, formulaire supprimé, options différentes
+    shutil.copy(SAMPLES_DIR / "Household.xlsx", forms / "a.xlsx")
+    os.remove(forms / "sub" / "b.xlsx")
+    assert _statuses(FormWatcher(str(forms), str(out), workers=1, prune=True).sync()) == [("a.xlsx", "ok"), ("b.xlsx", "removed")]
+    assert not (out / "sub" / "b.json").exists()
+    assert _statuses(FormWatcher(str(forms), str(out), workers=1, use_refs=True).sync()) == [("a.xlsx", "ok"), ("broken.xlsx", "error")]
+
+
+def test_watch_debounce(tmp_path):
+    """Test qu'un fichier n'est traité qu'une fois stable depuis debounce secondes"""
+    forms = tmp_path / "forms"
+    forms.mkdir()
+    watcher = FormWatcher(str(forms), str(tmp_path / "out"), workers=1, debounce=5)
+    assert watcher.sync() == []
+
+    shutil.copy(SAMPLES_DIR / "test_odk.xlsx", forms / "a.xlsx")
+    assert watcher.poll(now=100) == []
+    # Nouvel enregistrement pendant le délai : le délai repart
+    with open(forms / "a.xlsx", "ab") as f:
+        f.write(b"\0")
+    assert watcher.poll(now=103) == []
+    shutil.copy(SAMPLES_DIR / "test_odk.xlsx", forms / "a.xlsx")
+    os.utime(forms / "a.xlsx", ns=(1, 1))
+    assert watcher.poll(now=104) == []
+    assert _statuses(watcher.poll(now=109)) == [("a.xlsx", "ok")]
+    assert watcher.poll(now=120) == []
+
+
+def test_watch_cli_once(tmp_path, capsys):
+    """Test de la sous-commande watch --once"""
+    forms = tmp_path / "forms"
+    forms.mkdir()
+    shutil.copy(SAMPLES_DIR / "test_odk.xlsx", forms / "a.xlsx")
+
+    watch_main([str(forms), "-d", str(tmp_path / "out"), "--once", "--compact"])
+    assert "1 formulaire(s) mis à jour, 0 échec(s)" in capsys.readouterr().err
+    watch_main([str(forms), "-d", str(tmp_path / "out"), "--once", "--compact"])
+    assert "0 formulaire(s) mis à jour" in capsys.readouterr().err
+
+    (forms / "b.xlsx").write_text("pas un classeur")
+    with pytest.raises(SystemExit) as exc:
+        watch_main([str(forms), "-d", str(tmp_path / "out"), "--once", "--compact"])
+    assert exc.value.code == 1